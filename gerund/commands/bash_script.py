@@ -2,12 +2,21 @@
 This file defines the mechanisms around running a bash script either locally or on a server.
 """
 import os
+import time
 from datetime import datetime
 from subprocess import Popen
-from typing import List, Optional
+from typing import Dict, List, Optional, Union
 
 from gerund.commands.terminal_command import TerminalCommand
-from gerund.enums import EnvVars
+from gerund.components.delta_sync import DeltaSync
+from gerund.components.fail_fast import FailFast
+from gerund.components.host_limiter import HostLimiter
+from gerund.components.input_stream import InputData
+from gerund.components.metrics import Metrics
+from gerund.components.placement import Placement
+from gerund.components.ssh_options import SshOptions
+from gerund.components.tracer import Tracer
+from gerund.enums import EnvVars, Compression
 
 
 class BashScript:
@@ -20,10 +29,20 @@ class BashScript:
         key (Optional[str]): path to pem key if needed to be run on server
         username (str): the username of the server which has a default of "ubuntu"
         capture_output (bool): for the output to be captured with a default of False
+        compression (Optional[Compression]): the compression of the script upload and the output if running on server
+        fail_fast (Optional[FailFast]): the policy that terminates the script if its batch is cancelled
+        placement (Optional[Placement]): the CPUs, priority, and cgroup the script is placed in if running locally
+        sync (Optional[Dict[str, str]]): local directories mapped to the directories on the server they are synced to
+                                         before the script runs on the server
+        input (Optional[InputData]): bytes, a binary file object, or an iterable of bytes chunks streamed into the
+                                     stdin of the script
     """
     def __init__(self, commands: Optional[List[str]] = None, path: Optional[str] = None,
                  environment_variables: EnvVars = None, ip_address: Optional[str] = None, key: Optional[str] = None,
-                 username: str = "ubuntu", capture_output: bool = False) -> None:
+                 username: str = "ubuntu", capture_output: bool = False,
+                 compression: Optional[Union[str, Compression]] = None, fail_fast: Optional[FailFast] = None,
+                 placement: Optional[Placement] = None, sync: Optional[Dict[str, str]] = None,
+                 input: Optional[InputData] = None) -> None:
         """
         The constructor for the BashScript class.
 
@@ -35,15 +54,29 @@ class BashScript:
             key: (Optional[str]) path to pem key if needed to be run on server
             username: (str) the username of the server which has a default of "ubuntu"
             capture_output: (bool) for the output to be captured with a default of False
+            compression: (Optional[Union[str, Compression]]) "ssh" or "gzip" to compress the script upload and the
+                         output if running on server
+            fail_fast: (Optional[FailFast]) the policy that terminates the script if its batch is cancelled
+            placement: (Optional[Placement]) the CPUs, priority, and cgroup the script is placed in if running locally
+            sync: (Optional[Dict[str, str]]) local directories mapped to the directories on the server they are
+                  synced to before the script runs on the server, only changed files are sent
+            input: (Optional[InputData]) bytes, a binary file object, or an iterable of bytes chunks streamed into
+                   the stdin of the script through the ssh connection if running on server
         """
         self._commands: Optional[List[str]] = commands
         self._path: Optional[str] = path
+        self._return_code: Optional[int] = None
         self._check_inputs()
         self.environment_variables: EnvVars = environment_variables
         self.ip_address: Optional[str] = ip_address
         self.key: Optional[str] = key
         self.username: str = username
         self.capture_output: bool = capture_output
+        self.compression: Optional[Compression] = Compression(compression) if compression is not None else None
+        self.fail_fast: Optional[FailFast] = fail_fast
+        self.placement: Optional[Placement] = placement
+        self.sync: Optional[Dict[str, str]] = sync
+        self.input: Optional[InputData] = input
 
     def _check_inputs(self) -> None:
         """
@@ -69,33 +102,50 @@ class BashScript:
 
         Returns: None
         """
-        with open(self._path, "w") as file:
+        with Tracer().span("bash_script.write", path=self._path), open(self._path, "w") as file:
             for i in self.commands:
                 file.write(i)
                 file.write("\n")
 
     def _run_on_server(self) -> Optional[List[str]]:
         """
-        Copies the bash script or commands onto a server, runs them, and then wipes the script from the server.
+        Copies the bash script or commands onto a server, runs them, and then wipes the script from the server. Any
+        directories to sync are brought up to date on the server first.
 
         Returns: (Optional[List[str]]) captured output from the script if self.capture_output is True
         """
+        for local_directory, remote_directory in (self.sync or {}).items():
+            DeltaSync(local_directory=local_directory, remote_directory=remote_directory, ip_address=self.ip_address,
+                      username=self.username, key=self.key).sync()
+
         script_name = self._path.split("/")[-1]
-        ssh_prefix: str = "-o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null"
-        if self.key is None:
-            command = f"scp {ssh_prefix} {self._path} ubuntu@{self.ip_address}:/home/{self.username}/{script_name}"
+        ssh_prefix: str = SshOptions().options
+        if self.key is not None:
+            ssh_prefix += f" -i {self.key}"
+
+        if self.compression is Compression.GZIP:
+            command = f"gzip -c {self._path} | ssh {ssh_prefix} ubuntu@{self.ip_address} 'gzip -dc > /home/{self.username}/{script_name}'"
+        elif self.compression is Compression.SSH:
+            command = f"scp -C {ssh_prefix} {self._path} ubuntu@{self.ip_address}:/home/{self.username}/{script_name}"
         else:
-            command = f"scp {ssh_prefix} -i {self.key} {self._path} ubuntu@{self.ip_address}:/home/{self.username}/{script_name}"
+            command = f"scp {ssh_prefix} {self._path} ubuntu@{self.ip_address}:/home/{self.username}/{script_name}"
 
         # copy script onto server
-        copy_to_server = Popen(command, shell=True)
-        copy_to_server.wait()
+        with HostLimiter().acquire(ip_address=self.ip_address), \
+                Tracer().span("bash_script.upload", host=self.ip_address, script=script_name):
+            start = time.perf_counter()
+            copy_to_server = Popen(command, shell=True)
+            copy_to_server.wait()
+            Metrics().observe("gerund_script_upload_seconds", time.perf_counter() - start, host=self.ip_address)
 
         # run the terminal command
         run_script = TerminalCommand(command=[f"cd /home/{self.username}", f"sh {script_name}", f"rm {script_name}"],
                                      environment_variables=self.environment_variables,
-                                     ip_address=self.ip_address, key=self.key, username=self.username)
-        return run_script.wait(capture_output=self.capture_output)
+                                     ip_address=self.ip_address, key=self.key, username=self.username,
+                                     compression=self.compression, fail_fast=self.fail_fast, input=self.input)
+        output = run_script.wait(capture_output=self.capture_output)
+        self._return_code = run_script.return_code
+        return output
 
     def _run(self) -> Optional[List[str]]:
         """
@@ -109,12 +159,14 @@ class BashScript:
         self._path = cache_path
         self._write_script()
 
-        command = TerminalCommand(command=f"sh {self._path}", environment_variables=self.environment_variables)
+        command = TerminalCommand(command=f"sh {self._path}", environment_variables=self.environment_variables,
+                                  fail_fast=self.fail_fast, placement=self.placement, input=self.input)
         output = None
         if self.capture_output is True:
             output = command.wait(capture_output=True)
         else:
             command.wait()
+        self._return_code = command.return_code
         os.remove(self._path)
         self._path = cached_path
         return output
@@ -123,6 +175,16 @@ class BashScript:
         """
         Runs the bash script either locally or on a server base on attributes.
 
+        Returns: (Optional[List[str]]) captured output from the script if self.capture_output is True
+        """
+        Metrics().inc("gerund_scripts_total", host=self.ip_address or "local")
+        with Tracer().span("bash_script.run", host=self.ip_address or "local"):
+            return self._wait()
+
+    def _wait(self) -> Optional[List[str]]:
+        """
+        Runs the bash script either locally or on a server base on attributes.
+
         Returns: (Optional[List[str]]) captured output from the script if self.capture_output is True
         """
         if self.ip_address is None:
@@ -141,3 +203,7 @@ class BashScript:
         if self._commands is None:
             self._read_script()
         return self._commands
+
+    @property
+    def return_code(self) -> Optional[int]:
+        return self._return_code
@@ -0,0 +1,310 @@
+"""
+This file defines the class that pushes the same files to many servers by relaying them from server to server.
+"""
+import hashlib
+import io
+import os
+import re
+import shlex
+import tarfile
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from subprocess import DEVNULL, PIPE, Popen
+from typing import Deque, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from gerund.components.host_limiter import HostLimiter
+from gerund.components.ssh_options import SshOptions
+from gerund.components.tracer import Tracer
+
+# the name of the file of checksums sent along with the files and checked on every server
+CHECKSUM_FILE = ".gerund-broadcast.sha256"
+
+
+class BroadcastResult(NamedTuple):
+    """
+    The outcome of broadcasting the files to a server.
+
+    Attributes:
+        host (str): the IP address of the server
+        source (Optional[str]): the IP address of the server the files were relayed from, None if they were uploaded
+                                from this machine
+        depth (int): the number of hops between this machine and the server
+        seconds (float): the time taken for the last hop to the server
+        error (Optional[str]): the reason the files could not be delivered if they were not
+    """
+    host: str
+    source: Optional[str]
+    depth: int
+    seconds: float
+    error: Optional[str] = None
+
+
+class Broadcast:
+    """
+    This class is responsible for getting the same files onto many servers without sending every copy from this
+    machine. The files are uploaded to a few seed servers as one gzipped tar stream, and every server that has the
+    files relays them over ssh to up to fan_out more servers as soon as it has them. This machine keeps sending to at
+    most seeds servers at a time while the relays run, so the number of servers holding the files roughly multiplies
+    every round and the time taken grows with the log of the number of servers. The tar carries the sha256 of every
+    file, which every server checks before it starts relaying, so a corrupt copy is never passed on. If a relay fails
+    the server is tried once more straight from this machine and the server that failed to relay is not used as a
+    source again.
+
+    The servers connect to each other with the key at relay_key on the servers if given, otherwise the ssh agent of
+    this machine is forwarded to the servers so its keys are used.
+
+    Attributes:
+        paths (List[str]): the local files and directories to broadcast
+        hosts (List[str]): the IP addresses of the servers
+        remote_directory (str): the directory on the servers the files are written to, relative paths are relative to
+                                the home directory
+        username (str): the username for the servers
+        key (Optional[str]): path to the pem key for the servers on this machine
+        relay_key (Optional[str]): path to the pem key the servers use to connect to each other
+        fan_out (int): the number of servers each server relays to at the same time
+        seeds (int): the number of servers uploaded to from this machine at the same time
+    """
+    def __init__(self, paths: List[str], hosts: List[str], remote_directory: str = ".", username: str = "ubuntu",
+                 key: Optional[str] = None, relay_key: Optional[str] = None, fan_out: int = 2,
+                 seeds: Optional[int] = None) -> None:
+        """
+        The constructor for the Broadcast class.
+
+        :param paths: (List[str]) the local files and directories to broadcast, each is written under its own name
+        :param hosts: (List[str]) the IP addresses of the servers
+        :param remote_directory: (str) the directory on the servers the files are written to (default the home
+                                 directory)
+        :param username: (str) the username for the servers (default is "ubuntu")
+        :param key: (Optional[str]) path to the pem key for the servers on this machine
+        :param relay_key: (Optional[str]) path to the pem key the servers use to connect to each other (default
+                          forwards the ssh agent)
+        :param fan_out: (int) the number of servers each server relays to at the same time (default 2)
+        :param seeds: (Optional[int]) the number of servers uploaded to from this machine at the same time (default
+                      fan_out)
+        """
+        if len(paths) == 0:
+            raise ValueError("broadcast needs at least one path")
+        if len(hosts) == 0:
+            raise ValueError("broadcast needs at least one host")
+        if fan_out < 1 or (seeds is not None and seeds < 1):
+            raise ValueError("fan_out and seeds have to be at least 1")
+        for path in paths:
+            if not os.path.exists(path):
+                raise ValueError(f"{path} does not exist")
+        self.paths: List[str] = [os.path.abspath(path) for path in paths]
+        names = [os.path.basename(path) for path in self.paths]
+        for name in names:
+            if names.count(name) > 1:
+                raise ValueError(f"more than one path is named {name} but each is written under its own name")
+        self.hosts: List[str] = list(dict.fromkeys(hosts))
+        self.remote_directory: str = remote_directory
+        self.username: str = username
+        self.key: Optional[str] = key
+        self.relay_key: Optional[str] = relay_key
+        self.fan_out: int = fan_out
+        self.seeds: int = seeds if seeds is not None else fan_out
+
+    def _files(self) -> List[Tuple[str, str]]:
+        """
+        Lists every file being broadcast.
+
+        :return: (List[Tuple[str, str]]) the local path and the path relative to the remote directory of each file
+        """
+        files = []
+        for path in self.paths:
+            base = os.path.dirname(path)
+            if os.path.isfile(path):
+                files.append((path, os.path.basename(path)))
+                continue
+            for root, directories, names in os.walk(path):
+                directories.sort()
+                for name in sorted(names):
+                    file_path = os.path.join(root, name)
+                    if os.path.isfile(file_path) and not os.path.islink(file_path):
+                        files.append((file_path, os.path.relpath(file_path, base)))
+        return files
+
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @property
+    def _names(self) -> str:
+        return " ".join(shlex.quote(os.path.basename(path)) for path in self.paths)
+
+    @staticmethod
+    def _quote_path(path: str) -> str:
+        # a leading ~ is left outside the quotes so the shell on the server expands it
+        if path == "~" or path.startswith("~/"):
+            return "~/" + (shlex.quote(path[2:]) if len(path) > 2 else "")
+        return shlex.quote(path)
+
+    def _compile_receive(self) -> str:
+        """
+        Compiles the command run on a server to unpack the stream and check the checksums of the files.
+
+        :return: (str) the command reading the tar from stdin
+        """
+        directory = self._quote_path(path=self.remote_directory)
+        return f"mkdir -p {directory} && cd {directory} && tar -xzf - && sha256sum -c --quiet {CHECKSUM_FILE}"
+
+    def _compile_upload(self, host: str) -> str:
+        """
+        Compiles the ssh command that uploads the files from this machine to a server.
+
+        :param host: (str) the IP address of the server
+        :return: (str) the command reading the tar from stdin
+        """
+        ssh_options: str = SshOptions().options
+        if self.key is not None:
+            ssh_options += f" -i '{self.key}'"
+        receive = self._compile_receive().replace("'", "'\\''")
+        return f"ssh {ssh_options} {self.username}@{host} '{receive}'"
+
+    def _compile_relay(self, source: str, host: str) -> str:
+        """
+        Compiles the ssh command that makes a server that has the files stream them to another server.
+
+        :param source: (str) the IP address of the server that has the files
+        :param host: (str) the IP address of the server receiving the files
+        :return: (str) the command relaying the tar between the servers
+        """
+        ssh_options: str = SshOptions().options
+        if self.key is not None:
+            ssh_options += f" -i '{self.key}'"
+        relay_options = "-o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null -o BatchMode=yes"
+        if self.relay_key is not None:
+            relay_options += f" -i {self._quote_path(path=self.relay_key)}"
+        else:
+            ssh_options += " -A"
+        # the receiving command is inside double quotes of the relaying command which is inside single quotes
+        receive = re.sub(r'([\\"$`])', r"\\\1", self._compile_receive())
+        remote_command = f"cd {self._quote_path(path=self.remote_directory)} && " \
+                         f"tar -czf - {CHECKSUM_FILE} {self._names} | " \
+                         f"ssh {relay_options} {self.username}@{host} \"{receive}\""
+        remote_command = remote_command.replace("'", "'\\''")
+        return f"ssh {ssh_options} {self.username}@{source} '{remote_command}'"
+
+    def _upload(self, host: str, files: List[Tuple[str, str]], checksums: bytes) -> Optional[str]:
+        """
+        Uploads the files from this machine to a server.
+
+        :param host: (str) the IP address of the server
+        :param files: (List[Tuple[str, str]]) the local path and the remote relative path of each file
+        :param checksums: (bytes) the contents of the checksum file
+        :return: (Optional[str]) the reason the upload failed if it did
+        """
+        with HostLimiter().acquire(ip_address=host):
+            process = Popen(self._compile_upload(host=host), shell=True, stdin=PIPE, stdout=DEVNULL)
+            try:
+                with tarfile.open(fileobj=process.stdin, mode="w|gz") as archive:
+                    info = tarfile.TarInfo(name=CHECKSUM_FILE)
+                    info.size = len(checksums)
+                    info.mtime = int(time.time())
+                    archive.addfile(info, fileobj=io.BytesIO(checksums))
+                    for local_path, remote_path in files:
+                        archive.add(local_path, arcname=remote_path, recursive=False)
+            except BrokenPipeError:
+                pass
+            finally:
+                process.stdin.close()
+                process.wait()
+        if process.returncode != 0:
+            return f"upload to {host} failed with exit code {process.returncode}"
+        return None
+
+    def _relay(self, source: str, host: str) -> Optional[str]:
+        """
+        Makes a server that has the files send them to another server.
+
+        :param source: (str) the IP address of the server that has the files
+        :param host: (str) the IP address of the server receiving the files
+        :return: (Optional[str]) the reason the relay failed if it did
+        """
+        with HostLimiter().acquire(ip_address=source):
+            process = Popen(self._compile_relay(source=source, host=host), shell=True, stdin=DEVNULL,
+                            stdout=DEVNULL)
+            process.wait()
+        if process.returncode != 0:
+            return f"relay from {source} to {host} failed with exit code {process.returncode}"
+        return None
+
+    def _send(self, source: Optional[str], host: str, files: List[Tuple[str, str]], checksums: bytes) -> \
+            Tuple[Optional[str], float]:
+        """
+        Sends the files to a server from this machine or from another server.
+
+        :param source: (Optional[str]) the IP address of the server relaying the files, None uploads from this machine
+        :param host: (str) the IP address of the server receiving the files
+        :param files: (List[Tuple[str, str]]) the local path and the remote relative path of each file
+        :param checksums: (bytes) the contents of the checksum file
+        :return: (Tuple[Optional[str], float]) the reason the hop failed if it did and the time it took
+        """
+        start = time.perf_counter()
+        with Tracer().span("broadcast.hop", host=host, source=source or "local"):
+            if source is None:
+                error = self._upload(host=host, files=files, checksums=checksums)
+            else:
+                error = self._relay(source=source, host=host)
+        return error, time.perf_counter() - start
+
+    def wait(self) -> List[BroadcastResult]:
+        """
+        Broadcasts the files to every server. Whenever this machine or a server that has the files has a free slot it
+        sends them to the next server that does not have them. Servers that have the files are used as the source
+        before this machine, which never sends more than seeds copies at the same time.
+
+        :return: (List[BroadcastResult]) the outcome of each server in the order of the hosts
+        """
+        files = self._files()
+        checksums = "".join(f"{self._hash_file(path=local_path)}  {remote_path}\n"
+                            for local_path, remote_path in files).encode()
+
+        pending: Deque[str] = deque(self.hosts)
+        retries: Deque[str] = deque()
+        free: Dict[Optional[str], int] = {None: self.seeds}
+        depths: Dict[Optional[str], int] = {None: 0}
+        results: Dict[str, BroadcastResult] = {}
+        running: Dict[Future, Tuple[Optional[str], str]] = {}
+        retired: Set[Optional[str]] = set()
+
+        with Tracer().span("broadcast.wait", hosts=len(self.hosts)), \
+                ThreadPoolExecutor(max_workers=max(1, len(self.hosts))) as executor:
+            while len(pending) + len(retries) + len(running) > 0:
+                while len(retries) > 0 and free[None] > 0:
+                    free[None] -= 1
+                    host = retries.popleft()
+                    running[executor.submit(self._send, None, host, files, checksums)] = (None, host)
+                while len(pending) > 0:
+                    # servers that already have the files are used before this machine
+                    sources = [source for source, slots in free.items() if slots > 0 and source is not None]
+                    if len(sources) == 0 and free[None] == 0:
+                        break
+                    source = sources[0] if len(sources) > 0 else None
+                    free[source] -= 1
+                    host = pending.popleft()
+                    running[executor.submit(self._send, source, host, files, checksums)] = (source, host)
+
+                done, _ = wait(list(running.keys()), return_when=FIRST_COMPLETED)
+                for future in done:
+                    source, host = running.pop(future)
+                    if source not in retired:
+                        free[source] += 1
+                    error, seconds = future.result()
+                    if error is not None and source is not None:
+                        # a server that failed to relay is not given any more servers to relay to
+                        retired.add(source)
+                        free[source] = 0
+                        retries.append(host)
+                        continue
+                    results[host] = BroadcastResult(host=host, source=source, depth=depths[source] + 1,
+                                                    seconds=seconds, error=error)
+                    if error is None:
+                        free[host] = self.fan_out
+                        depths[host] = depths[source] + 1
+        return [results[host] for host in self.hosts]
@@ -0,0 +1,238 @@
+"""
+This file defines the class that pulls result files back from one or more servers.
+"""
+import hashlib
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from subprocess import Popen, PIPE
+from typing import IO, Dict, List, NamedTuple, Optional
+
+from gerund.components.host_limiter import HostLimiter
+from gerund.components.ssh_options import SshOptions
+from gerund.components.tracer import Tracer
+
+# the prefix of the file of checksums sent at the start of the stream
+CHECKSUM_PREFIX = ".gerund-fetch-"
+
+
+class FetchResult(NamedTuple):
+    """
+    The outcome of fetching files from a server.
+
+    Attributes:
+        host (str): the IP address of the server
+        directory (str): the local directory the files of the server were written to
+        files (int): the number of files written, 0 if the fetch failed
+        bytes (int): the size of the files written, 0 if the fetch failed
+        transferred_bytes (int): the size of the compressed stream read from the server
+        seconds (float): the time taken for the fetch
+        error (Optional[str]): the reason the fetch failed if it did
+    """
+    host: str
+    directory: str
+    files: int
+    bytes: int
+    transferred_bytes: int
+    seconds: float
+    error: Optional[str] = None
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes / self.seconds if self.seconds > 0 else 0.0
+
+
+class _CountingReader:
+    """
+    This class is responsible for counting the bytes read from the stdout of the ssh process.
+    """
+    def __init__(self, stream: IO[bytes]) -> None:
+        self._stream: IO[bytes] = stream
+        self.count: int = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._stream.read(size)
+        self.count += len(data)
+        return data
+
+
+class Fetch:
+    """
+    This class is responsible for pulling files and directories back from servers. Each server sends everything as one
+    gzipped tar stream over a single ssh connection, led by the sha256 of every file worked out on the server with
+    find and sha256sum. The servers are fetched from at the same time and every file is checked against its checksum
+    as it is written to a temporary file which is only moved into place if it matches, so a local file is never left
+    half written. The files of each server go into a directory named after the server, and are only moved there once
+    the whole fetch from the server has succeeded so a failed fetch leaves no partial output behind.
+
+    Attributes:
+        paths (List[str]): the files, directories, or glob patterns to fetch, relative paths are relative to the home
+                           directory
+        hosts (List[str]): the IP addresses of the servers
+        local_directory (str): the directory the directories of the servers are created in
+        username (str): the username for the servers
+        key (Optional[str]): path to the pem key for the servers
+    """
+    def __init__(self, paths: List[str], hosts: List[str], local_directory: str, username: str = "ubuntu",
+                 key: Optional[str] = None) -> None:
+        """
+        The constructor for the Fetch class.
+
+        :param paths: (List[str]) the files and directories to fetch, relative paths are relative to the home
+                      directory
+        :param hosts: (List[str]) the IP addresses of the servers
+        :param local_directory: (str) the directory the directories of the servers are created in
+        :param username: (str) the username for the servers (default is "ubuntu")
+        :param key: (Optional[str]) path to the pem key for the servers
+        """
+        if len(paths) == 0:
+            raise ValueError("fetch needs at least one path")
+        if len(hosts) == 0:
+            raise ValueError("fetch needs at least one host")
+        self.paths: List[str] = paths
+        self.hosts: List[str] = hosts
+        self.local_directory: str = local_directory
+        self.username: str = username
+        self.key: Optional[str] = key
+
+    def _compile_command(self, host: str) -> str:
+        """
+        Compiles the ssh command that streams the checksums and then the files from a server.
+
+        :param host: (str) the IP address of the server
+        :return: (str) the command streaming the tar from the server
+        """
+        ssh_options: str = SshOptions().options
+        if self.key is not None:
+            ssh_options += f" -i '{self.key}'"
+        paths = " ".join(self.paths)
+        remote_command = f"sums={CHECKSUM_PREFIX}$$.sha256; find {paths} -type f -exec sha256sum {{}} + > $sums " \
+                         f"&& tar -czf - $sums {paths}; status=$?; rm -f $sums; exit $status"
+        return f"ssh {ssh_options} {self.username}@{host} '{remote_command}'"
+
+    @staticmethod
+    def _local_name(path: str) -> str:
+        """
+        Normalises a path from the server into a path relative to the directory of the server.
+
+        :param path: (str) the path from sha256sum or the tar stream
+        :return: (str) the relative local path
+        """
+        name = os.path.normpath(path).lstrip("/")
+        if name == ".." or name.startswith("../"):
+            raise ValueError(f"{path} is outside the directory being fetched into")
+        return name
+
+    def _write_member(self, archive: tarfile.TarFile, member: tarfile.TarInfo, directory: str,
+                      checksums: Dict[str, str]) -> int:
+        """
+        Writes a file from the stream to a temporary file checking its checksum and moves it into place if it matches.
+
+        :param archive: (tarfile.TarFile) the stream from the server
+        :param member: (tarfile.TarInfo) the file being written
+        :param directory: (str) the directory of the server
+        :param checksums: (Dict[str, str]) the sha256 of every file keyed by its relative path
+        :return: (int) the size of the file
+        """
+        name = self._local_name(path=member.name)
+        path = os.path.join(directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.part"
+        digest = hashlib.sha256()
+        source = archive.extractfile(member)
+        try:
+            with open(temp_path, "wb") as file:
+                for chunk in iter(lambda: source.read(1024 * 1024), b""):
+                    digest.update(chunk)
+                    file.write(chunk)
+            if checksums.get(name) != digest.hexdigest():
+                raise ValueError(f"checksum mismatch for {member.name}")
+            os.chmod(temp_path, member.mode)
+            os.utime(temp_path, (member.mtime, member.mtime))
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return member.size
+
+    @staticmethod
+    def _move_into_place(staging: str, directory: str) -> None:
+        """
+        Moves the fetched files from the staging directory into the directory of the server, replacing older copies.
+
+        :param staging: (str) the directory the files were fetched into
+        :param directory: (str) the directory of the server
+        :return: None
+        """
+        for root, _, names in os.walk(staging):
+            for name in names:
+                source = os.path.join(root, name)
+                path = os.path.join(directory, os.path.relpath(source, staging))
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(source, path)
+
+    def _fetch_host(self, host: str) -> FetchResult:
+        """
+        Fetches the files from one server.
+
+        :param host: (str) the IP address of the server
+        :return: (FetchResult) the outcome of the fetch
+        """
+        start = time.perf_counter()
+        directory = os.path.join(self.local_directory, host)
+        files, size = 0, 0
+        error: Optional[str] = None
+        broken_stream = False
+        os.makedirs(self.local_directory, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=f".{host}.", suffix=".part", dir=self.local_directory)
+
+        with HostLimiter().acquire(ip_address=host), Tracer().span("fetch.host", host=host):
+            process = Popen(self._compile_command(host=host), shell=True, stdout=PIPE)
+            reader = _CountingReader(stream=process.stdout)
+            try:
+                checksums: Dict[str, str] = {}
+                with tarfile.open(fileobj=reader, mode="r|gz") as archive:
+                    for member in archive:
+                        if member.name.startswith(CHECKSUM_PREFIX):
+                            for line in archive.extractfile(member).read().decode().splitlines():
+                                digest, _, path = line.partition("  ")
+                                checksums[self._local_name(path=path)] = digest
+                        elif member.isfile():
+                            size += self._write_member(archive=archive, member=member, directory=staging,
+                                                       checksums=checksums)
+                            files += 1
+            except tarfile.TarError as exception:
+                error = str(exception)
+                broken_stream = True
+            except (ValueError, OSError) as exception:
+                error = str(exception)
+            finally:
+                process.stdout.close()
+                process.wait()
+
+        # a failure on the server breaks the stream so the exit code is the more useful error, while an error found
+        # here also makes ssh exit with an error once its stdout is closed so the exit code would only hide it
+        if process.returncode != 0 and (error is None or broken_stream is True):
+            error = f"fetch from {host} failed with exit code {process.returncode}"
+        if error is None:
+            try:
+                self._move_into_place(staging=staging, directory=directory)
+            except OSError as exception:
+                error = str(exception)
+        if error is not None:
+            files, size = 0, 0
+        shutil.rmtree(staging, ignore_errors=True)
+        return FetchResult(host=host, directory=directory, files=files, bytes=size, transferred_bytes=reader.count,
+                           seconds=time.perf_counter() - start, error=error)
+
+    def wait(self) -> List[FetchResult]:
+        """
+        Fetches the files from every server at the same time.
+
+        :return: (List[FetchResult]) the outcome of the fetch from each server in the order of the hosts
+        """
+        with ThreadPoolExecutor(max_workers=len(self.hosts)) as executor:
+            return list(executor.map(self._fetch_host, self.hosts))
@@ -0,0 +1,326 @@
+"""
+This file defines the scheduler that spreads terminal commands and bash scripts over a pool of servers, handing each
+task to the next server that is free.
+"""
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Deque, Dict, List, NamedTuple, Optional, Set, Tuple, Union
+
+from gerund.commands.bash_script import BashScript
+from gerund.commands.terminal_command import TerminalCommand
+from gerund.components.fail_fast import FailFast
+from gerund.components.ordered_writer import OrderedWriter
+from gerund.components.preflight import HostHealth, Preflight
+from gerund.components.tracer import Tracer
+
+Task = Union[TerminalCommand, BashScript]
+
+
+class TaskResult(NamedTuple):
+    """
+    The outcome of a task run by the host pool.
+
+    Attributes:
+        index (int): the position of the task in the list of tasks passed to the pool
+        host (str): the IP address of the server the task ran on
+        return_code (Optional[int]): the exit status of the task, None if the task raised an error
+        seconds (float): the time taken to run the task
+        output (Optional[List[str]]): the captured output of the task if it was captured
+        error (Optional[str]): the error raised by the task if there was one
+        cancelled (bool): True if the task was terminated because the run was cancelled by the fail fast policy
+    """
+    index: int
+    host: str
+    return_code: Optional[int]
+    seconds: float
+    output: Optional[List[str]]
+    error: Optional[str]
+    cancelled: bool = False
+
+
+class HostUsage(NamedTuple):
+    """
+    How much of a run a server in the host pool spent running tasks.
+
+    Attributes:
+        host (str): the IP address of the server
+        tasks (int): the number of tasks the server ran
+        stolen (int): the number of those tasks that were taken from the queue of another server
+        busy_seconds (float): the time the server spent running tasks
+        utilisation (float): the busy time divided by the wall clock time of the run and the slots of the server
+    """
+    host: str
+    tasks: int
+    stolen: int
+    busy_seconds: float
+    utilisation: float
+
+
+class HostPool:
+    """
+    This class is responsible for running a queue of tasks over a pool of servers. Each server has a worker per slot
+    that takes the next task as soon as it is free so fast servers pick up more tasks than slow ones. Tasks with an
+    affinity hint are queued on the servers they prefer and are taken from the front of that queue, tasks without a
+    hint go on a shared queue, and a worker with nothing left to do steals from the back of the longest queue of
+    another server. If strict_affinity is True tasks are only ever run on the servers they were hinted to.
+
+    Attributes:
+        hosts (Dict[str, int]): the number of tasks each server runs at the same time keyed by its IP address
+        username (Optional[str]): the username given to every task, None keeps the username of the task
+        key (Optional[str]): the path to the pem key given to every task, None keeps the key of the task
+    """
+    def __init__(self, hosts: Union[List[str], Dict[str, int]], username: Optional[str] = None,
+                 key: Optional[str] = None) -> None:
+        """
+        The constructor for the HostPool class.
+
+        :param hosts: (Union[List[str], Dict[str, int]]) the IP addresses of the servers, or the number of tasks each
+                      server runs at the same time keyed by its IP address
+        :param username: (Optional[str]) the username given to every task, None keeps the username of the task
+        :param key: (Optional[str]) the path to the pem key given to every task, None keeps the key of the task
+        """
+        if not isinstance(hosts, dict):
+            hosts = {host: 1 for host in hosts}
+        if len(hosts) == 0:
+            raise ValueError("a host pool needs at least one host")
+        for host, slots in hosts.items():
+            if slots < 1:
+                raise ValueError(f"{host} has to have at least 1 slot not {slots}")
+        self.hosts: Dict[str, int] = hosts
+        self.username: Optional[str] = username
+        self.key: Optional[str] = key
+        self._lock: Lock = Lock()
+        self._queues: Dict[str, Deque[int]] = {}
+        self._shared_queue: Deque[int] = deque()
+        self._allowed_hosts: Dict[int, Set[str]] = {}
+        self._strict_affinity: bool = False
+        self._fail_fast: Optional[FailFast] = None
+        self._usage: Dict[str, HostUsage] = {}
+        self._seconds: float = 0.0
+        self._excluded: Dict[str, str] = {}
+        self._health: List[HostHealth] = []
+
+    def _queue_tasks(self, number_of_tasks: int, affinity: Dict[int, Union[str, List[str]]]) -> List[int]:
+        """
+        Puts every task on the queue of the server it prefers or on the shared queue if it has no preference. A task
+        that prefers several servers goes on the shortest of their queues. Servers excluded by the pre-flight check
+        get no queue and are dropped from the preferences of the tasks.
+
+        :param number_of_tasks: (int) the number of tasks being run
+        :param affinity: (Dict[int, Union[str, List[str]]]) the preferred servers keyed by the index of the task
+        :return: (List[int]) the indexes of the tasks that can only run on excluded servers
+        """
+        self._queues = {host: deque() for host in self.hosts if host not in self._excluded}
+        self._shared_queue = deque()
+        self._allowed_hosts = {}
+        stranded: List[int] = []
+
+        for index in range(number_of_tasks):
+            preferred = affinity.get(index)
+            if preferred is None:
+                self._shared_queue.append(index)
+                continue
+            preferred = [preferred] if isinstance(preferred, str) else list(preferred)
+            for host in preferred:
+                if host not in self.hosts:
+                    raise ValueError(f"task {index} has an affinity to {host} which is not in the pool")
+            preferred = [host for host in preferred if host not in self._excluded]
+            if len(preferred) == 0:
+                if self._strict_affinity is True:
+                    stranded.append(index)
+                else:
+                    self._shared_queue.append(index)
+                continue
+            self._allowed_hosts[index] = set(preferred)
+            host = min(preferred, key=lambda i: len(self._queues[i]) / self.hosts[i])
+            self._queues[host].append(index)
+        return stranded
+
+    def _next_task(self, host: str) -> Optional[Tuple[int, bool]]:
+        """
+        Takes the next task for a server from its own queue, then the shared queue, then the back of the longest
+        queue of another server.
+
+        :param host: (str) the IP address of the server asking for a task
+        :return: (Optional[Tuple[int, bool]]) the index of the task and if it was stolen, None when there are no
+                 tasks left
+        """
+        with self._lock:
+            if len(self._queues[host]) > 0:
+                return self._queues[host].popleft(), False
+            if len(self._shared_queue) > 0:
+                return self._shared_queue.popleft(), False
+
+            victims = sorted(self._queues.items(), key=lambda i: len(i[1]), reverse=True)
+            for victim, queue in victims:
+                if victim == host:
+                    continue
+                for index in reversed(queue):
+                    if self._strict_affinity is False or host in self._allowed_hosts[index]:
+                        queue.remove(index)
+                        return index, True
+        return None
+
+    def _run_task(self, task: Task, index: int, host: str, capture_output: bool) -> TaskResult:
+        """
+        Points a task at a server and runs it.
+
+        :param task: (Task) the terminal command or bash script being run
+        :param index: (int) the position of the task in the list of tasks
+        :param host: (str) the IP address of the server the task is run on
+        :param capture_output: (bool) if True the output of terminal commands is captured
+        :return: (TaskResult) the outcome of the task
+        """
+        if self._fail_fast is not None:
+            task.fail_fast = self._fail_fast
+        start = time.perf_counter()
+        task.ip_address = host
+        if self.username is not None:
+            task.username = self.username
+        if self.key is not None:
+            task.key = self.key
+
+        try:
+            with Tracer().span("host_pool.task", host=host, task=index):
+                if isinstance(task, TerminalCommand):
+                    task._process_remote()
+                    output = task.wait(capture_output=capture_output)
+                else:
+                    output = task.wait()
+            return TaskResult(index=index, host=host, return_code=task.return_code,
+                              seconds=time.perf_counter() - start, output=output, error=None)
+        except Exception as error:
+            return TaskResult(index=index, host=host, return_code=None, seconds=time.perf_counter() - start,
+                              output=None, error=f"{type(error).__name__}: {error}")
+
+    def _work(self, host: str, tasks: List[Task], results: List[Optional[TaskResult]],
+              capture_output: bool, writer: Optional[OrderedWriter]) -> None:
+        """
+        Runs tasks on a server until there are none left that it can take.
+
+        :param host: (str) the IP address of the server
+        :param tasks: (List[Task]) every task being run by the pool
+        :param results: (List[Optional[TaskResult]]) the outcomes of the tasks which are filled in by the workers
+        :param capture_output: (bool) if True the output of terminal commands is captured
+        :param writer: (Optional[OrderedWriter]) the writer the captured output is passed to as it is read instead of
+                       the results
+        :return: None
+        """
+        while self._fail_fast is None or self._fail_fast.cancelled is False:
+            next_task = self._next_task(host=host)
+            if next_task is None:
+                return
+            index, stolen = next_task
+            streamed = writer is not None and isinstance(tasks[index], TerminalCommand)
+            if streamed is True:
+                # the lines go to the writer as they are read so the task whose turn it is reaches the file live
+                tasks[index].on_line = lambda line, index=index: writer.write_lines(index=index, lines=[line.text])
+            result = self._run_task(task=tasks[index], index=index, host=host, capture_output=capture_output)
+            if self._fail_fast is not None:
+                if self._fail_fast.was_terminated(command=tasks[index]):
+                    result = result._replace(cancelled=True)
+                else:
+                    self._fail_fast.record(failed=result.error is not None or result.return_code != 0)
+            if writer is not None:
+                lines = [] if streamed is True else result.output or []
+                writer.write_lines(index=index, lines=lines + ([result.error] if result.error else []))
+                writer.finish(index=index)
+                result = result._replace(output=None)
+            results[index] = result
+
+            with self._lock:
+                usage = self._usage[host]
+                self._usage[host] = usage._replace(tasks=usage.tasks + 1, stolen=usage.stolen + int(stolen),
+                                                   busy_seconds=usage.busy_seconds + result.seconds)
+
+    def run(self, tasks: List[Task], affinity: Optional[Dict[int, Union[str, List[str]]]] = None,
+            strict_affinity: bool = False, capture_output: bool = False,
+            writer: Optional[OrderedWriter] = None, fail_fast: Optional[FailFast] = None,
+            preflight: bool = False) -> List[Optional[TaskResult]]:
+        """
+        Runs every task on the pool and waits for them to finish. The IP address of each task is replaced by the
+        server it is handed to. Bash scripts capture their output based on their own capture_output attribute. If a
+        writer is passed the output of terminal commands is captured and written to it in the order of the tasks
+        instead of being kept in the results. If a fail fast policy is passed the run is cancelled once too many tasks
+        fail, the running tasks are terminated, and the tasks that were never started have None as their result. If
+        preflight is True every server is checked with Preflight before any task is started and the unhealthy servers
+        are left out of the run, with tasks that can only run on them failing with the reason.
+
+        :param tasks: (List[Task]) the terminal commands and bash scripts to be run
+        :param affinity: (Optional[Dict[int, Union[str, List[str]]]]) the IP address or addresses of the servers that
+                         a task prefers keyed by the index of the task
+        :param strict_affinity: (bool) if True tasks with an affinity are never stolen by other servers
+        :param capture_output: (bool) if True the output of terminal commands is captured
+        :param writer: (Optional[OrderedWriter]) the writer that combines the outputs of the tasks in their order
+        :param fail_fast: (Optional[FailFast]) the policy that cancels the run once too many tasks have failed
+        :param preflight: (bool) if True the servers are checked before the run and unhealthy servers are left out
+        :return: (List[Optional[TaskResult]]) the outcomes of the tasks in the same order as the tasks
+        """
+        start = time.perf_counter()
+        self._strict_affinity = strict_affinity
+        self._fail_fast = fail_fast
+        self._excluded = {}
+        if preflight is True:
+            self._health = Preflight().check(hosts=list(self.hosts), username=self.username or "ubuntu",
+                                             key=self.key)
+            self._excluded = {health.host: health.reason for health in self._health if health.healthy is False}
+            if len(self._excluded) == len(self.hosts):
+                raise ValueError(f"every host in the pool failed the pre-flight check: {self._excluded}")
+        stranded = self._queue_tasks(number_of_tasks=len(tasks), affinity=affinity or {})
+        self._usage = {host: HostUsage(host=host, tasks=0, stolen=0, busy_seconds=0.0, utilisation=0.0)
+                       for host in self.hosts}
+        results: List[Optional[TaskResult]] = [None] * len(tasks)
+        capture_output = capture_output or writer is not None
+        for index in stranded:
+            hosts = affinity[index] if isinstance(affinity[index], list) else [affinity[index]]
+            error = "; ".join(f"{host} failed the pre-flight check: {self._excluded[host]}" for host in hosts)
+            results[index] = TaskResult(index=index, host=hosts[0], return_code=None, seconds=0.0, output=None,
+                                        error=error)
+            if writer is not None:
+                writer.write_lines(index=index, lines=[error])
+                writer.finish(index=index)
+
+        with ThreadPoolExecutor(max_workers=sum(self.hosts.values())) as executor:
+            futures = [
+                executor.submit(self._work, host=host, tasks=tasks, results=results, capture_output=capture_output,
+                                writer=writer)
+                for host, slots in self.hosts.items() if host not in self._excluded for _ in range(slots)
+            ]
+            for future in futures:
+                future.result()
+
+        self._seconds = time.perf_counter() - start
+        for host, usage in self._usage.items():
+            capacity = self._seconds * self.hosts[host]
+            self._usage[host] = usage._replace(utilisation=usage.busy_seconds / capacity if capacity > 0 else 0.0)
+        return results
+
+    def usage_report(self) -> List[str]:
+        """
+        Formats the usage of every server in the last run as lines of a table.
+
+        :return: (List[str]) the lines of the table with a line per server and a total line
+        """
+        width = max(len("host"), *[len(host) for host in self.hosts])
+        lines = [f"{'host'.ljust(width)}  tasks  stolen  busy_seconds  utilisation"]
+        for usage in self.usage:
+            lines.append(f"{usage.host.ljust(width)}  {str(usage.tasks).ljust(5)}  {str(usage.stolen).ljust(6)}  "
+                         f"{usage.busy_seconds:<12.2f}  {usage.utilisation:.0%}")
+        busy_seconds = sum(usage.busy_seconds for usage in self.usage)
+        lines.append(f"{sum(usage.tasks for usage in self.usage)} tasks, {busy_seconds:.2f} busy seconds, "
+                     f"{self._seconds:.2f} seconds")
+        return lines
+
+    @property
+    def usage(self) -> List[HostUsage]:
+        return list(self._usage.values())
+
+    @property
+    def health(self) -> List[HostHealth]:
+        return self._health
+
+    @property
+    def excluded(self) -> Dict[str, str]:
+        return self._excluded
@@ -0,0 +1,98 @@
+"""
+This file defines the class that streams the output of terminal commands into each other whether they are local or on
+different servers.
+"""
+from contextlib import ExitStack
+from subprocess import PIPE, Popen
+from typing import IO, List, Optional, Union
+
+from gerund.commands.terminal_command import TerminalCommand
+from gerund.components.host_limiter import HostLimiter
+from gerund.components.output_capture import OutputCapture
+from gerund.components.progress import Progress
+
+
+class Pipeline:
+    """
+    This class is responsible for connecting the stdout of each command to the stdin of the next command with OS
+    pipes so data streams from one command to the next without ever being held in Python. A pipeline is usually
+    built with the | operator like cmd_a | cmd_b | cmd_c.
+
+    Attributes:
+        commands (List[TerminalCommand]): the stages of the pipeline in the order that data flows through them
+    """
+    def __init__(self, commands: List[TerminalCommand]) -> None:
+        """
+        The constructor for the Pipeline class.
+
+        :param commands: (List[TerminalCommand]) the stages of the pipeline in the order that data flows through them
+        """
+        if len(commands) == 0:
+            raise ValueError("a pipeline needs at least one command")
+        self.commands: List[TerminalCommand] = list(commands)
+        self._capture: Optional[OutputCapture] = None
+
+    def __or__(self, other: Union["Pipeline", TerminalCommand]) -> "Pipeline":
+        if isinstance(other, Pipeline):
+            return Pipeline(commands=self.commands + other.commands)
+        if isinstance(other, TerminalCommand):
+            return Pipeline(commands=self.commands + [other])
+        return NotImplemented
+
+    def wait(self, capture_output: bool = False) -> Optional[List[str]]:
+        """
+        Starts every stage of the pipeline and waits for all of them to finish. Each remote stage holds a connection
+        slot for its server for the lifetime of the pipeline. The slots are taken once per server in sorted order, so
+        stages on the same server or pipelines crossing the same servers cannot deadlock each other. The environment
+        variables of the remote stages are uploaded before the slots are taken as the upload needs a slot of its own.
+        If a stage cannot be started the stages already running are terminated and waited for.
+
+        :param capture_output: (bool) if True, will capture output of the last command
+        :return: (Optional[List[str]]) the captured output of the last command if capture_output is True
+        """
+        prepared = [command._prepare_start() for command in self.commands]
+        with ExitStack() as stack:
+            hosts = sorted({str(command.ip_address) for command in self.commands if command.ip_address is not None})
+            for ip_address in hosts:
+                stack.enter_context(HostLimiter().acquire(ip_address=ip_address))
+
+            previous_stdout: Optional[IO[bytes]] = None
+            process: Optional[Popen] = None
+            started: List[TerminalCommand] = []
+            try:
+                for index, command in enumerate(self.commands):
+                    last_stage: bool = index == len(self.commands) - 1
+                    stdout: Optional[int] = PIPE if last_stage is False or capture_output is True else None
+                    process = command._start(stdin=previous_stdout, stdout=stdout, prepared=prepared[index])
+                    started.append(command)
+
+                    # the parent's copy of the pipe is closed so the writing stage gets SIGPIPE if the reader exits
+                    # early
+                    if previous_stdout is not None:
+                        previous_stdout.close()
+                    previous_stdout = process.stdout if last_stage is False else None
+            except BaseException:
+                if previous_stdout is not None:
+                    previous_stdout.close()
+                for command in started:
+                    command.terminate()
+                    command._finish()
+                raise
+
+            if capture_output is True:
+                self._capture = OutputCapture(on_line=Progress().on_line())
+                self._capture.read(process=process)
+
+            for command in self.commands:
+                command._finish()
+
+        if capture_output is True:
+            return self._capture.stdout
+
+    @property
+    def return_codes(self) -> List[Optional[int]]:
+        return [command.return_code for command in self.commands]
+
+    @property
+    def output(self) -> Optional[OutputCapture]:
+        return self._capture
@@ -1,45 +1,128 @@
 """
 This file defines the class that compiles and runs terminal commands locally or on a server.
 """
-from subprocess import Popen, PIPE
-from typing import Optional, List
+import os
+import signal
+import sys
+import time
+import uuid
+import zlib
+from subprocess import DEVNULL, Popen, PIPE, STDOUT
+from typing import IO, Callable, Dict, Optional, List, Tuple, Union, TYPE_CHECKING
 
+from gerund.components.admission_controller import AdmissionController
+from gerund.components.builtin_step import BuiltinStep
 from gerund.components.command_string import CommandString
+from gerund.components.fail_fast import FailFast
+from gerund.components.host_limiter import HostLimiter
+from gerund.components.input_stream import InputData, InputStream
+from gerund.components.journal import JournalChain
+from gerund.components.metrics import Metrics, current_config
+from gerund.components.output_capture import OutputCapture, OutputLine
+from gerund.components.placement import Placement
+from gerund.components.progress import Progress
+from gerund.components.remote_environment import RemoteEnvironment
+from gerund.components.result_cache import ResultCache
+from gerund.components.ssh_options import SshOptions
+from gerund.components.tracer import Tracer
 from gerund.components.variable import Variable
-from gerund.enums import InputCmd, EnvVars
+from gerund.enums import InputCmd, EnvVars, Compression
+
+if TYPE_CHECKING:
+    from gerund.commands.pipeline import Pipeline
 
 
 class TerminalCommand:
     """
     This class is responsible for compiling a terminal command with environment variables and running it locally or on
-    a server.
+    a server. A chain of commands can hold built-in steps, and the built-in steps at the start of a local chain are run
+    in Python before the rest of the chain is started in a shell, or without a shell at all if the whole chain is
+    built-in steps. Every other built-in step is folded into the shell of the chain.
 
     Attributes:
         environment_variables (Optional[Dict[str, str]]): environment variables to be loaded into the command if present
         ip_address (Optional[str]): the IP address that the command is going to be run on if present
         key (Optional[str]): path to key however, not yet used
         username (str): the username for the server (default is "ubuntu")
+        cache (Optional[ResultCache]): the cache that results are replayed from and stored in if present
+        input_files (Optional[List[str]]): paths to local files the command reads which are hashed into the cache key
+        compression (Optional[Compression]): the compression of the output sent back from the server if present
+        working_directory (Optional[str]): the directory a local command is run in, None uses the current directory
+        fail_fast (Optional[FailFast]): the policy that terminates the command if its batch is cancelled
+        memory (Optional[int]): the memory in megabytes a local command expects to use which holds it back until the
+                                machine has room for it
+        cpus (Optional[float]): the number of CPUs a local command expects to use which holds it back until the
+                                machine has room for it
+        placement (Optional[Placement]): the CPUs, priority, and cgroup a local command is placed in
+        journal (Optional[JournalChain]): the steps of a config the command is recorded in as one step, and skipped
+                                          if the journal is resuming and has the step as completed
+        input (Optional[InputData]): bytes, a binary file object, or an iterable of bytes chunks streamed into the
+                                     stdin of the command which is sent through the ssh connection for remote commands
+        on_line (Optional[Callable[[OutputLine], None]]): called with every line of captured output as soon as it is
+                                                          read, including lines replayed from the cache
     """
     def __init__(self, command: InputCmd, environment_variables: EnvVars = None,
                  ip_address: Optional[str] = None, key: Optional[str] = None,
-                 username: str = "ubuntu") -> None:
+                 username: str = "ubuntu", cache: Optional[ResultCache] = None,
+                 input_files: Optional[List[str]] = None,
+                 compression: Optional[Union[str, Compression]] = None,
+                 working_directory: Optional[str] = None, fail_fast: Optional[FailFast] = None,
+                 memory: Optional[int] = None, cpus: Optional[float] = None,
+                 placement: Optional[Placement] = None, journal: Optional[JournalChain] = None,
+                 input: Optional[InputData] = None,
+                 on_line: Optional[Callable[[OutputLine], None]] = None) -> None:
         """
         The constructor for the TerminalCommand class.
 
-        :param command: (Union[str, List[str]]) command or a series of commands to be run
+        :param command: (Union[str, List[Union[str, BuiltinStep]]]) command or a series of commands and built-in
+                        steps to be run
         :param environment_variables: (Optional[Dict[str, str]]) environment variables to be loaded into the command
         :param ip_address: (Optional[str]) the IP address that the command is going to be run on if present
         :param key: (Optional[str]) path to key however, not yet used
         :param username: (str) the username for the server (default is "ubuntu")
+        :param cache: (Optional[ResultCache]) the cache that results are replayed from and stored in if present
+        :param input_files: (Optional[List[str]]) paths to local files the command reads for the cache key
+        :param compression: (Optional[Union[str, Compression]]) "ssh" or "gzip" to compress the output sent back from
+                            the server
+        :param working_directory: (Optional[str]) the directory a local command is run in, None uses the current
+                                  directory
+        :param fail_fast: (Optional[FailFast]) the policy that terminates the command if its batch is cancelled
+        :param memory: (Optional[int]) the memory in megabytes a local command expects to use
+        :param cpus: (Optional[float]) the number of CPUs a local command expects to use
+        :param placement: (Optional[Placement]) the CPUs, priority, and cgroup a local command is placed in
+        :param journal: (Optional[JournalChain]) the steps of a config the command is recorded in as one step
+        :param input: (Optional[InputData]) bytes, a binary file object, or an iterable of bytes chunks streamed into
+                      the stdin of the command
+        :param on_line: (Optional[Callable[[OutputLine], None]]) called with every line of captured output as soon as
+                        it is read
         """
         self._process: Optional[Popen] = None
+        self._decoder: Optional[Popen] = None
+        self._return_code: Optional[int] = None
+        self._capture: Optional[OutputCapture] = None
         self._command_str: Optional[str] = None
-        self._command_buffer: Optional[List[str]] = None
+        self._command_buffer: Optional[List[Union[str, BuiltinStep]]] = None
         self._remote: Optional[bool] = None
+        self._builtins: List[BuiltinStep] = []
+        self._builtin_directory: Optional[str] = None
         self.environment_variables: EnvVars = environment_variables
         self.ip_address: Optional[str] = ip_address
         self.key: Optional[str] = key
         self.username: str = username
+        self.cache: Optional[ResultCache] = cache
+        self.input_files: Optional[List[str]] = input_files
+        self.compression: Optional[Compression] = Compression(compression) if compression is not None else None
+        self.working_directory: Optional[str] = working_directory
+        self.fail_fast: Optional[FailFast] = fail_fast
+        self.memory: Optional[int] = int(memory) if memory is not None else None
+        self.cpus: Optional[float] = float(cpus) if cpus is not None else None
+        self.placement: Optional[Placement] = placement
+        self.journal: Optional[JournalChain] = journal
+        self.input: Optional[InputData] = input
+        self.on_line: Optional[Callable[[OutputLine], None]] = on_line
+        self._queue_seconds: Optional[float] = None
+        self._opened_at: Optional[float] = None
+        self._run_id: str = uuid.uuid4().hex[:16]
         self._process_input(command=command)
         self._process_remote()
 
@@ -53,13 +136,17 @@ class TerminalCommand:
         if isinstance(command, str):
             self._command_str = command
         elif isinstance(command, list):
+            for step in command:
+                if not isinstance(step, (str, BuiltinStep)):
+                    raise ValueError(f"{type(step)} is not supported for a step in a chain of commands")
             self._command_buffer = command
         else:
             raise ValueError(f"{type(command)} is not supported for a command")
 
     def _process_remote(self) -> None:
         """
-        Defines if the command is a remote command or not based on the self.ip_address.
+        Defines if the command is a remote command or not based on the self.ip_address, and works out again which
+        built-in steps are run in Python as a command pointed at a server runs all of its steps there.
 
         :return: None
         """
@@ -69,85 +156,519 @@ class TerminalCommand:
             raise ValueError("key supplied but IP address not supplied")
         else:
             self._remote = False
+        self._split_builtins()
+
+    def _split_builtins(self) -> None:
+        """
+        Populates self._builtins with the built-in steps at the start of a local chain which are run in Python.
 
-    def _process_variables(self) -> Optional[str]:
+        :return: None
         """
-        Packages the environment variables from self.environment_variables into a series of commands creating
-        environment variables for the command session.
+        self._builtins = []
+        if self._remote is True or self._command_buffer is None:
+            return
+        for step in self._command_buffer:
+            if not isinstance(step, BuiltinStep):
+                break
+            self._builtins.append(step)
 
-        :return: (Optional[str]) a string of commands that exports the variables as environment variables
+    def _resolve_variables(self) -> Dict[str, str]:
+        """
+        Resolves the values of all the environment variables in one pass with each distinct value only resolved once
+        even if it is used by several variables.
+
+        :return: (Dict[str, str]) the environment variables with their resolved values
         """
         if self.environment_variables is None:
-            return None
-        if len(self.environment_variables.keys()) == 0:
-            return None
+            return {}
 
-        buffer: List[str] = []
+        resolved_values: Dict[str, str] = {}
+        environment: Dict[str, str] = {}
 
-        for key in self.environment_variables.keys():
-            variable: Variable = Variable(self.environment_variables[key])
-            command: str = f'export {key}="{variable}"'
-            buffer.append(command)
-            buffer.append("&&")
+        for key, value in self.environment_variables.items():
+            cache_key = str(value)
+            if cache_key not in resolved_values:
+                resolved_values[cache_key] = str(Variable(value).value)
+            environment[key] = resolved_values[cache_key]
+        return environment
 
-        return " ".join(buffer[:-1])
+    def _process_variables(self, environment: Optional[Dict[str, str]] = None) -> Optional[str]:
+        """
+        Packages the resolved environment variables into a block of export lines that is uploaded to the server and
+        sourced by remote commands.
 
-    def _process_command(self) -> str:
+        :param environment: (Optional[Dict[str, str]]) the resolved environment variables, resolved if not passed in
+        :return: (Optional[str]) the lines exporting the variables or None if there are no variables
         """
-        Processes the input commands into a series of commands that can be executed in a process.
+        if environment is None:
+            environment = self._resolve_variables()
+        if len(environment) == 0:
+            return None
+        return RemoteEnvironment.build_block(environment=environment)
 
-        :return: (str) the command can be executed in a command
+    def _process_command(self, fold_builtins: bool = False) -> str:
+        """
+        Processes the input commands into a series of commands that can be executed in a process. Built-in steps are
+        rendered as shell apart from the ones that are run in Python.
+
+        :param fold_builtins: (bool) if True the built-in steps run in Python are rendered as shell as well
+        :return: (str) the command can be executed in a command, empty if every step is run in Python
         """
         if self._command_buffer is not None:
-            return " && ".join(self._command_buffer)
+            steps = self._command_buffer if fold_builtins is True else self._command_buffer[len(self._builtins):]
+            return " && ".join(step.to_shell(remote=self._remote) if isinstance(step, BuiltinStep) else step
+                               for step in steps)
         return self._command_str
 
-    def _compile_command(self) -> str:
+    def _key_command(self, compiled_command: str) -> str:
+        """
+        Gets the command that identifies the run in the cache and the journal, which includes the built-in steps that
+        are run in Python.
+
+        :param compiled_command: (str) the executable command for the entire process
+        :return: (str) the command with the built-in steps run in Python in front of it
+        """
+        if len(self._builtins) == 0:
+            return compiled_command
+        return " && ".join([step.to_shell() for step in self._builtins] + [compiled_command])
+
+    def _compile_command(self, environment: Optional[Dict[str, str]] = None, fold_builtins: bool = False) -> str:
         """
-        Compiles all the commands and environment variables into an executable command.
+        Compiles all the commands into an executable command. Local commands get their environment variables from the
+        process environment, and remote commands source a file of environment variables uploaded to the server so the
+        size of the command does not grow with the number of variables.
 
+        :param environment: (Optional[Dict[str, str]]) the resolved environment variables, resolved if not passed in
+        :param fold_builtins: (bool) if True the built-in steps at the start of a local chain are compiled as shell
+                              instead of being left to run in Python
         :return: (str) the executable command for the entire process
         """
         buffer: List[str] = []
-        vars_command: Optional[str] = self._process_variables()
         # TODO => add verbose command option "-o LogLevel=DEBUG"
-        ssh_options: str = "-o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null"
+        ssh_options: str = SshOptions().options
+
+        ssh_flags: str = "-A -C" if self.compression is Compression.SSH else "-A"
 
         if self.key is None:
-            command_prefix = f"ssh -A {ssh_options}"
+            command_prefix = f"ssh {ssh_flags} {ssh_options}"
         else:
-            command_prefix = f"ssh -A {ssh_options} -i '{self.key}'"
+            command_prefix = f"ssh {ssh_flags} {ssh_options} -i '{self.key}'"
 
         if self._remote is True:
             buffer.append(f"{command_prefix} {self.username}@{self.ip_address}")
             buffer.append("'")
+            if self._compressed_output is True:
+                buffer.append("set -o pipefail; (")
 
-        if vars_command is not None:
-            buffer.append(vars_command)
-            buffer.append("&&")
-        buffer.append(str(CommandString(self._process_command())))
+            vars_block: Optional[str] = self._process_variables(environment=environment)
+            if vars_block is not None:
+                buffer.append(f". {RemoteEnvironment.path_for(block=vars_block)}")
+                buffer.append("&&")
+        buffer.append(str(CommandString(self._process_command(fold_builtins=fold_builtins))))
 
         if self._remote is True:
+            if self._compressed_output is True:
+                buffer.append(") | gzip -c")
             buffer.append("'")
         return " ".join(buffer)
 
-    def wait(self, capture_output: bool = False) -> Optional[List[str]]:
+    def _prepare_environment(self, environment: Dict[str, str]) -> Optional[Dict[str, str]]:
+        """
+        Gets the environment variables ready for the process. Remote commands have their variables uploaded to the
+        server if needed and local commands get the variables merged into a copy of the current environment.
+
+        :param environment: (Dict[str, str]) the resolved environment variables
+        :return: (Optional[Dict[str, str]]) the environment for a local process or None to inherit the environment
+        """
+        if len(environment) == 0:
+            return None
+        if self._remote is True:
+            RemoteEnvironment().upload(block=self._process_variables(environment=environment),
+                                       ip_address=self.ip_address, username=self.username, key=self.key)
+            return None
+        process_environment = os.environ.copy()
+        process_environment.update(environment)
+        return process_environment
+
+    def wait(self, capture_output: bool = False, capture_stderr: bool = False,
+             merge_stderr: bool = False) -> Optional[List[str]]:
         """
-        Compiles and runs the command.
+        Compiles and runs the command. When output is captured both streams are read at the same time so the command
+        cannot block on a full pipe, and the captured lines with their timestamps and stream tags are available from
+        the self.output property afterwards. Input is written to the stdin of the command by the same loop as the
+        output is read, and a command with input is never replayed from the cache as the input can only be read once.
+        If the command has a journal that is resuming and has the command as
+        completed the command is not run and has no output.
 
         :param capture_output: (bool) if True, will capture output of the command
-        :return: (Optional[List[str]])
+        :param capture_stderr: (bool) if True and output is captured, stderr is captured separately from stdout
+        :param merge_stderr: (bool) if True and output is captured, stderr is merged into stdout and returned with it
+        :return: (Optional[List[str]]) the captured stdout lines if capture_output is True
+        """
+        with Tracer().span("terminal_command.compile"):
+            environment: Dict[str, str] = self._resolve_variables()
+            compiled_command: str = self._compile_command(environment=environment)
+        stderr: Optional[int] = None
+        if merge_stderr is True:
+            stderr = STDOUT
+        elif capture_stderr is True:
+            stderr = PIPE
+        if merge_stderr is True and self._compressed_output is True:
+            raise ValueError("merge_stderr is not supported with gzip compression")
+        if self.input is not None and self._compressed_output is True and capture_output is False:
+            raise ValueError("input is only supported with gzip compression if the output is captured")
+
+        if self.journal is None:
+            return self._run_or_replay(compiled_command=compiled_command, capture_output=capture_output,
+                                       stderr=stderr, environment=environment)
+
+        journal_key: str = self.journal.build_key(command=self._key_command(compiled_command=compiled_command),
+                                                  environment_variables=environment,
+                                                  ip_address=self.ip_address,
+                                                  working_directory=self.working_directory)
+        if self.journal.completed(key=journal_key) is True:
+            self._return_code = 0
+            return [] if capture_output is True else None
+
+        start = time.perf_counter()
+        output = self._run_or_replay(compiled_command=compiled_command, capture_output=capture_output,
+                                     stderr=stderr, environment=environment)
+        self.journal.record(key=journal_key, command=compiled_command, return_code=self._return_code,
+                            seconds=time.perf_counter() - start)
+        return output
+
+    def _run_or_replay(self, compiled_command: str, capture_output: bool, stderr: Optional[int] = None,
+                       environment: Optional[Dict[str, str]] = None) -> Optional[List[str]]:
+        """
+        Runs the compiled command or replays its result from the cache if the command has a cache, has no input, and
+        the result is stored.
+
+        :param compiled_command: (str) the executable command for the entire process
+        :param capture_output: (bool) if True, will capture output of the command
+        :param stderr: (Optional[int]) PIPE to capture stderr, STDOUT to merge it into stdout, None to print it
+        :param environment: (Optional[Dict[str, str]]) the resolved environment variables of the command
+        :return: (Optional[List[str]]) the captured output if capture_output is True
+        """
+        if self.cache is None or self.input is not None:
+            return self._execute(compiled_command=compiled_command, capture_output=capture_output, stderr=stderr,
+                                 environment=environment)
+
+        with Tracer().span("result_cache.lookup"):
+            cache_key: str = self.cache.build_key(command=self._key_command(compiled_command=compiled_command),
+                                                  environment_variables=environment,
+                                                  ip_address=self.ip_address, input_files=self.input_files,
+                                                  working_directory=None if self._remote is True else
+                                                  os.path.abspath(self.working_directory or os.getcwd()))
+            cached_result: Optional[dict] = self.cache.get(key=cache_key)
+
+        if cached_result is None:
+            output = self._execute(compiled_command=compiled_command, capture_output=True, stderr=stderr,
+                                   environment=environment)
+            self.cache.put(key=cache_key, output=output, return_code=self._return_code)
+        else:
+            output = cached_result["output"]
+            self._return_code = cached_result["return_code"]
+            if capture_output is True and self.on_line is not None:
+                for line in output:
+                    self.on_line(OutputLine(timestamp=time.time(), stream="stdout", text=line))
+
+        if capture_output is True:
+            return output
+        for line in output:
+            print(line)
+
+    def _execute(self, compiled_command: str, capture_output: bool, stderr: Optional[int] = None,
+                 environment: Optional[Dict[str, str]] = None) -> Optional[List[str]]:
+        """
+        Runs the compiled command holding a connection slot for the server if the command is remote, or waiting for
+        the admission controller to make room if the command is local and has declared its memory or CPUs. The
+        built-in steps at the start of a local chain are run first, and no process is started if they fail or if
+        they are the whole chain.
+
+        :param compiled_command: (str) the executable command for the entire process
+        :param capture_output: (bool) if True, will capture output of the command
+        :param stderr: (Optional[int]) PIPE to capture stderr, STDOUT to merge it into stdout, None to print it
+        :param environment: (Optional[Dict[str, str]]) the resolved environment variables of the command
+        :return: (Optional[List[str]]) the captured output if capture_output is True
+        """
+        with Tracer().span("terminal_command.execute", host=self.ip_address or "local"):
+            process_environment = self._prepare_environment(environment=environment or {})
+            if self.fail_fast is not None:
+                self.fail_fast.register(command=self)
+            start = time.perf_counter()
+            self._capture = None
+            try:
+                if len(self._builtins) > 0:
+                    with Tracer().span("terminal_command.builtins", steps=len(self._builtins)):
+                        process_environment = self._run_builtins(environment=process_environment,
+                                                                 capture_output=capture_output)
+                    if self._return_code != 0 or compiled_command == "":
+                        return self._capture.stdout if capture_output is True else None
+                if self._remote is True:
+                    with HostLimiter().acquire(ip_address=self.ip_address):
+                        return self._run(compiled_command=compiled_command, capture_output=capture_output,
+                                         stderr=stderr)
+                if self.memory is not None or self.cpus is not None:
+                    with AdmissionController().admit(memory_mb=self.memory or 0, cpus=self.cpus or 1.0,
+                                                     name=compiled_command[:80]) as admission:
+                        self._queue_seconds = admission.wait_seconds
+                        return self._run(compiled_command=compiled_command, capture_output=capture_output,
+                                         stderr=stderr, env=process_environment)
+                return self._run(compiled_command=compiled_command, capture_output=capture_output, stderr=stderr,
+                                 env=process_environment)
+            finally:
+                if self.fail_fast is not None:
+                    self.fail_fast.unregister(command=self)
+                self._record_metrics(seconds=time.perf_counter() - start)
+
+    def _run_builtins(self, environment: Optional[Dict[str, str]],
+                      capture_output: bool) -> Optional[Dict[str, str]]:
+        """
+        Runs the built-in steps at the start of a local chain in Python. The lines they print are captured if the
+        output is captured and printed if not, and a step that fails prints its error to stderr and stops the chain
+        with an exit code of 1 like the shell would.
+
+        :param environment: (Optional[Dict[str, str]]) the environment for the process, None inherits the environment
+        :param capture_output: (bool) if True the printed lines are captured
+        :return: (Optional[Dict[str, str]]) the environment for the rest of the chain with the exported variables
+        """
+        directory = os.path.abspath(self.working_directory or os.getcwd())
+        process_environment = dict(environment if environment is not None else os.environ)
+        if capture_output is True:
+            self._capture = self._new_capture()
+        self._return_code = 0
+        for step in self._builtins:
+            try:
+                directory, line = step.run(working_directory=directory, environment=process_environment)
+            except (OSError, ValueError) as error:
+                print(f"{step.kind}: {error}", file=sys.stderr)
+                self._return_code = 1
+                break
+            if line is None:
+                continue
+            if capture_output is True:
+                self._capture.add(stream="stdout", text=line)
+            else:
+                print(line)
+        self._builtin_directory = directory
+        return process_environment
+
+    def _new_capture(self) -> OutputCapture:
+        """
+        Creates the capture for the output of the command which passes every line to the progress view and to
+        self.on_line.
+
+        :return: (OutputCapture) the capture
+        """
+        progress_on_line = Progress().on_line()
+        if progress_on_line is None or self.on_line is None:
+            return OutputCapture(on_line=progress_on_line or self.on_line)
+        on_line = self.on_line
+
+        def both(line: OutputLine) -> None:
+            progress_on_line(line)
+            on_line(line)
+
+        return OutputCapture(on_line=both)
+
+    def _record_metrics(self, seconds: float) -> None:
+        """
+        Records the run of the command in the metrics registry.
+
+        :param seconds: (float) the time taken to run the command
+        :return: None
+        """
+        metrics = Metrics()
+        labels = {"host": self.ip_address or "local", "config": current_config.get()}
+        metrics.inc("gerund_commands_total", **labels)
+        if self._return_code != 0:
+            metrics.inc("gerund_command_failures_total", **labels)
+        metrics.observe("gerund_command_duration_seconds", seconds, **labels)
+        if self._capture is not None:
+            metrics.inc("gerund_output_bytes_total", sum(len(line.text) + 1 for line in self._capture.lines), **labels)
+            if self._remote is True and self._capture.first_read is not None:
+                metrics.observe("gerund_ssh_connect_seconds", self._capture.first_read - self._opened_at,
+                                host=self.ip_address)
+
+    def _open_process(self, compiled_command: str, **kwargs) -> Popen:
+        """
+        Starts the compiled command in a process. Commands under a fail fast policy get their own process group so
+        the command and all of its children can be terminated together, and remote commands are tagged with the run
+        ID so their session on the server can be found and terminated as well. Local commands with a placement are
+        pinned, reprioritised, and moved into their cgroup by their shell before the command starts.
+
+        :param compiled_command: (str) the executable command for the entire process
+        :param kwargs: the pipes and environment passed to Popen
+        :return: (Popen) the started process
+        """
+        if self.fail_fast is not None and self._remote is True:
+            login = f"{self.username}@{self.ip_address} '"
+            compiled_command = compiled_command.replace(login, f"{login} : gerund-run-{self._run_id};", 1)
+        if self.placement is not None and self._remote is False:
+            self.placement.prepare()
+            compiled_command = self.placement.command_prefix() + compiled_command
+
+        self._opened_at = time.time()
+        self._process = Popen(compiled_command, shell=True, cwd=self._process_directory,
+                              start_new_session=self.fail_fast is not None, **kwargs)
+        # the batch may have been cancelled while the process was starting
+        if self.fail_fast is not None and self.fail_fast.cancelled is True:
+            self.terminate()
+        return self._process
+
+    def terminate(self) -> None:
+        """
+        Stops the command if it is running. A remote command under a fail fast policy has its session on the server
+        terminated before the local ssh process, and a local command under a fail fast policy has its whole process
+        group terminated.
+
+        :return: None
+        """
+        if self._remote is True and self.fail_fast is not None:
+            ssh_options: str = SshOptions().options
+            if self.key is not None:
+                ssh_options += f" -i '{self.key}'"
+            remote_command = f'for pid in $(pgrep -f "[g]erund-run-{self._run_id}"); ' \
+                             f'do kill -TERM -- -$pid 2>/dev/null || kill -TERM $pid; done'
+            Popen(f"ssh {ssh_options} {self.username}@{self.ip_address} '{remote_command}'", shell=True,
+                  stdout=DEVNULL, stderr=DEVNULL).wait()
+
+        if self._process is None or self._process.poll() is not None:
+            return
+        try:
+            if self.fail_fast is not None:
+                os.killpg(self._process.pid, signal.SIGTERM)
+            else:
+                self._process.terminate()
+        except ProcessLookupError:
+            pass
+
+    def _run(self, compiled_command: str, capture_output: bool, stderr: Optional[int] = None,
+             env: Optional[Dict[str, str]] = None) -> Optional[List[str]]:
         """
-        compiled_command: str = self._compile_command()
+        Runs the compiled command in a process.
 
+        :param compiled_command: (str) the executable command for the entire process
+        :param capture_output: (bool) if True, will capture output of the command
+        :param stderr: (Optional[int]) PIPE to capture stderr, STDOUT to merge it into stdout, None to print it
+        :param env: (Optional[Dict[str, str]]) the environment of the process, None inherits the current environment
+        :return: (Optional[List[str]]) the captured output if capture_output is True
+        """
+        stdin: Optional[int] = PIPE if self.input is not None else None
+        input_stream: Optional[InputStream] = InputStream(data=self.input) if self.input is not None else None
         if capture_output is True:
-            self._process = Popen(compiled_command, shell=True, stdout=PIPE)
-            _ = self._process.wait()
-            return self._process.communicate()[0].decode().split("\n")[:-1]
+            self._open_process(compiled_command=compiled_command, stdin=stdin, stdout=PIPE, stderr=stderr, env=env)
+            if self._capture is None:
+                self._capture = self._new_capture()
+            with Tracer().span("terminal_command.read_output"):
+                self._capture.read(process=self._process, decompress_stdout=self._compressed_output,
+                                   input_stream=input_stream)
+            self._process.wait()
+            self._return_code = self._process.returncode
+            return self._capture.stdout
+        elif input_stream is not None:
+            self._open_process(compiled_command=compiled_command, stdin=stdin, env=env)
+            with Tracer().span("terminal_command.write_input"):
+                OutputCapture().read(process=self._process, input_stream=input_stream)
+            self._process.wait()
+            self._return_code = self._process.returncode
+        elif self._compressed_output is True:
+            self._open_process(compiled_command=compiled_command, stdout=PIPE, env=env)
+            self._write_decompressed_output()
+            self._process.wait()
+            self._return_code = self._process.returncode
         else:
-            self._process = Popen(compiled_command, shell=True)
+            self._open_process(compiled_command=compiled_command, env=env)
             self._process.wait()
+            self._return_code = self._process.returncode
+
+    def _write_decompressed_output(self) -> None:
+        """
+        Decodes the gzip stream from the stdout of self._process and writes it to stdout as it arrives.
+
+        :return: None
+        """
+        decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+        for chunk in iter(lambda: self._process.stdout.read1(65536), b""):
+            sys.stdout.buffer.write(decompressor.decompress(chunk))
+            sys.stdout.buffer.flush()
+        sys.stdout.buffer.write(decompressor.flush())
+        sys.stdout.buffer.flush()
+        self._process.stdout.close()
+
+    def _prepare_start(self) -> Tuple[str, Optional[Dict[str, str]]]:
+        """
+        Compiles the command and gets its environment ready for self._start. A remote command has its environment
+        variables uploaded here, so callers that hold a connection slot for the server while the command runs can
+        prepare it before taking the slot.
+
+        :return: (Tuple[str, Optional[Dict[str, str]]]) the executable command and the environment for a local process
+        """
+        environment = self._resolve_variables()
+        compiled_command = self._compile_command(environment=environment, fold_builtins=True)
+        return compiled_command, self._prepare_environment(environment=environment)
+
+    def _start(self, stdin: Optional[IO[bytes]] = None, stdout: Optional[int] = None,
+               prepared: Optional[Tuple[str, Optional[Dict[str, str]]]] = None) -> Popen:
+        """
+        Compiles and starts the command in a process without waiting for it to finish. If the output is compressed
+        it is decoded by a local gzip process and that process is returned as its stdout is the output of the command.
+
+        :param stdin: (Optional[IO[bytes]]) the pipe that the command reads from, None inherits the stdin
+        :param stdout: (Optional[int]) PIPE to read the output of the command, None inherits the stdout
+        :param prepared: (Optional[Tuple[str, Optional[Dict[str, str]]]]) the result of self._prepare_start, which is
+                         called here if not passed in
+        :return: (Popen) the process that the output of the command comes from
+        """
+        compiled_command, env = prepared if prepared is not None else self._prepare_start()
+
+        if self._compressed_output is False:
+            return self._open_process(compiled_command=compiled_command, stdin=stdin, stdout=stdout, env=env)
+
+        self._open_process(compiled_command=compiled_command, stdin=stdin, stdout=PIPE, env=env)
+        self._decoder = Popen(["gzip", "-dc"], stdin=self._process.stdout, stdout=stdout)
+        self._process.stdout.close()
+        return self._decoder
+
+    def _finish(self) -> Optional[int]:
+        """
+        Waits for the process started by self._start to finish.
+
+        :return: (Optional[int]) the exit code of the command
+        """
+        if self._decoder is not None:
+            self._decoder.wait()
+            self._decoder = None
+        self._process.wait()
+        self._return_code = self._process.returncode
+        return self._return_code
+
+    def __or__(self, other: Union["TerminalCommand", "Pipeline"]) -> "Pipeline":
+        from gerund.commands.pipeline import Pipeline
+        return Pipeline(commands=[self]) | other
+
+    @property
+    def queue_seconds(self) -> Optional[float]:
+        return self._queue_seconds
+
+    @property
+    def _process_directory(self) -> Optional[str]:
+        if self._remote is True:
+            return None
+        return self._builtin_directory or self.working_directory
+
+    @property
+    def _compressed_output(self) -> bool:
+        return self._remote is True and self.compression is Compression.GZIP
 
     @property
     def process(self) -> Popen:
         return self._process
+
+    @property
+    def return_code(self) -> Optional[int]:
+        return self._return_code
+
+    @property
+    def output(self) -> Optional[OutputCapture]:
+        return self._capture
@@ -0,0 +1,169 @@
+"""
+This file defines the controller that holds back local commands until the machine has the memory and CPU free to run
+them.
+"""
+import itertools
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from threading import Condition
+from typing import Deque, Iterator, List, NamedTuple, Optional, Tuple
+
+from gerund.components.local_variable_storage import Singleton
+from gerund.components.tracer import Tracer
+
+
+class Admission(NamedTuple):
+    """
+    A task that has been let through the admission controller.
+
+    Attributes:
+        name (str): the name of the task
+        memory_mb (int): the memory the task declared in megabytes
+        cpus (float): the number of CPUs the task declared
+        wait_seconds (float): the time the task waited in the queue before it was let through
+    """
+    name: str
+    memory_mb: int
+    cpus: float
+    wait_seconds: float
+
+
+class AdmissionController(metaclass=Singleton):
+    """
+    This class is responsible for delaying local tasks until there is room for them on the machine. Room is worked out
+    from /proc/loadavg and /proc/meminfo along with the memory and CPUs reserved by the tasks already running, so tasks
+    started at the same time do not all see the same free memory. When several tasks are waiting the largest one that
+    fits goes first so big tasks are not left waiting behind a stream of small ones. A task is always let through when
+    nothing else is running so a task bigger than the machine still runs.
+
+    Attributes:
+        memory_headroom_mb (int): the memory in megabytes that is always left free
+        max_load (float): the load that running tasks are not allowed to push the machine over, defaults to the number
+                          of CPUs
+        poll_interval (float): how often in seconds waiting tasks check the machine again
+        proc_path (str): the path that loadavg and meminfo are read from
+        history (Deque[Admission]): the most recent tasks let through with how long they waited
+    """
+    def __init__(self, memory_headroom_mb: int = 256, max_load: Optional[float] = None, poll_interval: float = 0.25,
+                 proc_path: str = "/proc") -> None:
+        """
+        The constructor for the AdmissionController class.
+
+        :param memory_headroom_mb: (int) the memory in megabytes that is always left free (default 256)
+        :param max_load: (Optional[float]) the load that running tasks are not allowed to push the machine over,
+                         None uses the number of CPUs
+        :param poll_interval: (float) how often in seconds waiting tasks check the machine again (default 0.25)
+        :param proc_path: (str) the path that loadavg and meminfo are read from (default /proc)
+        """
+        self.memory_headroom_mb: int = memory_headroom_mb
+        self.max_load: float = float(max_load) if max_load is not None else float(os.cpu_count() or 1)
+        self.poll_interval: float = poll_interval
+        self.proc_path: str = proc_path
+        self.history: Deque[Admission] = deque(maxlen=1000)
+        self._condition: Condition = Condition()
+        self._reserved_memory_mb: int = 0
+        self._reserved_cpus: float = 0.0
+        self._running: int = 0
+        self._waiting: List[Tuple[int, float, int]] = []
+        self._tickets = itertools.count()
+
+    def read_load(self) -> float:
+        """
+        Reads the load average over the last minute.
+
+        :return: (float) the load average or 0.0 if it cannot be read
+        """
+        try:
+            with open(f"{self.proc_path}/loadavg", "r") as file:
+                return float(file.read().split()[0])
+        except (OSError, ValueError, IndexError):
+            return 0.0
+
+    def read_memory(self) -> Optional[Tuple[int, int]]:
+        """
+        Reads the total and available memory.
+
+        :return: (Optional[Tuple[int, int]]) the total and available memory in megabytes or None if it cannot be read
+        """
+        values = {}
+        try:
+            with open(f"{self.proc_path}/meminfo", "r") as file:
+                for line in file:
+                    key, _, value = line.partition(":")
+                    if key in ("MemTotal", "MemAvailable"):
+                        values[key] = int(value.split()[0]) // 1024
+        except (OSError, ValueError, IndexError):
+            return None
+        if len(values) < 2:
+            return None
+        return values["MemTotal"], values["MemAvailable"]
+
+    def _fits(self, memory_mb: int, cpus: float, load: float, memory: Optional[Tuple[int, int]]) -> bool:
+        """
+        Checks if a task fits on the machine on top of the tasks already running.
+
+        :param memory_mb: (int) the memory the task declared in megabytes
+        :param cpus: (float) the number of CPUs the task declared
+        :param load: (float) the load average of the machine
+        :param memory: (Optional[Tuple[int, int]]) the total and available memory of the machine in megabytes
+        :return: (bool) True if the task can be let through
+        """
+        if self._running == 0:
+            return True
+        if max(load, self._reserved_cpus) + cpus > self.max_load:
+            return False
+        if memory is not None:
+            total, available = memory
+            free = min(available, total - self._reserved_memory_mb) - self.memory_headroom_mb
+            if memory_mb > free:
+                return False
+        return True
+
+    def _next_ticket(self) -> Optional[int]:
+        """
+        Works out which waiting task is let through next by going through them from the largest to the smallest.
+
+        :return: (Optional[int]) the ticket of the task let through next or None if none of them fit
+        """
+        load = self.read_load()
+        memory = self.read_memory()
+        for memory_mb, cpus, ticket in sorted(self._waiting, key=lambda i: (-i[0], -i[1], i[2])):
+            if self._fits(memory_mb=memory_mb, cpus=cpus, load=load, memory=memory):
+                return ticket
+        return None
+
+    @contextmanager
+    def admit(self, memory_mb: int = 0, cpus: float = 1.0, name: str = "task") -> Iterator[Admission]:
+        """
+        Waits until there is room for a task and reserves its memory and CPUs for the lifetime of the context.
+
+        :param memory_mb: (int) the memory the task expects to use in megabytes
+        :param cpus: (float) the number of CPUs the task expects to use
+        :param name: (str) the name of the task shown in the trace and history
+        :return: (Iterator[Admission]) the admission with the time the task waited
+        """
+        start = time.perf_counter()
+        with Tracer().span("admission.wait", task=name, memory_mb=memory_mb, cpus=cpus), self._condition:
+            entry = (memory_mb, cpus, next(self._tickets))
+            self._waiting.append(entry)
+            # the wait times out so changes to the machine made by other processes are picked up
+            while self._next_ticket() != entry[2]:
+                self._condition.wait(timeout=self.poll_interval)
+            self._waiting.remove(entry)
+            self._reserved_memory_mb += memory_mb
+            self._reserved_cpus += cpus
+            self._running += 1
+            self._condition.notify_all()
+
+        admission = Admission(name=name, memory_mb=memory_mb, cpus=cpus, wait_seconds=time.perf_counter() - start)
+        self.history.append(admission)
+        try:
+            yield admission
+        finally:
+            with self._condition:
+                self._reserved_memory_mb -= memory_mb
+                self._reserved_cpus -= cpus
+                self._running -= 1
+                self._condition.notify_all()
@@ -0,0 +1,228 @@
+"""
+This file defines the built-in steps that do small bookkeeping jobs in a chain of commands without starting a shell.
+"""
+import os
+import re
+from typing import Dict, List, Optional, Tuple, Union
+
+from gerund.components.command_string import CommandString
+
+# the names that are allowed for variables exported by a step
+VARIABLE_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+class BuiltinStep:
+    """
+    This class is responsible for a bookkeeping step in a chain of commands such as printing a line, changing
+    directory, exporting variables, making a directory, or writing a value to a file. Steps at the start of a local
+    chain are run in Python so they do not pay for starting a shell, and the directory and variables they set are
+    passed on to the rest of the chain. Every other step is rendered as the equivalent shell and folded into the
+    commands next to it, so a step on a server never needs an ssh call of its own.
+
+    Values are used as they are apart from variables like {=>name} which are filled in, so $ and quotes are not
+    expanded by the shell. Paths starting with ~ are relative to the home directory and relative paths are relative
+    to the directory of the chain.
+
+    Attributes:
+        kind (str): the job of the step which is one of KINDS
+        path (Optional[str]): the directory or file of a "cd", "mkdir", or "write" step
+        value (Optional[str]): the line printed by an "echo" step or written by a "write" step
+        variables (Optional[Dict[str, str]]): the variables set by an "export" step
+        append (bool): if True a "write" step adds the value to the end of the file instead of replacing it
+    """
+    KINDS = ("echo", "cd", "export", "mkdir", "write")
+
+    def __init__(self, kind: str, path: Optional[str] = None, value: Optional[str] = None,
+                 variables: Optional[Dict[str, str]] = None, append: bool = False) -> None:
+        """
+        The constructor for the BuiltinStep class.
+
+        :param kind: (str) the job of the step which is one of KINDS
+        :param path: (Optional[str]) the directory or file of a "cd", "mkdir", or "write" step
+        :param value: (Optional[str]) the line printed by an "echo" step or written by a "write" step
+        :param variables: (Optional[Dict[str, str]]) the variables set by an "export" step
+        :param append: (bool) if True a "write" step adds the value to the end of the file
+        """
+        if kind not in self.KINDS:
+            raise ValueError(f"{kind} is not a built-in step, the built-in steps are {', '.join(self.KINDS)}")
+        if kind in ("cd", "mkdir", "write") and (path is None or str(path) == ""):
+            raise ValueError(f"the {kind} step needs a path")
+        if kind in ("echo", "write") and value is None:
+            raise ValueError(f"the {kind} step needs a value")
+        if kind == "export":
+            if variables is None or len(variables) == 0:
+                raise ValueError("the export step needs at least one variable")
+            for name in variables:
+                if VARIABLE_NAME.match(name) is None:
+                    raise ValueError(f"{name} is not a valid variable name")
+        self.kind: str = kind
+        self.path: Optional[str] = str(path) if path is not None else None
+        self.value: Optional[str] = str(value) if value is not None else None
+        self.variables: Optional[Dict[str, str]] = {name: str(value) for name, value in variables.items()} \
+            if variables is not None else None
+        self.append: bool = append
+
+    @staticmethod
+    def echo(value: str) -> "BuiltinStep":
+        return BuiltinStep(kind="echo", value=value)
+
+    @staticmethod
+    def cd(path: str) -> "BuiltinStep":
+        return BuiltinStep(kind="cd", path=path)
+
+    @staticmethod
+    def export(variables: Dict[str, str]) -> "BuiltinStep":
+        return BuiltinStep(kind="export", variables=variables)
+
+    @staticmethod
+    def mkdir(path: str) -> "BuiltinStep":
+        return BuiltinStep(kind="mkdir", path=path)
+
+    @staticmethod
+    def write(path: str, value: str, append: bool = False) -> "BuiltinStep":
+        return BuiltinStep(kind="write", path=path, value=value, append=append)
+
+    @staticmethod
+    def from_config(step: dict) -> "BuiltinStep":
+        """
+        Builds a step from a mapping in the commands of a config like {"cd": "build"}, {"export": {"NAME": "value"}},
+        or {"write": {"path": "out.txt", "value": "{=>one}", "append": true}}.
+
+        :param step: (dict) the mapping with the kind of the step as its only key
+        :return: (BuiltinStep) the step
+        """
+        if len(step) != 1:
+            raise ValueError(f"a built-in step has one key which is one of {', '.join(BuiltinStep.KINDS)}, got {step}")
+        kind, argument = next(iter(step.items()))
+        if kind == "export":
+            if not isinstance(argument, dict):
+                raise ValueError("the export step needs a mapping of variable names to values")
+            return BuiltinStep.export(variables=argument)
+        if kind == "write":
+            if not isinstance(argument, dict):
+                raise ValueError("the write step needs a mapping with a path and a value")
+            return BuiltinStep.write(path=argument.get("path"), value=argument.get("value"),
+                                     append=argument.get("append", False) is True)
+        if kind == "echo":
+            return BuiltinStep.echo(value=argument)
+        return BuiltinStep(kind=kind, path=argument)
+
+    @staticmethod
+    def parse_line(line: str) -> dict:
+        """
+        Parses a built-in step from a line of a txt config like "cd build", "export NAME=value", or
+        "write out.txt {=>one}" into the mapping used by the other configs.
+
+        :param line: (str) the line without the leading @
+        :return: (dict) the mapping with the kind of the step as its only key
+        """
+        kind, _, argument = line.strip().partition(" ")
+        argument = argument.strip()
+        if kind == "export":
+            name, separator, value = argument.partition("=")
+            if separator == "":
+                raise ValueError(f"the export step needs NAME=value, got {argument}")
+            return {"export": {name: value}}
+        if kind == "write":
+            path, _, value = argument.partition(" ")
+            return {"write": {"path": path, "value": value}}
+        return {kind: argument}
+
+    @staticmethod
+    def fold(steps: List[Union[str, "BuiltinStep"]]) -> List[List[Union[str, "BuiltinStep"]]]:
+        """
+        Groups the steps of a chain so every built-in step goes with the command after it, or with the command
+        before it if there is no command after it, so that running each group on its own never needs a shell or an
+        ssh call just for a built-in step.
+
+        :param steps: (List[Union[str, BuiltinStep]]) the steps of the chain
+        :return: (List[List[Union[str, BuiltinStep]]]) the groups of steps in order
+        """
+        groups: List[List[Union[str, BuiltinStep]]] = []
+        pending: List[BuiltinStep] = []
+        for step in steps:
+            if isinstance(step, BuiltinStep):
+                pending.append(step)
+                continue
+            groups.append(pending + [step])
+            pending = []
+        if len(pending) > 0:
+            if len(groups) > 0:
+                groups[-1] += pending
+            else:
+                groups.append(pending)
+        return groups
+
+    @staticmethod
+    def _quote(value: str, remote: bool) -> str:
+        """
+        Quotes a value for the shell so it is used as it is.
+
+        :param value: (str) the value to quote
+        :param remote: (bool) if True the value is inside the single quotes of an ssh command
+        :return: (str) the quoted value
+        """
+        quoted = '"' + re.sub(r'([\\"$`])', r"\\\1", value) + '"'
+        return quoted.replace("'", "'\\''") if remote is True else quoted
+
+    def _quote_path(self, remote: bool) -> str:
+        if self.path == "~" or self.path.startswith("~/"):
+            return "~" + (f"/{self._quote(value=self.path[2:], remote=remote)}" if len(self.path) > 2 else "")
+        return self._quote(value=self.path, remote=remote)
+
+    def to_shell(self, remote: bool = False) -> str:
+        """
+        Renders the step as the equivalent shell command.
+
+        :param remote: (bool) if True the command is run on a server inside the single quotes of an ssh command
+        :return: (str) the shell command
+        """
+        if self.kind == "echo":
+            return f"printf \"%s\\n\" {self._quote(value=self.value, remote=remote)}"
+        if self.kind == "cd":
+            return f"cd {self._quote_path(remote=remote)}"
+        if self.kind == "mkdir":
+            return f"mkdir -p {self._quote_path(remote=remote)}"
+        if self.kind == "write":
+            redirect = ">>" if self.append is True else ">"
+            return f"printf \"%s\\n\" {self._quote(value=self.value, remote=remote)} {redirect} " \
+                   f"{self._quote_path(remote=remote)}"
+        exports = " ".join(f"{name}={self._quote(value=value, remote=remote)}"
+                           for name, value in self.variables.items())
+        return f"export {exports}"
+
+    def _resolve_path(self, working_directory: str) -> str:
+        return os.path.join(working_directory, os.path.expanduser(str(CommandString(self.path))))
+
+    def run(self, working_directory: str, environment: Dict[str, str]) -> Tuple[str, Optional[str]]:
+        """
+        Runs the step in Python.
+
+        :param working_directory: (str) the directory of the chain before the step
+        :param environment: (Dict[str, str]) the environment of the chain which exported variables are added to
+        :return: (Tuple[str, Optional[str]]) the directory of the chain after the step and the line printed by the
+                 step if it prints one
+        """
+        if self.kind == "echo":
+            return working_directory, str(CommandString(self.value))
+        if self.kind == "export":
+            environment.update({name: str(CommandString(value)) for name, value in self.variables.items()})
+            return working_directory, None
+
+        path = self._resolve_path(working_directory=working_directory)
+        if self.kind == "cd":
+            if not os.path.isdir(path):
+                raise ValueError(f"{self.path} is not a directory")
+            return os.path.normpath(path), None
+        if self.kind == "mkdir":
+            os.makedirs(path, exist_ok=True)
+            return working_directory, None
+        with open(path, "a" if self.append is True else "w") as file:
+            file.write(str(CommandString(self.value)) + "\n")
+        return working_directory, None
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, BuiltinStep) and vars(self) == vars(other)
+
+    def __repr__(self) -> str:
+        return f"BuiltinStep({self.to_shell()})"
@@ -4,6 +4,7 @@ This file defines the class that processes a command string with variables if ne
 import re
 from typing import List
 
+from gerund.components.tracer import Tracer
 from gerund.components.variable import Variable
 
 
@@ -48,9 +49,10 @@ class CommandString:
         Returns: None
         """
         if self.command_processed is False:
-            variables = self._extract_variables()
-            for variable in variables:
-                self._replace_with_variable(variable_string=variable)
+            with Tracer().span("command_string.process"):
+                variables = self._extract_variables()
+                for variable in variables:
+                    self._replace_with_variable(variable_string=variable)
             self.command_processed = True
 
     def __str__(self):
@@ -12,6 +12,8 @@ class ConfigTxt:
         path (str): the path to the config file that is going to be read
         data_structure (dict): data around the command to be run
     """
+    OPTIONAL_SECTIONS = ("[matrix]",)
+
     def __init__(self, path: str) -> None:
         """
         The constructor for the ConfigTxt class.
@@ -37,12 +39,13 @@ class ConfigTxt:
             data = file.read()
 
         buffer = data.split("\n")
-        headers = list(self.data_structure.keys())
+        headers = list(self.data_structure.keys()) + list(self.OPTIONAL_SECTIONS)
         cached_header: Optional[str] = None
 
         for i in buffer:
             if i in headers:
                 cached_header = i
+                self.data_structure.setdefault(i, {})
             else:
                 if i != "":
                     if cached_header == "[commands]":
@@ -85,6 +88,11 @@ class ConfigTxt:
         self.write_section(section_key="[env_vars]")
         self.write_line(line="")
 
+        for section_key in self.OPTIONAL_SECTIONS:
+            if section_key in self.data_structure:
+                self.write_section(section_key=section_key)
+                self.write_line(line="")
+
         self.write_line(line="[commands]")
         for i in self.data_structure["[commands]"]:
             self.write_line(line=i)
@@ -108,3 +116,7 @@ class ConfigTxt:
     @property
     def commands(self) -> dict:
         return self.data_structure["[commands]"]
+
+    @property
+    def matrix(self) -> Optional[dict]:
+        return self.data_structure.get("[matrix]")
@@ -0,0 +1,242 @@
+"""
+This file defines the sync that brings a directory on a server up to date with a local directory by only sending the
+files that have changed.
+"""
+import hashlib
+import io
+import json
+import os
+import shlex
+import tarfile
+import time
+from subprocess import Popen, PIPE
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from gerund.components.host_limiter import HostLimiter
+from gerund.components.ssh_options import SshOptions
+from gerund.components.tracer import Tracer
+
+# the name of the file in the stream listing the files to remove on the server
+DELETE_LIST = ".gerund-delete"
+
+
+class SyncResult(NamedTuple):
+    """
+    The outcome of syncing a local directory to a server.
+
+    Attributes:
+        files_sent (int): the number of new or changed files sent to the server
+        bytes_sent (int): the size of the files sent before compression
+        files_deleted (int): the number of files removed from the server
+        files_unchanged (int): the number of files that were already up to date on the server
+        seconds (float): the time taken for the sync
+    """
+    files_sent: int
+    bytes_sent: int
+    files_deleted: int
+    files_unchanged: int
+    seconds: float
+
+
+class DeltaSync:
+    """
+    This class is responsible for syncing a local directory to a directory on a server. A manifest of the size,
+    modified time, and sha256 of every local file is compared with a cached manifest of what was last sent to the
+    server, and only the new and changed files are sent in one gzipped tar stream over a single ssh connection. Hashes
+    are only worked out again for files whose size or modified time changed, and nothing is sent if nothing changed.
+    The cached manifest assumes the directory on the server is only changed by the sync, force sends everything.
+
+    Attributes:
+        local_directory (str): the local directory being synced
+        remote_directory (str): the directory on the server, relative paths are relative to the home directory
+        ip_address (str): the IP address of the server
+        username (str): the username for the server
+        key (Optional[str]): path to the pem key for the server
+        delete (bool): if True files removed from the local directory are removed from the server
+        manifest_directory (str): the directory the manifests of previous syncs are cached in
+    """
+    def __init__(self, local_directory: str, remote_directory: str, ip_address: str, username: str = "ubuntu",
+                 key: Optional[str] = None, delete: bool = False, manifest_directory: Optional[str] = None) -> None:
+        """
+        The constructor for the DeltaSync class.
+
+        :param local_directory: (str) the local directory being synced
+        :param remote_directory: (str) the directory on the server, relative paths are relative to the home directory
+        :param ip_address: (str) the IP address of the server
+        :param username: (str) the username for the server (default is "ubuntu")
+        :param key: (Optional[str]) path to the pem key for the server
+        :param delete: (bool) if True files removed from the local directory are removed from the server
+        :param manifest_directory: (Optional[str]) the directory the manifests are cached in (default
+                                   ~/.gerund/manifests)
+        """
+        if not os.path.isdir(local_directory):
+            raise ValueError(f"{local_directory} is not a directory")
+        self.local_directory: str = os.path.abspath(local_directory)
+        self.remote_directory: str = remote_directory
+        self.ip_address: str = ip_address
+        self.username: str = username
+        self.key: Optional[str] = key
+        self.delete: bool = delete
+        self.manifest_directory: str = manifest_directory if manifest_directory is not None else \
+            os.path.join(os.path.expanduser("~"), ".gerund", "manifests")
+
+    @property
+    def manifest_path(self) -> str:
+        target = f"{self.local_directory}|{self.username}@{self.ip_address}:{self.remote_directory}"
+        return os.path.join(self.manifest_directory, hashlib.sha256(target.encode()).hexdigest()[:16] + ".json")
+
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def load_remote_manifest(self) -> Dict[str, dict]:
+        """
+        Loads the manifest of the files last sent to the server.
+
+        :return: (Dict[str, dict]) the size, mtime, and sha256 of each file keyed by its relative path, empty if the
+                 directory has not been synced before
+        """
+        try:
+            with open(self.manifest_path, "r") as file:
+                return json.loads(file.read())
+        except (OSError, ValueError):
+            return {}
+
+    def _save_remote_manifest(self, manifest: Dict[str, dict]) -> None:
+        """
+        Caches the manifest of the files on the server writing it to a temporary file first so a crash cannot leave a
+        half written manifest.
+
+        :param manifest: (Dict[str, dict]) the manifest of the files on the server
+        :return: None
+        """
+        os.makedirs(self.manifest_directory, exist_ok=True)
+        temp_path = f"{self.manifest_path}.{os.getpid()}"
+        with open(temp_path, "w") as file:
+            file.write(json.dumps(manifest))
+        os.replace(temp_path, self.manifest_path)
+
+    def build_manifest(self, previous: Optional[Dict[str, dict]] = None) -> Dict[str, dict]:
+        """
+        Builds the manifest of the local directory reusing the hashes of files whose size and modified time match the
+        previous manifest.
+
+        :param previous: (Optional[Dict[str, dict]]) an earlier manifest of the directory
+        :return: (Dict[str, dict]) the size, mtime, and sha256 of each file keyed by its relative path
+        """
+        previous = previous or {}
+        manifest: Dict[str, dict] = {}
+        for root, directories, files in os.walk(self.local_directory):
+            directories.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                if os.path.islink(path) or not os.path.isfile(path):
+                    continue
+                relative_path = os.path.relpath(path, self.local_directory)
+                stat = os.stat(path)
+                entry = {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+                cached = previous.get(relative_path)
+                if cached is not None and cached["size"] == entry["size"] and cached["mtime"] == entry["mtime"]:
+                    entry["sha256"] = cached["sha256"]
+                else:
+                    entry["sha256"] = self._hash_file(path=path)
+                manifest[relative_path] = entry
+        return manifest
+
+    @staticmethod
+    def compare(local: Dict[str, dict], remote: Dict[str, dict]) -> Tuple[List[str], List[str]]:
+        """
+        Works out which files have to be sent and which have to be removed to bring the server up to date.
+
+        :param local: (Dict[str, dict]) the manifest of the local directory
+        :param remote: (Dict[str, dict]) the manifest of the directory on the server
+        :return: (Tuple[List[str], List[str]]) the paths of the new or changed files and the paths of the removed files
+        """
+        changed = [path for path, entry in local.items() if remote.get(path, {}).get("sha256") != entry["sha256"]]
+        removed = sorted(path for path in remote if path not in local)
+        return changed, removed
+
+    def _quote_remote_directory(self) -> str:
+        """
+        Quotes the remote directory for the single quotes of the ssh command leaving a leading ~ for the shell on the
+        server to expand.
+
+        :return: (str) the quoted remote directory
+        """
+        path = self.remote_directory
+        prefix = ""
+        if path == "~" or path.startswith("~/"):
+            prefix, path = "~/", path[2:]
+        quoted = shlex.quote(path) if len(path) > 0 else ""
+        return prefix + quoted.replace("'", "'\\''")
+
+    def _send(self, changed: List[str], removed: List[str]) -> None:
+        """
+        Streams the changed files as a gzipped tar to the server over one ssh connection where it is unpacked into the
+        remote directory and the removed files are deleted.
+
+        :param changed: (List[str]) the relative paths of the files to send
+        :param removed: (List[str]) the relative paths of the files to remove from the server
+        :return: None
+        """
+        ssh_options: str = SshOptions().options
+        if self.key is not None:
+            ssh_options += f" -i '{self.key}'"
+        directory = self._quote_remote_directory()
+        remote_command = f"mkdir -p {directory} && cd {directory} && tar -xzf - && " \
+                         f"if [ -f {DELETE_LIST} ]; then tr \"\\n\" \"\\0\" < {DELETE_LIST} | xargs -0 rm -f --; " \
+                         f"rm -f {DELETE_LIST}; fi"
+
+        process = Popen(f"ssh {ssh_options} {self.username}@{self.ip_address} '{remote_command}'", shell=True,
+                        stdin=PIPE)
+        try:
+            with tarfile.open(fileobj=process.stdin, mode="w|gz") as archive:
+                for relative_path in changed:
+                    archive.add(os.path.join(self.local_directory, relative_path), arcname=relative_path,
+                                recursive=False)
+                if len(removed) > 0:
+                    delete_list = "".join(f"{path}\n" for path in removed).encode()
+                    info = tarfile.TarInfo(name=DELETE_LIST)
+                    info.size = len(delete_list)
+                    info.mtime = int(time.time())
+                    archive.addfile(info, fileobj=io.BytesIO(delete_list))
+        except BrokenPipeError:
+            pass
+        finally:
+            process.stdin.close()
+            process.wait()
+
+        if process.returncode != 0:
+            raise ValueError(f"sync of {self.local_directory} to {self.ip_address}:{self.remote_directory} failed "
+                             f"with exit code {process.returncode}")
+
+    def sync(self, force: bool = False) -> SyncResult:
+        """
+        Brings the directory on the server up to date with the local directory.
+
+        :param force: (bool) if True every file is sent whatever the cached manifest says
+        :return: (SyncResult) the number of files and bytes sent along with the time taken
+        """
+        start = time.perf_counter()
+        with Tracer().span("delta_sync.sync", host=self.ip_address, directory=self.local_directory):
+            remote = self.load_remote_manifest()
+            local = self.build_manifest(previous=remote)
+            changed, removed = self.compare(local=local, remote={} if force is True else remote)
+            if self.delete is False:
+                removed = []
+
+            if len(changed) + len(removed) > 0:
+                with HostLimiter().acquire(ip_address=self.ip_address):
+                    self._send(changed=changed, removed=removed)
+            result = SyncResult(files_sent=len(changed), bytes_sent=sum(local[path]["size"] for path in changed),
+                                files_deleted=len(removed), files_unchanged=len(local) - len(changed),
+                                seconds=time.perf_counter() - start)
+            if self.delete is False:
+                # files kept on the server are still in the manifest so they are not sent again if they come back
+                local = {**{path: entry for path, entry in remote.items() if path not in local}, **local}
+            self._save_remote_manifest(manifest=local)
+        return result
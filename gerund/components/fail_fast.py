@@ -0,0 +1,107 @@
+"""
+This file defines the policy that stops a batch of commands once too many of them have failed.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Dict, List, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from gerund.commands.terminal_command import TerminalCommand
+
+
+class FailFast:
+    """
+    This class is responsible for cancelling a batch of commands once more than max_failures of them have failed.
+    Running commands register with the policy, and when it is cancelled every registered command is terminated along
+    with its child processes and its session on the server. Runners check cancelled before starting the next command
+    so nothing new is started after the batch is cancelled.
+
+    Attributes:
+        max_failures (int): the number of failures tolerated before the batch is cancelled
+    """
+    def __init__(self, max_failures: int = 0) -> None:
+        """
+        The constructor for the FailFast class.
+
+        :param max_failures: (int) the number of failures tolerated before the batch is cancelled (default 0)
+        """
+        if max_failures < 0:
+            raise ValueError(f"max_failures cannot be negative not {max_failures}")
+        self.max_failures: int = max_failures
+        self._lock: Lock = Lock()
+        self._failures: int = 0
+        self._cancelled: bool = False
+        self._running: Dict[int, "TerminalCommand"] = {}
+        self._terminated: Dict[int, "TerminalCommand"] = {}
+
+    def register(self, command: "TerminalCommand") -> None:
+        """
+        Tracks a command that is about to run so it can be terminated if the batch is cancelled.
+
+        :param command: (TerminalCommand) the command that is about to run
+        :return: None
+        """
+        with self._lock:
+            self._running[id(command)] = command
+
+    def unregister(self, command: "TerminalCommand") -> None:
+        """
+        Stops tracking a command that has finished.
+
+        :param command: (TerminalCommand) the command that has finished
+        :return: None
+        """
+        with self._lock:
+            self._running.pop(id(command), None)
+
+    def record(self, failed: bool) -> bool:
+        """
+        Records the outcome of a command cancelling the batch if the number of failures goes over max_failures.
+
+        :param failed: (bool) if True the command failed
+        :return: (bool) True if the batch is cancelled
+        """
+        with self._lock:
+            if failed is True:
+                self._failures += 1
+            cancel = self._failures > self.max_failures and self._cancelled is False
+        if cancel is True:
+            self.cancel()
+        return self._cancelled
+
+    def cancel(self) -> None:
+        """
+        Cancels the batch terminating every command that is running. The commands are terminated at the same time as
+        terminating a command on a server takes an ssh call of its own.
+
+        :return: None
+        """
+        with self._lock:
+            self._cancelled = True
+            running: List["TerminalCommand"] = list(self._running.values())
+            self._running = {}
+            for command in running:
+                self._terminated[id(command)] = command
+        if len(running) == 0:
+            return
+        with ThreadPoolExecutor(max_workers=len(running)) as executor:
+            for future in [executor.submit(command.terminate) for command in running]:
+                future.result()
+
+    def was_terminated(self, command: "TerminalCommand") -> bool:
+        """
+        Checks if a command was terminated because the batch was cancelled.
+
+        :param command: (TerminalCommand) the command being checked
+        :return: (bool) True if the command was terminated by the policy
+        """
+        with self._lock:
+            return id(command) in self._terminated
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    @property
+    def failures(self) -> int:
+        return self._failures
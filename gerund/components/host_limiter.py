@@ -0,0 +1,125 @@
+"""
+This file defines the limiter that caps the number of concurrent ssh and scp connections made to remote hosts.
+"""
+from contextlib import contextmanager
+from threading import BoundedSemaphore, Lock
+from typing import Dict, Iterator, Optional
+
+from gerund.components.local_variable_storage import Singleton
+from gerund.components.tracer import Tracer
+
+
+class HostLimiter(metaclass=Singleton):
+    """
+    This class is responsible for capping the number of concurrent connections per host and across all hosts so
+    sshd limits such as MaxStartups and MaxSessions are not tripped when many remote commands are launched at once.
+
+    Attributes:
+        default_limit (Optional[int]): the connection limit for hosts without their own limit (None is unlimited)
+        global_limit (Optional[int]): the connection limit across all hosts (None is unlimited)
+    """
+    def __init__(self, default_limit: Optional[int] = 10, global_limit: Optional[int] = None) -> None:
+        """
+        The constructor for the HostLimiter class.
+
+        :param default_limit: (Optional[int]) the connection limit for hosts without their own limit (default 10 which
+                              matches the default MaxSessions of sshd)
+        :param global_limit: (Optional[int]) the connection limit across all hosts (None is unlimited)
+        """
+        self._lock: Lock = Lock()
+        self._host_limits: Dict[str, Optional[int]] = {}
+        self._host_semaphores: Dict[str, Optional[BoundedSemaphore]] = {}
+        self._global_semaphore: Optional[BoundedSemaphore] = None
+        self.default_limit: Optional[int] = default_limit
+        self.global_limit: Optional[int] = None
+        self.set_global_limit(limit=global_limit)
+
+    @staticmethod
+    def _build_semaphore(limit: Optional[int]) -> Optional[BoundedSemaphore]:
+        """
+        Builds a semaphore for a limit.
+
+        :param limit: (Optional[int]) the number of concurrent connections allowed (None is unlimited)
+        :return: (Optional[BoundedSemaphore]) the semaphore or None if there is no limit
+        """
+        if limit is None:
+            return None
+        if int(limit) < 1:
+            raise ValueError(f"connection limit has to be at least 1 not {limit}")
+        return BoundedSemaphore(int(limit))
+
+    def set_host_limit(self, ip_address: str, limit: Optional[int]) -> None:
+        """
+        Sets the connection limit for a single host. Connections already open keep the limit they were opened under.
+
+        :param ip_address: (str) the IP address of the host
+        :param limit: (Optional[int]) the number of concurrent connections allowed (None is unlimited)
+        :return: None
+        """
+        with self._lock:
+            self._host_limits[ip_address] = limit
+            self._host_semaphores[ip_address] = self._build_semaphore(limit=limit)
+
+    def set_default_limit(self, limit: Optional[int]) -> None:
+        """
+        Sets the connection limit for hosts that do not have their own limit.
+
+        :param limit: (Optional[int]) the number of concurrent connections allowed (None is unlimited)
+        :return: None
+        """
+        with self._lock:
+            self.default_limit = limit
+            for ip_address in list(self._host_semaphores.keys()):
+                if ip_address not in self._host_limits:
+                    del self._host_semaphores[ip_address]
+
+    def set_global_limit(self, limit: Optional[int]) -> None:
+        """
+        Sets the connection limit across all hosts.
+
+        :param limit: (Optional[int]) the number of concurrent connections allowed (None is unlimited)
+        :return: None
+        """
+        with self._lock:
+            self.global_limit = limit
+            self._global_semaphore = self._build_semaphore(limit=limit)
+
+    def _get_host_semaphore(self, ip_address: str) -> Optional[BoundedSemaphore]:
+        """
+        Gets the semaphore for a host creating it from the default limit if the host has not been seen before.
+
+        :param ip_address: (str) the IP address of the host
+        :return: (Optional[BoundedSemaphore]) the semaphore for the host or None if the host is unlimited
+        """
+        with self._lock:
+            if ip_address not in self._host_semaphores:
+                self._host_semaphores[ip_address] = self._build_semaphore(limit=self.default_limit)
+            return self._host_semaphores[ip_address]
+
+    @contextmanager
+    def acquire(self, ip_address: str) -> Iterator[None]:
+        """
+        Blocks until a connection slot is free for the host and globally, holding both for the duration of the context.
+
+        :param ip_address: (str) the IP address of the host being connected to
+        :return: (Iterator[None]) the context holding the connection slots
+        """
+        global_semaphore = self._global_semaphore
+        host_semaphore = self._get_host_semaphore(ip_address=str(ip_address))
+
+        # the host slot is taken first so a call waiting on a busy host does not hold a global slot idle
+        with Tracer().span("host_limiter.wait", host=ip_address):
+            if host_semaphore is not None:
+                host_semaphore.acquire()
+        try:
+            if global_semaphore is not None:
+                with Tracer().span("host_limiter.wait_global", host=ip_address):
+                    global_semaphore.acquire()
+            try:
+                yield
+            finally:
+                if global_semaphore is not None:
+                    global_semaphore.release()
+        finally:
+            if host_semaphore is not None:
+                host_semaphore.release()
@@ -0,0 +1,89 @@
+"""
+This file defines the class that feeds data into the stdin of a process a chunk at a time.
+"""
+import os
+from typing import IO, Iterable, Iterator, Union
+
+CHUNK_SIZE = 65536
+
+InputData = Union[bytes, bytearray, memoryview, IO[bytes], Iterable[bytes]]
+
+
+class InputStream:
+    """
+    This class is responsible for writing data to the stdin pipe of a process without blocking. Data is only pulled
+    from the source when everything pulled before has been written to the pipe, so a process that reads slowly holds
+    back the source instead of the data being buffered in memory. The source can be bytes, a file object opened in
+    binary mode, or an iterable of chunks like a generator.
+
+    Attributes:
+        written (int): the number of bytes written to the pipe so far
+        closed (bool): True once the pipe is closed
+    """
+    def __init__(self, data: InputData) -> None:
+        """
+        The constructor for the InputStream class.
+
+        :param data: (InputData) bytes, a binary file object, or an iterable of bytes chunks
+        """
+        self._chunks: Iterator[bytes] = self._iterate(data=data)
+        self._pending: memoryview = memoryview(b"")
+        self.written: int = 0
+        self.closed: bool = False
+
+    @staticmethod
+    def _iterate(data: InputData) -> Iterator[bytes]:
+        """
+        Turns the source of the data into an iterator of chunks.
+
+        :param data: (InputData) bytes, a binary file object, or an iterable of bytes chunks
+        :return: (Iterator[bytes]) the chunks of the data
+        """
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            view = memoryview(data)
+            return (view[index:index + CHUNK_SIZE] for index in range(0, len(view), CHUNK_SIZE))
+        if hasattr(data, "read"):
+            return iter(lambda: data.read(CHUNK_SIZE), b"")
+        if isinstance(data, str):
+            raise ValueError("input has to be bytes, a binary file object, or an iterable of bytes")
+        return iter(data)
+
+    def write(self, pipe: IO[bytes]) -> bool:
+        """
+        Writes as much data as the pipe accepts without blocking. The pipe has to be non-blocking.
+
+        :param pipe: (IO[bytes]) the stdin pipe of the process
+        :return: (bool) True if there is more data to write, False once the source is exhausted or the process has
+                 stopped reading
+        """
+        while True:
+            if len(self._pending) == 0:
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    return False
+                self._pending = memoryview(chunk.encode() if isinstance(chunk, str) else chunk)
+                continue
+            try:
+                written = os.write(pipe.fileno(), self._pending)
+            except BlockingIOError:
+                return True
+            except BrokenPipeError:
+                # the process exited or closed its stdin so the rest of the data is not wanted
+                self._pending = memoryview(b"")
+                self._chunks = iter(())
+                return False
+            self._pending = self._pending[written:]
+            self.written += written
+
+    def close(self, pipe: IO[bytes]) -> None:
+        """
+        Closes the pipe so the process sees the end of its input.
+
+        :param pipe: (IO[bytes]) the stdin pipe of the process
+        :return: None
+        """
+        self.closed = True
+        try:
+            pipe.close()
+        except BrokenPipeError:
+            pass
@@ -0,0 +1,187 @@
+"""
+This file defines the append-only journal of completed command steps that lets a failed run be resumed from the step
+that failed.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+
+class Journal:
+    """
+    This class is responsible for recording every step of a run with the hash of its inputs and its exit status in a
+    file of JSON lines that is only ever appended to. When resuming, the steps of the journal that exited with 0 are
+    loaded so a step with the same inputs can be skipped. A line cut short by a crash is ignored when the journal is
+    loaded.
+
+    Attributes:
+        path (str): the path to the journal file
+        resume (bool): if True steps completed in an earlier run are skipped
+    """
+    def __init__(self, path: str, resume: bool = False) -> None:
+        """
+        The constructor for the Journal class.
+
+        :param path: (str) the path to the journal file
+        :param resume: (bool) if True steps completed in an earlier run are skipped
+        """
+        self.path: str = path
+        self.resume: bool = resume
+        self._lock: threading.Lock = threading.Lock()
+        self._completed: Dict[str, dict] = self._load() if resume is True else {}
+
+    def _load(self) -> Dict[str, dict]:
+        """
+        Loads the steps of the journal that exited with 0.
+
+        :return: (Dict[str, dict]) the entries of the completed steps keyed by their key
+        """
+        completed: Dict[str, dict] = {}
+        if not os.path.isfile(self.path):
+            return completed
+        with open(self.path, "r") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get("return_code") == 0:
+                    completed[entry["key"]] = entry
+        return completed
+
+    @staticmethod
+    def build_key(previous: str, command: str, environment_variables: Optional[Dict[str, str]] = None,
+                  ip_address: Optional[str] = None, working_directory: Optional[str] = None) -> str:
+        """
+        Builds the key of a step from the key of the step before it, its rendered command, environment, host, and
+        working directory. As the key of the step before is part of the key, a change to an earlier step means every
+        step after it runs again.
+
+        :param previous: (str) the key of the step before or the name of the config for the first step
+        :param command: (str) the fully rendered command
+        :param environment_variables: (Optional[Dict[str, str]]) the resolved environment variables of the command
+        :param ip_address: (Optional[str]) the host that the command is run on
+        :param working_directory: (Optional[str]) the directory a local command is run in
+        :return: (str) the key of the step
+        """
+        key_data = {
+            "previous": previous,
+            "command": command,
+            "environment_variables": sorted((environment_variables or {}).items()),
+            "ip_address": ip_address,
+            "working_directory": working_directory
+        }
+        return hashlib.sha256(json.dumps(key_data).encode()).hexdigest()
+
+    def completed(self, key: str) -> Optional[dict]:
+        """
+        Gets the entry of a step completed in an earlier run.
+
+        :param key: (str) the key of the step
+        :return: (Optional[dict]) the entry of the step or None if it has to be run
+        """
+        return self._completed.get(key)
+
+    def record(self, key: str, config: str, step: int, command: str, return_code: int, seconds: float) -> None:
+        """
+        Appends a step to the journal flushing it to disk before returning so it survives the run being killed.
+
+        :param key: (str) the key of the step
+        :param config: (str) the name of the config the step belongs to
+        :param step: (int) the position of the step in the commands of the config starting at 0
+        :param command: (str) the fully rendered command
+        :param return_code: (int) the exit code of the step
+        :param seconds: (float) the time taken to run the step
+        :return: None
+        """
+        entry = {"key": key, "config": config, "step": step, "command": command, "return_code": return_code,
+                 "seconds": round(seconds, 6), "finished_at": time.time()}
+        directory = os.path.dirname(self.path)
+        if directory != "":
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            with open(self.path, "a") as file:
+                file.write(json.dumps(entry) + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+
+    def chain(self, config: str) -> "JournalChain":
+        """
+        Starts tracking the steps of a config.
+
+        :param config: (str) the name of the config
+        :return: (JournalChain) the tracker the commands of the config are given
+        """
+        return JournalChain(journal=self, config=config)
+
+
+class JournalChain:
+    """
+    This class is responsible for tracking the position of a command in the steps of a config so the key of each step
+    is chained onto the key of the step before it.
+
+    Attributes:
+        journal (Journal): the journal the steps are recorded in
+        config (str): the name of the config
+        step (int): the position of the next step starting at 0
+        previous (str): the key of the last step or the name of the config before the first step
+    """
+    def __init__(self, journal: Journal, config: str) -> None:
+        """
+        The constructor for the JournalChain class.
+
+        :param journal: (Journal) the journal the steps are recorded in
+        :param config: (str) the name of the config
+        """
+        self.journal: Journal = journal
+        self.config: str = config
+        self.step: int = 0
+        self.previous: str = config
+
+    def build_key(self, command: str, environment_variables: Optional[Dict[str, str]] = None,
+                  ip_address: Optional[str] = None, working_directory: Optional[str] = None) -> str:
+        """
+        Builds the key of the next step.
+
+        :param command: (str) the fully rendered command
+        :param environment_variables: (Optional[Dict[str, str]]) the resolved environment variables of the command
+        :param ip_address: (Optional[str]) the host that the command is run on
+        :param working_directory: (Optional[str]) the directory a local command is run in
+        :return: (str) the key of the step
+        """
+        return self.journal.build_key(previous=self.previous, command=command,
+                                      environment_variables=environment_variables, ip_address=ip_address,
+                                      working_directory=working_directory)
+
+    def completed(self, key: str) -> bool:
+        """
+        Checks if the next step was completed in an earlier run and moves past it if it was.
+
+        :param key: (str) the key of the step
+        :return: (bool) True if the step can be skipped
+        """
+        if self.journal.completed(key=key) is None:
+            return False
+        self._advance(key=key)
+        return True
+
+    def record(self, key: str, command: str, return_code: int, seconds: float) -> None:
+        """
+        Records the outcome of the next step and moves past it.
+
+        :param key: (str) the key of the step
+        :param command: (str) the fully rendered command
+        :param return_code: (int) the exit code of the step
+        :param seconds: (float) the time taken to run the step
+        :return: None
+        """
+        self.journal.record(key=key, config=self.config, step=self.step, command=command, return_code=return_code,
+                            seconds=seconds)
+        self._advance(key=key)
+
+    def _advance(self, key: str) -> None:
+        self.previous = key
+        self.step += 1
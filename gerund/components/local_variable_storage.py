@@ -1,19 +1,43 @@
 """
 This file defines a dict that holds local storage for variables.
 """
+from contextvars import ContextVar
+from threading import Lock
+from typing import Optional
 
 
 class Singleton(type):
 
     _instances = {}
+    _lock = Lock()
 
     def __call__(cls, *args, **kwargs):
         if cls not in cls._instances:
-            cls._instances[cls] = super(Singleton, cls).__call__(*args, **kwargs)
+            with Singleton._lock:
+                if cls not in cls._instances:
+                    cls._instances[cls] = super(Singleton, cls).__call__(*args, **kwargs)
         return cls._instances[cls]
 
 
-class LocalVariableStorage(dict, metaclass=Singleton):
+# the instances of the scoped singletons for the current context, None means the global instances are used
+scoped_instances: ContextVar[Optional[dict]] = ContextVar("gerund_scoped_instances", default=None)
+
+
+class ScopedSingleton(Singleton):
+    """
+    A singleton that can be swapped for another instance inside a variable scope. Outside of a scope the global
+    instance is returned as with the Singleton.
+    """
+    def __call__(cls, *args, **kwargs):
+        scope = scoped_instances.get()
+        if scope is None:
+            return super(ScopedSingleton, cls).__call__(*args, **kwargs)
+        if cls not in scope:
+            scope[cls] = type.__call__(cls, *args, **kwargs)
+        return scope[cls]
+
+
+class LocalVariableStorage(dict, metaclass=ScopedSingleton):
 
     def __init__(self) -> None:
         super().__init__({})
@@ -0,0 +1,130 @@
+"""
+This file defines the class that expands the matrix section of a config into the cells of a parameter sweep.
+"""
+import hashlib
+import itertools
+import json
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+
+
+class Matrix:
+    """
+    This class is responsible for expanding the axes of a parameter sweep into the Cartesian product of their values.
+    Cells matching an exclude rule are dropped and the include rules add extra cells. Every cell is a mapping of axis
+    name to value which is loaded into local storage so the commands of the config can use the values with {=>axis}.
+
+    Attributes:
+        axes (Dict[str, list]): the values of each axis keyed by the name of the axis
+        include (List[dict]): extra cells added to the product
+        exclude (List[dict]): partial cells where any cell with the same values is dropped from the product
+        max_workers (int): the maximum number of cells run at the same time
+        max_failures (Optional[int]): the number of failed cells tolerated before the rest are cancelled, None runs
+                                      every cell whatever fails
+        spread_cores (bool): if True the cells running at the same time are pinned to disjoint sets of CPUs
+    """
+    RESERVED_KEYS = ("include", "exclude", "max_workers", "max_failures", "spread_cores")
+
+    def __init__(self, axes: Dict[str, list], include: Optional[List[dict]] = None,
+                 exclude: Optional[List[dict]] = None, max_workers: int = 1,
+                 max_failures: Optional[int] = None, spread_cores: bool = False) -> None:
+        """
+        The constructor for the Matrix class.
+
+        :param axes: (Dict[str, list]) the values of each axis keyed by the name of the axis
+        :param include: (Optional[List[dict]]) extra cells added to the product
+        :param exclude: (Optional[List[dict]]) partial cells where any cell with the same values is dropped
+        :param max_workers: (int) the maximum number of cells run at the same time
+        :param max_failures: (Optional[int]) the number of failed cells tolerated before the rest are cancelled
+        :param spread_cores: (bool) if True the cells running at the same time are pinned to disjoint sets of CPUs
+        """
+        if int(max_workers) < 1:
+            raise ValueError(f"matrix max_workers has to be at least 1 not {max_workers}")
+        for name, values in axes.items():
+            if not isinstance(values, list) or len(values) == 0:
+                raise ValueError(f"matrix axis {name} needs a list of at least one value")
+        self.axes: Dict[str, list] = axes
+        self.include: List[dict] = include or []
+        self.exclude: List[dict] = exclude or []
+        self.max_workers: int = int(max_workers)
+        self.max_failures: Optional[int] = int(max_failures) if max_failures is not None else None
+        self.spread_cores: bool = spread_cores
+
+    @classmethod
+    def from_config(cls, matrix_data: dict) -> "Matrix":
+        """
+        Builds a matrix from the matrix section of a config where every key apart from include, exclude, max_workers,
+        max_failures, and spread_cores is an axis.
+
+        :param matrix_data: (dict) the matrix section of the config
+        :return: (Matrix) the matrix defined by the config
+        """
+        axes = {key: value for key, value in matrix_data.items() if key not in cls.RESERVED_KEYS}
+        return cls(axes=axes, include=matrix_data.get("include"), exclude=matrix_data.get("exclude"),
+                   max_workers=matrix_data.get("max_workers", 1), max_failures=matrix_data.get("max_failures"),
+                   spread_cores=matrix_data.get("spread_cores", False) is True)
+
+    @staticmethod
+    def parse_txt_section(section: Dict[str, str]) -> dict:
+        """
+        Converts the [matrix] section of a txt config into the format of the yml and json configs. Axis values are
+        separated with commas, and include and exclude rules are separated with semicolons where each rule is a comma
+        separated list of axis:value pairs.
+
+        :param section: (Dict[str, str]) the lines of the [matrix] section split on the first =
+        :return: (dict) the matrix section in the format of the yml and json configs
+        """
+        matrix_data: dict = {}
+        for key, value in section.items():
+            if key in ("include", "exclude"):
+                matrix_data[key] = [
+                    dict(pair.split(":", 1) for pair in rule.split(",")) for rule in value.split(";") if rule != ""
+                ]
+            elif key in ("max_workers", "max_failures"):
+                matrix_data[key] = int(value)
+            elif key == "spread_cores":
+                matrix_data[key] = value.lower() in ("true", "yes", "1")
+            else:
+                matrix_data[key] = value.split(",")
+        return matrix_data
+
+    @staticmethod
+    def _matches(cell: dict, rule: dict) -> bool:
+        return all(key in cell and str(cell[key]) == str(value) for key, value in rule.items())
+
+    @staticmethod
+    def cell_name(cell: dict) -> str:
+        """
+        Gets a name for a cell that is safe to use as a directory name.
+
+        :param cell: (dict) the values of the cell keyed by axis
+        :return: (str) the name of the cell like "chunk-1_peril-wind"
+        """
+        return "_".join(re.sub(r"[^A-Za-z0-9.-]", "-", f"{key}-{value}") for key, value in cell.items())
+
+    @staticmethod
+    def cell_names(cells: List[dict]) -> List[str]:
+        """
+        Gets a name for every cell that is safe to use as a directory name. Cells that would get the same name, like
+        {"path": "a/b"} and {"path": "a b"}, have a short hash of their values added so they never share a directory.
+
+        :param cells: (List[dict]) the values of each cell keyed by axis
+        :return: (List[str]) the names of the cells in the same order as the cells
+        """
+        names = [Matrix.cell_name(cell=cell) for cell in cells]
+        counts = Counter(names)
+        return [
+            f"{name}-{hashlib.sha256(json.dumps(cell, default=str).encode()).hexdigest()[:8]}" if counts[name] > 1
+            else name for name, cell in zip(names, cells)
+        ]
+
+    @property
+    def cells(self) -> List[dict]:
+        names = list(self.axes.keys())
+        cells = [dict(zip(names, values)) for values in itertools.product(*self.axes.values())]
+        cells = [cell for cell in cells if not any(self._matches(cell=cell, rule=rule) for rule in self.exclude)]
+        for extra_cell in self.include:
+            if not any(self._matches(cell=cell, rule=extra_cell) and len(cell) == len(extra_cell) for cell in cells):
+                cells.append(dict(extra_cell))
+        return cells
@@ -0,0 +1,273 @@
+"""
+This file defines the registry of counters and histograms that gerund records while it runs, which can be exported in
+the Prometheus text format.
+"""
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from gerund.components.local_variable_storage import Singleton
+
+# the name of the config being run by the current thread or asyncio task which is used as the config label
+current_config: ContextVar[str] = ContextVar("gerund_metrics_config", default="")
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+                                      300.0, 900.0, 3600.0)
+
+LabelValues = Tuple[Tuple[str, str], ...]
+
+
+class MetricDefinition(NamedTuple):
+    """
+    A metric held by the registry.
+
+    Attributes:
+        name (str): the name of the metric like "gerund_commands_total"
+        kind (str): either "counter" or "histogram"
+        help (str): the description of the metric
+        buckets (Tuple[float, ...]): the upper bounds of the buckets if the metric is a histogram
+    """
+    name: str
+    kind: str
+    help: str
+    buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+
+
+DEFINITIONS: List[MetricDefinition] = [
+    MetricDefinition("gerund_commands_total", "counter", "Terminal commands run by host and config."),
+    MetricDefinition("gerund_command_failures_total", "counter",
+                     "Terminal commands that exited with a non zero status by host and config."),
+    MetricDefinition("gerund_command_duration_seconds", "histogram",
+                     "Time taken to run terminal commands by host and config."),
+    MetricDefinition("gerund_output_bytes_total", "counter", "Bytes of captured output by host and config."),
+    MetricDefinition("gerund_ssh_connect_seconds", "histogram",
+                     "Time from starting a remote command to the first byte of its output by host."),
+    MetricDefinition("gerund_variable_resolve_seconds", "histogram", "Time taken to resolve variables by source."),
+    MetricDefinition("gerund_scripts_total", "counter", "Bash scripts run by host."),
+    MetricDefinition("gerund_script_upload_seconds", "histogram", "Time taken to upload bash scripts by host."),
+]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra is not None else [])
+    if len(pairs) == 0:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _format_number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metrics(metaclass=Singleton):
+    """
+    This class is responsible for the counters and histograms recorded while gerund runs, such as the commands run and
+    failed, command durations, ssh connection latency, variable resolution latency, and output bytes. Recording is a
+    dictionary update under a lock so the registry can stay enabled. The metrics can be rendered in the Prometheus
+    text format, written atomically as a file for the node exporter textfile collector once or at an interval, and
+    served over a local HTTP endpoint.
+
+    Attributes:
+        enabled (bool): if False nothing is recorded
+        definitions (Dict[str, MetricDefinition]): the metrics of the registry keyed by name
+    """
+    def __init__(self, enabled: bool = True) -> None:
+        """
+        The constructor for the Metrics class.
+
+        :param enabled: (bool) if False nothing is recorded
+        """
+        self.enabled: bool = enabled
+        self.definitions: Dict[str, MetricDefinition] = {definition.name: definition for definition in DEFINITIONS}
+        self._lock: threading.Lock = threading.Lock()
+        self._counters: Dict[Tuple[str, LabelValues], float] = {}
+        self._histograms: Dict[Tuple[str, LabelValues], List[float]] = {}
+        self._writer: Optional[threading.Thread] = None
+        self._stop_writer: threading.Event = threading.Event()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def _definition(self, name: str, kind: str) -> MetricDefinition:
+        definition = self.definitions.get(name)
+        if definition is None or definition.kind != kind:
+            raise ValueError(f"{name} is not a {kind}")
+        return definition
+
+    def register(self, definition: MetricDefinition) -> None:
+        """
+        Adds a metric to the registry.
+
+        :param definition: (MetricDefinition) the metric being added
+        :return: None
+        """
+        if definition.kind not in ("counter", "histogram"):
+            raise ValueError(f"{definition.kind} is not a supported metric type")
+        self.definitions[definition.name] = definition
+
+    def inc(self, name: str, value: float = 1.0, **labels: str) -> None:
+        """
+        Increases a counter.
+
+        :param name: (str) the name of the counter
+        :param value: (float) the amount the counter goes up by
+        :param labels: the labels of the series like host="10.0.0.1"
+        :return: None
+        """
+        if self.enabled is False:
+            return
+        self._definition(name=name, kind="counter")
+        key = (name, tuple(sorted((label, str(label_value)) for label, label_value in labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """
+        Records a value in a histogram.
+
+        :param name: (str) the name of the histogram
+        :param value: (float) the value being recorded like a duration in seconds
+        :param labels: the labels of the series like host="10.0.0.1"
+        :return: None
+        """
+        if self.enabled is False:
+            return
+        definition = self._definition(name=name, kind="histogram")
+        key = (name, tuple(sorted((label, str(label_value)) for label, label_value in labels.items())))
+        with self._lock:
+            # the bucket counts are followed by the sum and count of the series
+            series = self._histograms.setdefault(key, [0.0] * (len(definition.buckets) + 2))
+            for index, bound in enumerate(definition.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    @staticmethod
+    @contextmanager
+    def config(name: str) -> Iterator[None]:
+        """
+        Labels the metrics recorded inside the context with the name of a config.
+
+        :param name: (str) the name of the config
+        :return: (Iterator[None]) the context
+        """
+        token = current_config.set(name)
+        try:
+            yield
+        finally:
+            current_config.reset(token)
+
+    def render(self) -> str:
+        """
+        Renders every series in the Prometheus text exposition format.
+
+        :return: (str) the metrics
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: list(series) for key, series in self._histograms.items()}
+
+        lines: List[str] = []
+        for name, definition in self.definitions.items():
+            lines.append(f"# HELP {name} {definition.help}")
+            lines.append(f"# TYPE {name} {definition.kind}")
+            if definition.kind == "counter":
+                for (series_name, labels), value in sorted(counters.items()):
+                    if series_name == name:
+                        lines.append(f"{name}{_format_labels(labels)} {_format_number(value)}")
+                continue
+            for (series_name, labels), series in sorted(histograms.items()):
+                if series_name != name:
+                    continue
+                cumulative = 0.0
+                for bound, count in zip(definition.buckets, series):
+                    cumulative += count
+                    bucket = _format_labels(labels, extra=("le", _format_number(bound)))
+                    lines.append(f"{name}_bucket{bucket} {_format_number(cumulative)}")
+                bucket = _format_labels(labels, extra=("le", "+Inf"))
+                lines.append(f"{name}_bucket{bucket} {_format_number(series[-1])}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_number(series[-2])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {_format_number(series[-1])}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str) -> None:
+        """
+        Writes the metrics to a file for the textfile collector of the node exporter. The file is written to a
+        temporary path first and then renamed so the collector never reads a half written file.
+
+        :param path: (str) the path of the file which should end in .prom
+        :return: None
+        """
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as file:
+            file.write(self.render())
+        os.replace(temp_path, path)
+
+    def start_textfile_writer(self, path: str, interval: float = 15.0) -> None:
+        """
+        Writes the metrics to a file every interval seconds in a background thread until stop is called.
+
+        :param path: (str) the path of the file which should end in .prom
+        :param interval: (float) the seconds between writes (default 15.0)
+        :return: None
+        """
+        def write_periodically() -> None:
+            while not self._stop_writer.wait(interval):
+                self.write_textfile(path=path)
+
+        self._stop_writer.clear()
+        self._writer = threading.Thread(target=write_periodically, daemon=True)
+        self._writer.start()
+
+    def serve(self, port: int, address: str = "127.0.0.1") -> int:
+        """
+        Serves the metrics on /metrics over HTTP from a background thread until stop is called.
+
+        :param port: (int) the port to listen on, 0 picks a free port
+        :param address: (str) the address to listen on (default 127.0.0.1)
+        :return: (int) the port being listened on
+        """
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                return
+
+        self._server = ThreadingHTTPServer((address, port), MetricsHandler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server.server_address[1]
+
+    def stop(self) -> None:
+        """
+        Stops the textfile writer and the HTTP endpoint if they are running.
+
+        :return: None
+        """
+        if self._writer is not None:
+            self._stop_writer.set()
+            self._writer.join()
+            self._writer = None
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,150 @@
+"""
+This file defines the writer that combines the outputs of tasks running in parallel into one file in the order the
+tasks were submitted.
+"""
+import shutil
+import tempfile
+from threading import Lock
+from typing import IO, Dict, List, Optional, Set, Union
+
+
+class OrderedWriter:
+    """
+    This class is responsible for merging the outputs of parallel tasks into one file in submission order without
+    holding them in memory. Output from the task whose turn it is goes straight to the file, output from later tasks
+    is streamed to a temporary spool file, and when a task finishes the spools of the tasks after it are appended as
+    soon as it is their turn. An optional header such as "==> {name} <==" is written before the output of each task.
+
+    Attributes:
+        path (str): the path of the file the outputs are combined into
+        names (Optional[List[str]]): the names of the tasks used in the headers, the index is used if not supplied
+        header (Optional[str]): the header written before the output of each task formatted with {index} and {name}
+        spool_directory (Optional[str]): the directory for the spool files, None uses the temp directory
+    """
+    def __init__(self, path: str, names: Optional[List[str]] = None, header: Optional[str] = None,
+                 spool_directory: Optional[str] = None) -> None:
+        """
+        The constructor for the OrderedWriter class.
+
+        :param path: (str) the path of the file the outputs are combined into
+        :param names: (Optional[List[str]]) the names of the tasks used in the headers
+        :param header: (Optional[str]) the header written before the output of each task formatted with {index} and
+                       {name}
+        :param spool_directory: (Optional[str]) the directory for the spool files, None uses the temp directory
+        """
+        self.path: str = path
+        self.names: Optional[List[str]] = names
+        self.header: Optional[str] = header
+        self.spool_directory: Optional[str] = spool_directory
+        self._lock: Lock = Lock()
+        self._file: IO[bytes] = open(path, "wb")
+        self._spools: Dict[int, IO[bytes]] = {}
+        self._finished: Set[int] = set()
+        self._next_index: int = 0
+        self._current_started: bool = False
+
+    def __enter__(self) -> "OrderedWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def _start_current(self) -> None:
+        """
+        Writes the header of the task whose turn it is followed by anything it has already spooled.
+
+        :return: None
+        """
+        if self._current_started is True:
+            return
+        self._current_started = True
+        if self.header is not None:
+            name = self.names[self._next_index] if self.names is not None else str(self._next_index)
+            self._file.write((self.header.format(index=self._next_index, name=name) + "\n").encode())
+
+        spool = self._spools.pop(self._next_index, None)
+        if spool is not None:
+            spool.seek(0)
+            shutil.copyfileobj(spool, self._file)
+            spool.close()
+
+    def _advance(self) -> None:
+        """
+        Moves the turn past every finished task and flushes the output of the task whose turn it is now.
+
+        :return: None
+        """
+        while self._next_index in self._finished:
+            self._start_current()
+            self._finished.remove(self._next_index)
+            self._next_index += 1
+            self._current_started = False
+
+        if self._next_index in self._spools or (self.names is not None and self._next_index < len(self.names)):
+            self._start_current()
+        self._file.flush()
+
+    def write(self, index: int, data: Union[str, bytes]) -> None:
+        """
+        Writes output for a task either straight to the file if it is the turn of the task or to its spool.
+
+        :param index: (int) the submission order of the task starting at 0
+        :param data: (Union[str, bytes]) the output being written
+        :return: None
+        """
+        if isinstance(data, str):
+            data = data.encode()
+        with self._lock:
+            if index < self._next_index or index in self._finished:
+                raise ValueError(f"task {index} has already finished")
+            if index == self._next_index:
+                self._start_current()
+                self._file.write(data)
+                self._file.flush()
+                return
+            spool = self._spools.get(index)
+            if spool is None:
+                spool = tempfile.TemporaryFile(dir=self.spool_directory)
+                self._spools[index] = spool
+            spool.write(data)
+
+    def write_lines(self, index: int, lines: List[str]) -> None:
+        """
+        Writes lines of output for a task adding a newline to each one.
+
+        :param index: (int) the submission order of the task starting at 0
+        :param lines: (List[str]) the lines being written
+        :return: None
+        """
+        self.write(index=index, data="".join(f"{line}\n" for line in lines))
+
+    def finish(self, index: int) -> None:
+        """
+        Marks a task as finished so its output and the finished outputs after it are written to the file once it is
+        their turn.
+
+        :param index: (int) the submission order of the task starting at 0
+        :return: None
+        """
+        with self._lock:
+            self._finished.add(index)
+            self._advance()
+
+    def close(self) -> None:
+        """
+        Writes the outputs of any tasks that have not finished in submission order and closes the file.
+
+        :return: None
+        """
+        with self._lock:
+            if self._file.closed:
+                return
+            remaining = sorted(set(self._spools.keys()) | self._finished)
+            if self.names is not None:
+                remaining = sorted(set(remaining) | set(range(self._next_index, len(self.names))))
+            for index in remaining:
+                if index > self._next_index:
+                    self._next_index = index
+                    self._current_started = False
+                self._start_current()
+            self._file.close()
@@ -0,0 +1,146 @@
+"""
+This file defines the class that captures the stdout and stderr of a process at the same time without deadlocking.
+"""
+import os
+import selectors
+import time
+import zlib
+from subprocess import Popen
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from gerund.components.input_stream import InputStream
+
+
+class OutputLine(NamedTuple):
+    """
+    A line of output read from a process.
+
+    Attributes:
+        timestamp (float): the unix time that the line was read
+        stream (str): the stream the line came from which is either "stdout" or "stderr"
+        text (str): the decoded line without the trailing newline
+    """
+    timestamp: float
+    stream: str
+    text: str
+
+
+class OutputCapture:
+    """
+    This class is responsible for reading the stdout and stderr pipes of a process concurrently with a selector so a
+    process writing a lot to one stream never blocks on a full pipe while the other stream is being waited on. Input
+    for the process can be written to its stdin by the same selector as the process is ready for it.
+
+    Attributes:
+        lines (List[OutputLine]): every line captured in the order that it was read
+        on_line (Optional[Callable[[OutputLine], None]]): called with every line as soon as it is read if present
+        first_read (Optional[float]): the unix time the first data arrived from the process
+    """
+    def __init__(self, on_line: Optional[Callable[[OutputLine], None]] = None) -> None:
+        """
+        The constructor for the OutputCapture class.
+
+        :param on_line: (Optional[Callable[[OutputLine], None]]) called with every line as soon as it is read
+        """
+        self.lines: List[OutputLine] = []
+        self.on_line: Optional[Callable[[OutputLine], None]] = on_line
+        self.first_read: Optional[float] = None
+
+    def _add_lines(self, stream: str, data: bytes, timestamp: float) -> None:
+        """
+        Decodes complete lines of data and adds them to self.lines.
+
+        :param stream: (str) the stream the data came from
+        :param data: (bytes) the data made up of complete lines without the trailing newline
+        :param timestamp: (float) the unix time that the data was read
+        :return: None
+        """
+        for line in data.split(b"\n"):
+            output_line = OutputLine(timestamp=timestamp, stream=stream, text=line.decode(errors="replace"))
+            self.lines.append(output_line)
+            if self.on_line is not None:
+                self.on_line(output_line)
+
+    def add(self, stream: str, text: str) -> None:
+        """
+        Adds text that did not come from a process, such as the output of a built-in step, as lines of a stream.
+
+        :param stream: (str) the stream the text belongs to which is either "stdout" or "stderr"
+        :param text: (str) the text without the trailing newline
+        :return: None
+        """
+        self._add_lines(stream=stream, data=text.encode(), timestamp=time.time())
+
+    def read(self, process: Popen, decompress_stdout: bool = False,
+             input_stream: Optional[InputStream] = None) -> None:
+        """
+        Reads the stdout and stderr pipes of a process until both are closed. Pipes that were not opened with PIPE
+        are skipped. If an input stream is passed it is written to the stdin of the process whenever the pipe has
+        room, and the pipe is closed once the input is used up.
+
+        :param process: (Popen) the process that is being read
+        :param decompress_stdout: (bool) if True stdout is a gzip stream that is decoded as it is read
+        :param input_stream: (Optional[InputStream]) the data written to the stdin of the process if present
+        :return: None
+        """
+        selector = selectors.DefaultSelector()
+        partial_lines: Dict[str, bytes] = {}
+        decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16) if decompress_stdout is True else None
+
+        for stream, pipe in (("stdout", process.stdout), ("stderr", process.stderr)):
+            if pipe is not None:
+                selector.register(pipe, selectors.EVENT_READ, stream)
+                partial_lines[stream] = b""
+        if input_stream is not None and process.stdin is not None:
+            os.set_blocking(process.stdin.fileno(), False)
+            selector.register(process.stdin, selectors.EVENT_WRITE, "stdin")
+
+        while len(selector.get_map()) > 0:
+            for key, _ in selector.select():
+                if key.data == "stdin":
+                    if input_stream.write(pipe=key.fileobj) is False:
+                        selector.unregister(key.fileobj)
+                        input_stream.close(pipe=key.fileobj)
+                    continue
+                raw_chunk = os.read(key.fd, 65536)
+                timestamp = time.time()
+                if self.first_read is None and raw_chunk != b"":
+                    self.first_read = timestamp
+                decode = decompressor is not None and key.data == "stdout"
+
+                if raw_chunk == b"":
+                    selector.unregister(key.fileobj)
+                    key.fileobj.close()
+                    remaining = partial_lines[key.data] + (decompressor.flush() if decode is True else b"")
+                    if remaining != b"":
+                        self._add_lines(stream=key.data, data=remaining, timestamp=timestamp)
+                    continue
+
+                chunk = decompressor.decompress(raw_chunk) if decode is True else raw_chunk
+                data = partial_lines[key.data] + chunk
+                end_of_lines = data.rfind(b"\n")
+                if end_of_lines == -1:
+                    partial_lines[key.data] = data
+                    continue
+                partial_lines[key.data] = data[end_of_lines + 1:]
+                self._add_lines(stream=key.data, data=data[:end_of_lines], timestamp=timestamp)
+        selector.close()
+
+    def interleaved(self, tagged: bool = False) -> List[str]:
+        """
+        Gets the lines from both streams in the order that they were read.
+
+        :param tagged: (bool) if True each line is prefixed with the stream that it came from like "[stderr] "
+        :return: (List[str]) the lines from both streams
+        """
+        if tagged is True:
+            return [f"[{line.stream}] {line.text}" for line in self.lines]
+        return [line.text for line in self.lines]
+
+    @property
+    def stdout(self) -> List[str]:
+        return [line.text for line in self.lines if line.stream == "stdout"]
+
+    @property
+    def stderr(self) -> List[str]:
+        return [line.text for line in self.lines if line.stream == "stderr"]
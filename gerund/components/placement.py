@@ -0,0 +1,221 @@
+"""
+This file defines where and how local commands are placed on the machine, covering the CPUs they run on, their CPU and
+IO priority, and the cgroup that limits them.
+"""
+import os
+import shlex
+import shutil
+from contextlib import contextmanager
+from queue import Queue
+from typing import Iterable, Iterator, List, Optional, Set, Union
+
+CpuSet = Union[str, Iterable[int]]
+
+
+def parse_cpu_set(cpu_set: CpuSet) -> Set[int]:
+    """
+    Parses a CPU list in the format used by taskset and cpusets like "0-3,8,10-11".
+
+    :param cpu_set: (CpuSet) the CPU list or an iterable of CPU numbers
+    :return: (Set[int]) the CPU numbers
+    """
+    if not isinstance(cpu_set, str):
+        return {int(cpu) for cpu in cpu_set}
+    cpus: Set[int] = set()
+    for part in cpu_set.split(","):
+        part = part.strip()
+        if part == "":
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            cpus.update(range(int(start), int(end) + 1))
+        else:
+            cpus.add(int(part))
+    return cpus
+
+
+class Placement:
+    """
+    This class is responsible for placing a local process on the machine. The shell of the command moves itself into
+    a cgroup v2 group with memory and CPU limits, pins itself to a set of CPUs with taskset, and sets its nice level
+    with renice and its IO priority with ionice before anything else in the command runs, so every child inherits the
+    placement. Nothing runs in the child between fork and exec, which is not safe in a process with threads. The
+    cgroup has to be somewhere the user can write to such as a delegated subtree.
+
+    Attributes:
+        cpu_set (Optional[Set[int]]): the CPUs the process is allowed to run on
+        nice (Optional[int]): the nice level of the process from -20 to 19
+        ionice_class (Optional[int]): the IO scheduling class which is 1 for realtime, 2 for best effort, 3 for idle
+        ionice_level (Optional[int]): the IO priority within the class from 0 to 7
+        cgroup (Optional[str]): the path of the cgroup relative to cgroup_root
+        memory_max (Optional[str]): the memory limit of the cgroup like "2G"
+        cpu_max (Optional[float]): the number of CPUs worth of time the cgroup can use
+        cgroup_root (str): the path that the cgroup v2 hierarchy is mounted on
+    """
+    CONFIG_KEYS = ("cpu_set", "nice", "ionice_class", "ionice_level", "cgroup", "memory_max", "cpu_max", "cgroup_root")
+
+    def __init__(self, cpu_set: Optional[CpuSet] = None, nice: Optional[int] = None,
+                 ionice_class: Optional[int] = None, ionice_level: Optional[int] = None, cgroup: Optional[str] = None,
+                 memory_max: Optional[str] = None, cpu_max: Optional[float] = None,
+                 cgroup_root: str = "/sys/fs/cgroup") -> None:
+        """
+        The constructor for the Placement class.
+
+        :param cpu_set: (Optional[CpuSet]) the CPUs the process is allowed to run on like "0-3,8" or [0, 1, 2, 3]
+        :param nice: (Optional[int]) the nice level of the process from -20 to 19
+        :param ionice_class: (Optional[int]) the IO scheduling class, 1 realtime, 2 best effort, 3 idle
+        :param ionice_level: (Optional[int]) the IO priority within the class from 0 to 7
+        :param cgroup: (Optional[str]) the path of the cgroup relative to cgroup_root
+        :param memory_max: (Optional[str]) the memory limit of the cgroup like "2G"
+        :param cpu_max: (Optional[float]) the number of CPUs worth of time the cgroup can use
+        :param cgroup_root: (str) the path that the cgroup v2 hierarchy is mounted on (default /sys/fs/cgroup)
+        """
+        self.cpu_set: Optional[Set[int]] = parse_cpu_set(cpu_set) if cpu_set is not None else None
+        self.nice: Optional[int] = int(nice) if nice is not None else None
+        self.ionice_class: Optional[int] = int(ionice_class) if ionice_class is not None else None
+        self.ionice_level: Optional[int] = int(ionice_level) if ionice_level is not None else None
+        self.cgroup: Optional[str] = cgroup
+        self.memory_max: Optional[str] = str(memory_max) if memory_max is not None else None
+        self.cpu_max: Optional[float] = float(cpu_max) if cpu_max is not None else None
+        self.cgroup_root: str = cgroup_root
+        self._check_inputs()
+
+    def _check_inputs(self) -> None:
+        """
+        Checks that the placement options are valid raising an error if not.
+
+        :return: None
+        """
+        if self.cpu_set is not None:
+            if shutil.which("taskset") is None:
+                raise ValueError("cpu sets need taskset which was not found")
+            if len(self.cpu_set) == 0:
+                raise ValueError("a cpu set needs at least one cpu")
+        if self.nice is not None and not -20 <= self.nice <= 19:
+            raise ValueError(f"nice has to be between -20 and 19 not {self.nice}")
+        if self.ionice_class is not None and self.ionice_class not in (1, 2, 3):
+            raise ValueError(f"ionice class has to be 1, 2, or 3 not {self.ionice_class}")
+        if self.ionice_level is not None and not 0 <= self.ionice_level <= 7:
+            raise ValueError(f"ionice level has to be between 0 and 7 not {self.ionice_level}")
+        if self.cgroup is None and (self.memory_max is not None or self.cpu_max is not None):
+            raise ValueError("memory_max and cpu_max need a cgroup")
+        if self.cpu_max is not None and self.cpu_max <= 0:
+            raise ValueError(f"cpu_max has to be more than 0 not {self.cpu_max}")
+
+    @classmethod
+    def from_config(cls, placement_data: dict) -> "Placement":
+        """
+        Builds a placement from the placement section of a config.
+
+        :param placement_data: (dict) the placement section of the config
+        :return: (Placement) the placement defined by the config
+        """
+        return cls(**{
+            key: value for key, value in placement_data.items() if key in cls.CONFIG_KEYS and value is not None
+        })
+
+    def with_cpu_set(self, cpu_set: CpuSet) -> "Placement":
+        """
+        Copies the placement with a different set of CPUs.
+
+        :param cpu_set: (CpuSet) the CPUs the copy is allowed to run on
+        :return: (Placement) the copy of the placement
+        """
+        return Placement(cpu_set=cpu_set, nice=self.nice, ionice_class=self.ionice_class,
+                         ionice_level=self.ionice_level, cgroup=self.cgroup, memory_max=self.memory_max,
+                         cpu_max=self.cpu_max, cgroup_root=self.cgroup_root)
+
+    @property
+    def cgroup_path(self) -> Optional[str]:
+        if self.cgroup is None:
+            return None
+        return os.path.join(self.cgroup_root, self.cgroup.strip("/"))
+
+    def prepare(self) -> None:
+        """
+        Creates the cgroup and writes its limits. This is run in the parent before the process is started.
+
+        :return: None
+        """
+        if self.cgroup_path is None:
+            return
+        try:
+            os.makedirs(self.cgroup_path, exist_ok=True)
+            if self.memory_max is not None:
+                with open(f"{self.cgroup_path}/memory.max", "w") as file:
+                    file.write(self.memory_max)
+            if self.cpu_max is not None:
+                with open(f"{self.cgroup_path}/cpu.max", "w") as file:
+                    file.write(f"{int(self.cpu_max * 100000)} 100000")
+        except OSError as error:
+            raise ValueError(f"cgroup {self.cgroup_path} could not be set up: {error}")
+
+    def command_prefix(self) -> str:
+        """
+        Gets the part of the command that places the shell so every command in it inherits the placement. The nice
+        level is added to the nice level of this process like os.nice.
+
+        :return: (str) the prefix for the command which is empty if nothing is placed
+        """
+        prefix = ""
+        if self.cgroup_path is not None:
+            prefix += f"echo $$ > {shlex.quote(f'{self.cgroup_path}/cgroup.procs')} && "
+        if self.cpu_set is not None:
+            prefix += f"taskset -p -c {','.join(str(cpu) for cpu in sorted(self.cpu_set))} $$ > /dev/null && "
+        if self.nice is not None:
+            nice = min(max(os.getpriority(os.PRIO_PROCESS, 0) + self.nice, -20), 19)
+            prefix += f"renice {nice} -p $$ > /dev/null && "
+        if self.ionice_class is not None or self.ionice_level is not None:
+            ionice_class = self.ionice_class if self.ionice_class is not None else 2
+            level = f" -n {self.ionice_level}" if self.ionice_level is not None and ionice_class != 3 else ""
+            prefix += f"ionice -c {ionice_class}{level} -p $$ && "
+        return prefix
+
+
+class CoreAllocator:
+    """
+    This class is responsible for splitting the CPUs of the machine into disjoint sets so tasks running in parallel
+    each get their own cores. A task takes a set for as long as it runs and hands it back when it finishes. If there
+    are more workers than CPUs the single CPU sets are shared between workers.
+
+    Attributes:
+        core_sets (List[Set[int]]): the sets of CPUs handed out to the tasks
+    """
+    def __init__(self, workers: int, cpu_set: Optional[CpuSet] = None) -> None:
+        """
+        The constructor for the CoreAllocator class.
+
+        :param workers: (int) the number of tasks that run at the same time
+        :param cpu_set: (Optional[CpuSet]) the CPUs to split, None uses every CPU the process can run on
+        """
+        if workers < 1:
+            raise ValueError(f"workers has to be at least 1 not {workers}")
+        cores: List[int] = sorted(parse_cpu_set(cpu_set) if cpu_set is not None else os.sched_getaffinity(0))
+        self.core_sets: List[Set[int]] = []
+        if workers <= len(cores):
+            size, remainder = divmod(len(cores), workers)
+            start = 0
+            # neighbouring cores are kept together as they are more likely to share caches and a NUMA node
+            for index in range(workers):
+                end = start + size + (1 if index < remainder else 0)
+                self.core_sets.append(set(cores[start:end]))
+                start = end
+        else:
+            self.core_sets = [{cores[index % len(cores)]} for index in range(workers)]
+
+        self._free: Queue = Queue()
+        for core_set in self.core_sets:
+            self._free.put(core_set)
+
+    @contextmanager
+    def acquire(self) -> Iterator[Set[int]]:
+        """
+        Takes a free set of CPUs for the lifetime of the context waiting for one if they are all taken.
+
+        :return: (Iterator[Set[int]]) the CPUs for the task
+        """
+        core_set = self._free.get()
+        try:
+            yield core_set
+        finally:
+            self._free.put(core_set)
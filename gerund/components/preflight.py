@@ -0,0 +1,254 @@
+"""
+This file defines the pre-flight check that makes sure servers can be reached and are healthy before any work is sent
+to them.
+"""
+import json
+import math
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from subprocess import DEVNULL, PIPE, Popen, TimeoutExpired
+from typing import Dict, List, NamedTuple, Optional
+
+from gerund.components.host_limiter import HostLimiter
+from gerund.components.local_variable_storage import Singleton
+from gerund.components.ssh_options import SshOptions
+from gerund.components.tracer import Tracer
+
+
+class HostHealth(NamedTuple):
+    """
+    The outcome of the pre-flight check of a server.
+
+    Attributes:
+        host (str): the IP address of the server
+        healthy (bool): True if work can be sent to the server
+        reason (Optional[str]): why the server is not healthy if it is not
+        free_disk_mb (Optional[int]): the free space in megabytes on the disk of the checked path
+        load (Optional[float]): the one minute load average of the server
+        cpus (Optional[int]): the number of CPUs of the server
+        seconds (float): the time taken for the check
+        cached (bool): True if the measurements came from a recent check instead of the server
+        checked_at (float): the unix time the measurements or the error were read from the server
+    """
+    host: str
+    healthy: bool
+    reason: Optional[str]
+    free_disk_mb: Optional[int] = None
+    load: Optional[float] = None
+    cpus: Optional[int] = None
+    seconds: float = 0.0
+    cached: bool = False
+    checked_at: float = 0.0
+
+
+class Preflight(metaclass=Singleton):
+    """
+    This class is responsible for checking servers before work is sent to them. Every server is checked at the same
+    time with one ssh call in batch mode with a short connect timeout, so a dead server or a bad key is found in
+    seconds instead of after the full TCP timeout or after work has started on the other servers. The call reads the
+    free disk space, load average, and number of CPUs of the server, and servers that cannot be reached, fail to
+    authenticate, are low on disk, or are overloaded are marked unhealthy. The measurements of servers that could be
+    reached are cached on disk for ttl seconds so back to back runs skip the check. The outcomes of the last check are
+    kept so runners can exclude the unhealthy servers.
+
+    Attributes:
+        connect_timeout (float): the seconds allowed for connecting to a server, the whole check is allowed twice this
+        min_free_disk_mb (int): the free disk space in megabytes a server needs to be healthy
+        max_load_per_cpu (Optional[float]): the highest load average per CPU of a healthy server, None skips the check
+        disk_path (str): the path on the server whose disk is checked
+        ttl (float): the seconds the measurements of a server are reused for
+        cache_path (str): the file the measurements are cached in
+        results (Dict[str, HostHealth]): the outcome of the last check of each server keyed by its IP address, an
+                                         outcome older than ttl seconds is no longer used to exclude the server
+    """
+    def __init__(self, connect_timeout: float = 5.0, min_free_disk_mb: int = 1024,
+                 max_load_per_cpu: Optional[float] = 2.0, disk_path: str = "~", ttl: float = 60.0,
+                 cache_path: Optional[str] = None) -> None:
+        """
+        The constructor for the Preflight class.
+
+        :param connect_timeout: (float) the seconds allowed for connecting to a server (default 5)
+        :param min_free_disk_mb: (int) the free disk space in megabytes a server needs (default 1024)
+        :param max_load_per_cpu: (Optional[float]) the highest load average per CPU of a healthy server (default 2.0)
+        :param disk_path: (str) the path on the server whose disk is checked (default the home directory)
+        :param ttl: (float) the seconds the measurements of a server are reused for (default 60)
+        :param cache_path: (Optional[str]) the file the measurements are cached in (default ~/.gerund/preflight.json)
+        """
+        self.connect_timeout: float = connect_timeout
+        self.min_free_disk_mb: int = min_free_disk_mb
+        self.max_load_per_cpu: Optional[float] = max_load_per_cpu
+        self.disk_path: str = disk_path
+        self.ttl: float = ttl
+        self.cache_path: str = cache_path if cache_path is not None else \
+            os.path.join(os.path.expanduser("~"), ".gerund", "preflight.json")
+        self.results: Dict[str, HostHealth] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def _compile_command(self, host: str, username: str, key: Optional[str]) -> str:
+        """
+        Compiles the ssh command that reads the health of a server.
+
+        :param host: (str) the IP address of the server
+        :param username: (str) the username for the server
+        :param key: (Optional[str]) path to the pem key for the server
+        :return: (str) the command printing the disk line of df, the load average, and the number of CPUs
+        """
+        ssh_options = f"-o BatchMode=yes -o ConnectTimeout={math.ceil(self.connect_timeout)} {SshOptions().options}"
+        if key is not None:
+            ssh_options += f" -i '{key}'"
+        remote_command = f"df -Pk {self.disk_path} | tail -n 1 && cut -d \" \" -f 1 /proc/loadavg && nproc"
+        return f"ssh {ssh_options} {username}@{host} '{remote_command}'"
+
+    def _evaluate(self, host: str, measurements: dict, seconds: float, cached: bool = False) -> HostHealth:
+        """
+        Works out if a server is healthy from its measurements.
+
+        :param host: (str) the IP address of the server
+        :param measurements: (dict) the "free_disk_mb", "load", "cpus", and "checked_at" of the server
+        :param seconds: (float) the time taken for the check
+        :param cached: (bool) True if the measurements came from the cache
+        :return: (HostHealth) the outcome of the check
+        """
+        free_disk_mb, load, cpus = measurements["free_disk_mb"], measurements["load"], measurements["cpus"]
+        reason: Optional[str] = None
+        if free_disk_mb < self.min_free_disk_mb:
+            reason = f"only {free_disk_mb} MB free on {self.disk_path}, {self.min_free_disk_mb} MB needed"
+        elif self.max_load_per_cpu is not None and load > self.max_load_per_cpu * cpus:
+            reason = f"load {load:.2f} on {cpus} CPUs is over {self.max_load_per_cpu:.2f} per CPU"
+        return HostHealth(host=host, healthy=reason is None, reason=reason, free_disk_mb=free_disk_mb, load=load,
+                          cpus=cpus, seconds=seconds, cached=cached, checked_at=measurements["checked_at"])
+
+    def _probe(self, host: str, username: str, key: Optional[str]) -> dict:
+        """
+        Reads the measurements of a server over ssh.
+
+        :param host: (str) the IP address of the server
+        :param username: (str) the username for the server
+        :param key: (Optional[str]) path to the pem key for the server
+        :return: (dict) the "free_disk_mb", "load", and "cpus" of the server, or the "error" of the check
+        """
+        with HostLimiter().acquire(ip_address=host), Tracer().span("preflight.host", host=host):
+            # the ssh process gets its own process group so it is killed along with the shell on a timeout
+            process = Popen(self._compile_command(host=host, username=username, key=key), shell=True,
+                            stdin=DEVNULL, stdout=PIPE, stderr=PIPE, start_new_session=True)
+            try:
+                stdout, stderr = process.communicate(timeout=self.connect_timeout * 2)
+            except TimeoutExpired:
+                os.killpg(process.pid, signal.SIGKILL)
+                process.communicate()
+                return {"error": f"timed out after {self.connect_timeout * 2:g} seconds"}
+
+        errors = [line for line in stderr.decode(errors="replace").splitlines()
+                  if line.strip() != "" and not line.startswith("Warning: Permanently added")]
+        if process.returncode != 0:
+            detail = errors[-1] if len(errors) > 0 else f"exit code {process.returncode}"
+            if "Permission denied" in detail or "Host key verification failed" in detail:
+                return {"error": f"authentication failed: {detail}"}
+            return {"error": f"unreachable: {detail}"}
+        try:
+            disk_line, load_line, cpus_line = stdout.decode().strip().splitlines()[-3:]
+            return {"free_disk_mb": int(disk_line.split()[3]) // 1024, "load": float(load_line),
+                    "cpus": int(cpus_line)}
+        except ValueError:
+            return {"error": f"could not read the health of the server from {stdout[-200:]!r}"}
+
+    def _load_cache(self) -> Dict[str, dict]:
+        """
+        Loads the cached measurements.
+
+        :return: (Dict[str, dict]) the measurements keyed by "username@host"
+        """
+        try:
+            with open(self.cache_path, "r") as file:
+                return json.loads(file.read())
+        except (OSError, ValueError):
+            return {}
+
+    def _save_cache(self, cache: Dict[str, dict]) -> None:
+        """
+        Writes the measurements to the cache replacing the file in one step.
+
+        :param cache: (Dict[str, dict]) the measurements keyed by "username@host"
+        :return: None
+        """
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        temp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as file:
+            file.write(json.dumps(cache))
+        os.replace(temp_path, self.cache_path)
+
+    def check(self, hosts: List[str], username: str = "ubuntu", key: Optional[str] = None,
+              use_cache: bool = True) -> List[HostHealth]:
+        """
+        Checks every server at the same time, reusing measurements cached less than ttl seconds ago.
+
+        :param hosts: (List[str]) the IP addresses of the servers
+        :param username: (str) the username for the servers (default is "ubuntu")
+        :param key: (Optional[str]) path to the pem key for the servers
+        :param use_cache: (bool) if False every server is checked even if it was checked recently
+        :return: (List[HostHealth]) the outcome of the check of each server in the order of the hosts
+        """
+        hosts = list(dict.fromkeys(hosts))
+        if len(hosts) == 0:
+            return []
+        cache = self._load_cache() if use_cache is True else {}
+        fresh: Dict[str, dict] = {}
+
+        def check_host(host: str) -> HostHealth:
+            entry = cache.get(f"{username}@{host}")
+            if entry is not None and time.time() - entry["checked_at"] < self.ttl:
+                return self._evaluate(host=host, measurements=entry, seconds=0.0, cached=True)
+            start = time.perf_counter()
+            measurements = {**self._probe(host=host, username=username, key=key), "checked_at": time.time()}
+            seconds = time.perf_counter() - start
+            if "error" in measurements:
+                return HostHealth(host=host, healthy=False, reason=measurements["error"], seconds=seconds,
+                                  checked_at=measurements["checked_at"])
+            fresh[f"{username}@{host}"] = measurements
+            return self._evaluate(host=host, measurements=measurements, seconds=seconds)
+
+        with Tracer().span("preflight.check", hosts=len(hosts)), \
+                ThreadPoolExecutor(max_workers=len(hosts)) as executor:
+            results = list(executor.map(check_host, hosts))
+
+        with self._lock:
+            if len(fresh) > 0:
+                self._save_cache(cache={**self._load_cache(), **fresh})
+            self.results.update({result.host: result for result in results})
+        return results
+
+    def reason(self, host: str) -> Optional[str]:
+        """
+        Gets why a server failed its last check.
+
+        :param host: (str) the IP address of the server
+        :return: (Optional[str]) the reason or None if the server passed or was not checked in the last ttl seconds
+        """
+        result = self.results.get(host)
+        if result is None or result.healthy is True or time.time() - result.checked_at >= self.ttl:
+            return None
+        return result.reason
+
+    @staticmethod
+    def report(results: List[HostHealth]) -> List[str]:
+        """
+        Formats the outcomes of a check as lines of a table.
+
+        :param results: (List[HostHealth]) the outcomes of the check
+        :return: (List[str]) a line per server followed by a total line
+        """
+        width = max([len("host")] + [len(result.host) for result in results])
+        lines = []
+        for result in results:
+            if result.healthy is True:
+                cached = ", cached" if result.cached is True else ""
+                detail = f"{result.free_disk_mb} MB free, load {result.load:.2f} on {result.cpus} CPUs{cached}"
+            else:
+                detail = result.reason
+            lines.append(f"{result.host.ljust(width)}  {'ok' if result.healthy else 'unhealthy':<9}  {detail}")
+        unhealthy = len([result for result in results if result.healthy is False])
+        lines.append(f"{len(results)} hosts checked, {unhealthy} unhealthy")
+        return lines
@@ -0,0 +1,322 @@
+"""
+This file defines the live view of the tasks in a run showing how far along the run is.
+"""
+import shutil
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import IO, Callable, Iterator, List, Optional
+
+from termcolor import colored
+
+from gerund.components.local_variable_storage import Singleton
+from gerund.components.output_capture import OutputLine
+
+# the key of the task being run by the current thread or asyncio task
+current_task: ContextVar[Optional[int]] = ContextVar("gerund_progress_task", default=None)
+
+
+def _format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def _format_seconds(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+class TaskProgress:
+    """
+    This class is responsible for holding the state of a task shown in the progress view.
+
+    Attributes:
+        name (str): the name of the task like the config name
+        host (str): the server the task runs on or "local"
+        state (str): one of "queued", "running", "ok", "failed", or "skipped"
+        started (Optional[float]): the monotonic time the task started
+        finished (Optional[float]): the monotonic time the task finished
+        lines (int): the number of output lines read from the task
+        bytes (int): the size of the output read from the task
+        last_line (str): the most recent output line of the task
+    """
+    def __init__(self, name: str, host: str = "local") -> None:
+        """
+        The constructor for the TaskProgress class.
+
+        :param name: (str) the name of the task like the config name
+        :param host: (str) the server the task runs on or "local"
+        """
+        self.name: str = name
+        self.host: str = host
+        self.state: str = "queued"
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.lines: int = 0
+        self.bytes: int = 0
+        self.last_line: str = ""
+
+    def elapsed(self, now: float) -> float:
+        """
+        Gets how long the task has been running for.
+
+        :param now: (float) the current monotonic time
+        :return: (float) the seconds the task has been running or ran for
+        """
+        if self.started is None:
+            return 0.0
+        return (self.finished if self.finished is not None else now) - self.started
+
+
+class Progress(metaclass=Singleton):
+    """
+    This class is responsible for a live view of the tasks in a run. Runners add their tasks and wrap each task in
+    track so the output lines read by the commands of the task are counted against it. A background thread redraws the
+    view in place at a fixed rate when the stream is a terminal, showing every running task with its host, elapsed
+    time, output rate, and last line under a header with the overall throughput and an estimate of the time left.
+    When the stream is not a terminal a plain summary line is written every plain_interval seconds instead. Counting a
+    line is a few attribute updates so the cost to the commands is kept low.
+
+    Attributes:
+        tasks (List[TaskProgress]): the tasks of the run in the order they were added
+        stream (IO[str]): the stream the view is written to
+        interval (float): the seconds between redraws of the view on a terminal
+        plain_interval (float): the seconds between summary lines when the stream is not a terminal
+    """
+    def __init__(self) -> None:
+        """
+        The constructor for the Progress class.
+        """
+        self.tasks: List[TaskProgress] = []
+        self.stream: IO[str] = sys.stdout
+        self.interval: float = 0.5
+        self.plain_interval: float = 10.0
+        self._lock: threading.Lock = threading.Lock()
+        self._started: float = time.monotonic()
+        self._thread: Optional[threading.Thread] = None
+        self._stop: threading.Event = threading.Event()
+        self._drawn_lines: int = 0
+        self._tty: bool = False
+
+    def add(self, name: str, host: str = "local") -> int:
+        """
+        Adds a queued task to the view.
+
+        :param name: (str) the name of the task like the config name
+        :param host: (str) the server the task runs on or "local"
+        :return: (int) the key of the task
+        """
+        with self._lock:
+            self.tasks.append(TaskProgress(name=name, host=host))
+            return len(self.tasks) - 1
+
+    @contextmanager
+    def track(self, key: Optional[int]) -> Iterator[Optional[TaskProgress]]:
+        """
+        Marks a task as running for the lifetime of the context, and counts the output lines read by commands inside
+        the context against it. Nothing is tracked if the key is None.
+
+        :param key: (Optional[int]) the key of the task returned by add
+        :return: (Iterator[Optional[TaskProgress]]) the task being tracked
+        """
+        if key is None:
+            yield None
+            return
+        task = self.tasks[key]
+        task.state = "running"
+        task.started = time.monotonic()
+        token = current_task.set(key)
+        try:
+            yield task
+        finally:
+            current_task.reset(token)
+            task.finished = time.monotonic()
+
+    def finish(self, key: Optional[int], return_code: Optional[int]) -> None:
+        """
+        Records the outcome of a task.
+
+        :param key: (Optional[int]) the key of the task returned by add
+        :param return_code: (Optional[int]) the exit status of the task, None if it was skipped
+        :return: None
+        """
+        if key is None:
+            return
+        task = self.tasks[key]
+        if return_code is None:
+            task.state = "skipped"
+        else:
+            task.state = "ok" if return_code == 0 else "failed"
+        if task.finished is None:
+            task.finished = time.monotonic()
+
+    def set_host(self, host: str) -> None:
+        """
+        Sets the host of the task being tracked in the current context.
+
+        :param host: (str) the server the task runs on or "local"
+        :return: None
+        """
+        key = current_task.get()
+        if key is not None:
+            self.tasks[key].host = host
+
+    def on_line(self) -> Optional[Callable[[OutputLine], None]]:
+        """
+        Gets the function that counts output lines against the task being tracked in the current context.
+
+        :return: (Optional[Callable[[OutputLine], None]]) the function or None if no task is being tracked
+        """
+        key = current_task.get()
+        if key is None:
+            return None
+        task = self.tasks[key]
+
+        def count(line: OutputLine) -> None:
+            task.lines += 1
+            task.bytes += len(line.text) + 1
+            task.last_line = line.text
+
+        return count
+
+    def summary(self, now: Optional[float] = None) -> str:
+        """
+        Builds the line with the overall progress, throughput, and estimated time left.
+
+        :param now: (Optional[float]) the current monotonic time, None reads the clock
+        :return: (str) the summary line
+        """
+        now = now if now is not None else time.monotonic()
+        elapsed = max(now - self._started, 1e-9)
+        done = [task for task in self.tasks if task.state in ("ok", "failed", "skipped")]
+        running = [task for task in self.tasks if task.state == "running"]
+        failed = [task for task in self.tasks if task.state == "failed"]
+        output_bytes = sum(task.bytes for task in self.tasks)
+        rate = len(done) / elapsed
+        remaining = len(self.tasks) - len(done)
+        eta = _format_seconds(remaining / rate) if rate > 0 else "--:--:--"
+        return f"{len(done)}/{len(self.tasks)} done, {len(running)} running, {len(failed)} failed, " \
+               f"{rate:.2f} tasks/s, {_format_bytes(output_bytes / elapsed)}/s, " \
+               f"elapsed {_format_seconds(elapsed)}, eta {eta}"
+
+    def render(self, now: Optional[float] = None, width: int = 120) -> List[str]:
+        """
+        Builds the lines of the view with the summary followed by a line for every running task.
+
+        :param now: (Optional[float]) the current monotonic time, None reads the clock
+        :param width: (int) the width the lines are cut to
+        :return: (List[str]) the lines of the view
+        """
+        now = now if now is not None else time.monotonic()
+        lines = [self.summary(now=now)]
+        name_width = max([len(task.name) for task in self.tasks] + [4])
+        host_width = max([len(task.host) for task in self.tasks] + [5])
+        for task in self.tasks:
+            if task.state != "running":
+                continue
+            elapsed = max(task.elapsed(now=now), 1e-9)
+            line = f"  {task.state.ljust(7)}  {task.name.ljust(name_width)}  {task.host.ljust(host_width)}  " \
+                   f"{elapsed:7.1f}s  {task.lines / elapsed:7.1f} lines/s  " \
+                   f"{_format_bytes(task.bytes / elapsed).rjust(9)}/s  {task.last_line}"
+            lines.append(line[:width])
+        return lines
+
+    def _draw(self) -> None:
+        """
+        Redraws the view in place over the previous one.
+
+        :return: None
+        """
+        width = shutil.get_terminal_size().columns
+        lines = self.render(width=width)
+        lines[0] = colored(lines[0], attrs=["bold"])
+        lines[1:] = [colored(line, "yellow") for line in lines[1:]]
+        self._clear()
+        self.stream.write("".join(f"{line}\n" for line in lines))
+        self.stream.flush()
+        self._drawn_lines = len(lines)
+
+    def _clear(self) -> None:
+        """
+        Removes the view drawn last from the terminal.
+
+        :return: None
+        """
+        if self._drawn_lines > 0:
+            self.stream.write(f"\x1b[{self._drawn_lines}F\x1b[J")
+            self._drawn_lines = 0
+
+    def write_line(self, line: str) -> None:
+        """
+        Writes a line of output above the view so it is not drawn over. This can be passed as the write_line of the
+        runners.
+
+        :param line: (str) the line being written
+        :return: None
+        """
+        with self._lock:
+            if self._tty is True:
+                self._clear()
+            self.stream.write(f"{line}\n")
+            self.stream.flush()
+
+    def _refresh(self) -> None:
+        """
+        Redraws the view or writes a summary line until the view is stopped.
+
+        :return: None
+        """
+        interval = self.interval if self._tty is True else self.plain_interval
+        while not self._stop.wait(interval):
+            with self._lock:
+                if self._tty is True:
+                    self._draw()
+                else:
+                    self.stream.write(f"progress: {self.summary()}\n")
+                    self.stream.flush()
+
+    def start(self, stream: Optional[IO[str]] = None, interval: float = 0.5, plain_interval: float = 10.0) -> None:
+        """
+        Starts showing the view in a background thread.
+
+        :param stream: (Optional[IO[str]]) the stream the view is written to, None uses stdout
+        :param interval: (float) the seconds between redraws on a terminal (default 0.5)
+        :param plain_interval: (float) the seconds between summary lines when the stream is not a terminal
+                               (default 10.0)
+        :return: None
+        """
+        self.stream = stream if stream is not None else sys.stdout
+        self.interval = interval
+        self.plain_interval = plain_interval
+        self._tty = hasattr(self.stream, "isatty") and self.stream.isatty()
+        self._started = time.monotonic()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._refresh, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops the view leaving a final summary line.
+
+        :return: None
+        """
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        with self._lock:
+            if self._tty is True:
+                self._clear()
+            self.stream.write(f"progress: {self.summary()}\n")
+            self.stream.flush()
+
+    @property
+    def active(self) -> bool:
+        return self._thread is not None
@@ -0,0 +1,95 @@
+"""
+This file defines the cache of environment variable files that have been uploaded to servers.
+"""
+import hashlib
+import shlex
+import time
+from subprocess import Popen, PIPE
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+from gerund.components.host_limiter import HostLimiter
+from gerund.components.local_variable_storage import Singleton
+from gerund.components.ssh_options import SshOptions
+from gerund.components.tracer import Tracer
+
+# the minutes a file of environment variables is kept on a server after it was last uploaded
+RETENTION_MINUTES = 24 * 60
+
+
+class RemoteEnvironment(metaclass=Singleton):
+    """
+    This class is responsible for uploading blocks of environment variables to servers as files named after the hash
+    of the block. A block is only uploaded once per server and user every half of the retention so remote commands
+    only need to source the file instead of carrying every variable in the ssh command. The variables can hold
+    secrets so the files are only readable by the user, and every upload removes the files on the server that have not
+    been uploaded for RETENTION_MINUTES. Values are written as they are, so $ in a value is not expanded.
+    """
+    def __init__(self) -> None:
+        """
+        The constructor for the RemoteEnvironment class.
+        """
+        self._lock: Lock = Lock()
+        self._upload_locks: Dict[Tuple[str, str, str], Lock] = {}
+        self._uploaded: Dict[Tuple[str, str, str], float] = {}
+
+    @staticmethod
+    def build_block(environment: Dict[str, str]) -> str:
+        """
+        Packages environment variables into a block of export lines with every value quoted for the shell.
+
+        :param environment: (Dict[str, str]) the resolved environment variables
+        :return: (str) the lines exporting the environment variables
+        """
+        return "".join(f"export {key}={shlex.quote(str(value))}\n" for key, value in environment.items())
+
+    @staticmethod
+    def path_for(block: str) -> str:
+        """
+        Gets the path on the server of the file holding a block of environment variables.
+
+        :param block: (str) the block of export lines
+        :return: (str) the path of the file relative to the home directory of the user
+        """
+        digest = hashlib.sha256(block.encode()).hexdigest()[:16]
+        return f"~/.gerund/env/{digest}.env"
+
+    def upload(self, block: str, ip_address: str, username: str, key: Optional[str] = None) -> str:
+        """
+        Uploads a block of environment variables to a server over the stdin of a single ssh call if it has not been
+        uploaded by this process already.
+
+        :param block: (str) the block of export lines
+        :param ip_address: (str) the IP address of the server
+        :param username: (str) the username for the server
+        :param key: (Optional[str]) path to the pem key for the server
+        :return: (str) the path of the file on the server
+        """
+        path = self.path_for(block=block)
+        upload_key = (ip_address, username, path)
+
+        with self._lock:
+            upload_lock = self._upload_locks.setdefault(upload_key, Lock())
+
+        with upload_lock:
+            # files are uploaded again well before the server would remove them
+            if time.monotonic() - self._uploaded.get(upload_key, float("-inf")) < RETENTION_MINUTES * 30:
+                return path
+
+            ssh_options: str = SshOptions().options
+            if key is not None:
+                ssh_options += f" -i '{key}'"
+            remote_command = f"umask 077 && mkdir -p -m 700 ~/.gerund/env && " \
+                             f"{{ find ~/.gerund/env -name \"*.env\" -mmin +{RETENTION_MINUTES} -delete 2>/dev/null; " \
+                             f"true; }} && cat > {path}.$$ && mv {path}.$$ {path}"
+
+            with HostLimiter().acquire(ip_address=ip_address), \
+                    Tracer().span("remote_environment.upload", host=ip_address):
+                process = Popen(f"ssh {ssh_options} {username}@{ip_address} '{remote_command}'",
+                                shell=True, stdin=PIPE)
+                process.communicate(block.encode())
+
+            if process.returncode != 0:
+                raise ValueError(f"environment variables could not be uploaded to {ip_address}")
+            self._uploaded[upload_key] = time.monotonic()
+        return path
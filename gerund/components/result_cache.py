@@ -0,0 +1,139 @@
+"""
+This file defines the on-disk cache that stores the results of commands so they can be replayed instead of rerun.
+"""
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+
+class ResultCache:
+    """
+    This class is responsible for storing and replaying the output and exit code of commands keyed by everything that
+    can change the result of a command. The store is bounded in size with the least recently used results evicted
+    first.
+
+    Attributes:
+        path (str): the directory where the cached results are stored
+        max_size (int): the maximum number of bytes stored before results are evicted
+        cache_failures (bool): if True results with a non-zero exit code are also stored
+    """
+    def __init__(self, path: Optional[str] = None, max_size: int = 256 * 1024 * 1024,
+                 cache_failures: bool = False) -> None:
+        """
+        The constructor for the ResultCache class.
+
+        :param path: (Optional[str]) the directory where the cached results are stored (default ~/.gerund/cache)
+        :param max_size: (int) the maximum number of bytes stored before results are evicted (default 256MB)
+        :param cache_failures: (bool) if True results with a non-zero exit code are also stored
+        """
+        self.path: str = path if path is not None else os.path.join(os.path.expanduser("~"), ".gerund", "cache")
+        self.max_size: int = int(max_size)
+        self.cache_failures: bool = cache_failures
+
+    @staticmethod
+    def hash_file(path: str) -> str:
+        """
+        Hashes the contents of a file in chunks.
+
+        :param path: (str) the path to the file to be hashed
+        :return: (str) the sha256 hex digest of the file contents
+        """
+        file_hash = hashlib.sha256()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                file_hash.update(chunk)
+        return file_hash.hexdigest()
+
+    def build_key(self, command: str, environment_variables: Optional[Dict[str, str]] = None,
+                  ip_address: Optional[str] = None, input_files: Optional[List[str]] = None,
+                  working_directory: Optional[str] = None) -> str:
+        """
+        Builds the key of a command result from the rendered command, environment, host, working directory, and input
+        file contents.
+
+        :param command: (str) the fully rendered command
+        :param environment_variables: (Optional[Dict[str, str]]) the resolved environment variables of the command
+        :param ip_address: (Optional[str]) the host that the command is run on
+        :param input_files: (Optional[List[str]]) paths to local files the command reads
+        :param working_directory: (Optional[str]) the absolute path of the directory a local command is run in
+        :return: (str) the key for the command result
+        """
+        for path in input_files or []:
+            if not os.path.isfile(path):
+                raise ValueError(f"input file {path} does not exist")
+        key_data = {
+            "command": command,
+            "environment_variables": sorted((environment_variables or {}).items()),
+            "ip_address": ip_address,
+            "working_directory": working_directory,
+            "input_files": [[path, self.hash_file(path=path)] for path in sorted(input_files or [])]
+        }
+        return hashlib.sha256(json.dumps(key_data).encode()).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        """
+        Gets the path of the file that stores the result of a key.
+
+        :param key: (str) the key for the command result
+        :return: (str) the path to the stored result
+        """
+        return os.path.join(self.path, f"{key}.json")
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Gets a stored result marking it as recently used.
+
+        :param key: (str) the key for the command result
+        :return: (Optional[dict]) the result with the keys "output" and "return_code" or None if not stored
+        """
+        entry_path = self._entry_path(key=key)
+        try:
+            with open(entry_path, "r") as file:
+                entry = json.loads(file.read())
+            os.utime(entry_path)
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def put(self, key: str, output: List[str], return_code: int) -> None:
+        """
+        Stores the result of a command and evicts the least recently used results if the store is too big.
+
+        :param key: (str) the key for the command result
+        :param output: (List[str]) the lines of output from the command
+        :param return_code: (int) the exit code of the command
+        :return: None
+        """
+        if return_code != 0 and self.cache_failures is False:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        entry_path = self._entry_path(key=key)
+        temp_path = f"{entry_path}.{os.getpid()}.tmp"
+
+        with open(temp_path, "w") as file:
+            file.write(json.dumps({"output": output, "return_code": return_code}))
+        os.replace(temp_path, entry_path)
+        self._evict()
+
+    def _evict(self) -> None:
+        """
+        Removes the least recently used results until the store is within self.max_size.
+
+        :return: None
+        """
+        entries = []
+        for entry in os.scandir(self.path):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_size = sum(i[1] for i in entries)
+        for _, size, entry_path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(entry_path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
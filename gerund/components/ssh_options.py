@@ -0,0 +1,57 @@
+"""
+This file defines the options that are passed to every ssh and scp call made by the package.
+"""
+import os
+from typing import Optional
+
+from gerund.components.local_variable_storage import Singleton
+
+
+class SshOptions(metaclass=Singleton):
+    """
+    This class is responsible for building the options passed to every ssh and scp call so settings such as shared
+    master connections apply to all connections made in the process.
+
+    Attributes:
+        control_directory (Optional[str]): the directory holding the sockets of shared master connections, None
+                                           disables connection sharing
+        control_persist (str): how long an idle master connection is kept open
+    """
+    def __init__(self) -> None:
+        """
+        The constructor for the SshOptions class.
+        """
+        self.control_directory: Optional[str] = None
+        self.control_persist: str = "10m"
+
+    def enable_connection_sharing(self, control_directory: Optional[str] = None, control_persist: str = "10m") -> None:
+        """
+        Makes ssh and scp calls to the same host share one master connection so only the first call pays for the
+        connection and authentication.
+
+        :param control_directory: (Optional[str]) the directory for the master connection sockets (default
+                                  ~/.gerund/cm)
+        :param control_persist: (str) how long an idle master connection is kept open (default 10m)
+        :return: None
+        """
+        if control_directory is None:
+            control_directory = os.path.join(os.path.expanduser("~"), ".gerund", "cm")
+        os.makedirs(control_directory, mode=0o700, exist_ok=True)
+        self.control_directory = control_directory
+        self.control_persist = control_persist
+
+    def disable_connection_sharing(self) -> None:
+        """
+        Stops ssh and scp calls from sharing master connections.
+
+        :return: None
+        """
+        self.control_directory = None
+
+    @property
+    def options(self) -> str:
+        options = "-o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null"
+        if self.control_directory is not None:
+            options += f" -o ControlMaster=auto -o ControlPath={self.control_directory}/%C"
+            options += f" -o ControlPersist={self.control_persist}"
+        return options
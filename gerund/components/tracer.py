@@ -0,0 +1,99 @@
+"""
+This file defines the tracer that records how long each phase of a run takes so it can be viewed as a timeline.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Iterator, List, Tuple
+
+from gerund.components.local_variable_storage import Singleton
+
+
+TraceEvent = Tuple[str, int, int, int, int, dict]
+
+
+class Tracer(metaclass=Singleton):
+    """
+    This class is responsible for recording spans around the phases of a run such as variable resolution, command
+    compilation, connecting, and execution. Recording a span is a couple of clock reads and a deque append so the
+    tracer can stay enabled, and the oldest spans are dropped once max_events is reached. The spans can be exported
+    as Chrome trace-event JSON which can be opened in Perfetto or chrome://tracing.
+
+    Attributes:
+        enabled (bool): if False spans are not recorded
+        max_events (int): the maximum number of spans kept in memory
+    """
+    def __init__(self, enabled: bool = True, max_events: int = 100000) -> None:
+        """
+        The constructor for the Tracer class.
+
+        :param enabled: (bool) if False spans are not recorded
+        :param max_events: (int) the maximum number of spans kept in memory
+        """
+        self.enabled: bool = enabled
+        self.max_events: int = max_events
+        self._events: Deque[TraceEvent] = deque(maxlen=max_events)
+
+    @contextmanager
+    def span(self, name: str, **args) -> Iterator[None]:
+        """
+        Records the time taken by the code inside the context.
+
+        :param name: (str) the name of the phase being timed
+        :param args: extra data about the phase shown with the span like the host or command
+        :return: (Iterator[None]) the context being timed
+        """
+        if self.enabled is False:
+            yield
+            return
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            end = time.perf_counter_ns()
+            self._events.append((name, start, end - start, os.getpid(), threading.get_ident(), args))
+
+    def clear(self) -> None:
+        """
+        Removes all the recorded spans.
+
+        :return: None
+        """
+        self._events.clear()
+
+    def to_chrome_trace(self) -> dict:
+        """
+        Packages the recorded spans into the Chrome trace-event format.
+
+        :return: (dict) the trace with a "traceEvents" list of complete events
+        """
+        trace_events = []
+        for name, start, duration, pid, tid, args in list(self._events):
+            trace_events.append({
+                "name": name,
+                "cat": name.split(".")[0],
+                "ph": "X",
+                "ts": start / 1000,
+                "dur": duration / 1000,
+                "pid": pid,
+                "tid": tid,
+                "args": {key: str(value) for key, value in args.items()}
+            })
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, path: str) -> None:
+        """
+        Writes the recorded spans to a Chrome trace-event JSON file.
+
+        :param path: (str) the path to the file that the trace is written to
+        :return: None
+        """
+        with open(path, "w") as file:
+            file.write(json.dumps(self.to_chrome_trace()))
+
+    @property
+    def events(self) -> List[TraceEvent]:
+        return list(self._events)
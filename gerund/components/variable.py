@@ -1,10 +1,15 @@
 """
 This file defines the Variable class in order to manage variables from configs and the environment.
 """
+import time
 from subprocess import Popen, PIPE
 from typing import Optional
 
+from gerund.components.host_limiter import HostLimiter
 from gerund.components.local_variable_storage import LocalVariableStorage
+from gerund.components.metrics import Metrics
+from gerund.components.ssh_options import SshOptions
+from gerund.components.tracer import Tracer
 from gerund.components.variable_map import VariableMap
 
 
@@ -57,20 +62,29 @@ class Variable:
                 value = file.read()
             return str(value)
 
-        ssh_options: str = "-o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null"
+        ssh_options: str = SshOptions().options
 
-        ssh_value_process = Popen(f"ssh {ssh_options} -A ubuntu@{variable_map.ip_address} 'cat {self.path}/{self.name[2:]}.txt'",
-                                  stdout=PIPE, shell=True)
-        ssh_value_process.wait()
-        return str(ssh_value_process.communicate()[0].decode().replace("\n", ""))
+        with HostLimiter().acquire(ip_address=variable_map.ip_address), \
+                Tracer().span("variable.fetch_remote", variable=self.name, host=variable_map.ip_address):
+            ssh_value_process = Popen(f"ssh {ssh_options} -A ubuntu@{variable_map.ip_address} 'cat {self.path}/{self.name[2:]}.txt'",
+                                      stdout=PIPE, shell=True)
+            return str(ssh_value_process.communicate()[0].decode().replace("\n", ""))
 
     def __str__(self) -> str:
         return self.value
 
     @property
     def value(self) -> str:
+        start = time.perf_counter()
         if isinstance(self.name, str) and self.name[:2] == "=>":
-            return self._extract_variable_from_local_storage()
+            with Tracer().span("variable.resolve", variable=self.name):
+                value = self._extract_variable_from_local_storage()
+            Metrics().observe("gerund_variable_resolve_seconds", time.perf_counter() - start, source="local_storage")
+            return value
         elif isinstance(self.name, str) and self.name[:2] == ">>":
-            return self._extract_value_from_config_vars()
+            with Tracer().span("variable.resolve", variable=self.name):
+                value = self._extract_value_from_config_vars()
+            source = "remote_file" if self.ip_address not in (None, False) else "local_file"
+            Metrics().observe("gerund_variable_resolve_seconds", time.perf_counter() - start, source=source)
+            return value
         return self.name
@@ -3,18 +3,10 @@ This file defines the object that maps the variables for the entire runtime.
 """
 from typing import Optional
 
+from gerund.components.local_variable_storage import ScopedSingleton, Singleton  # noqa: F401
 
-class Singleton(type):
 
-    _instances = {}
-
-    def __call__(cls, *args, **kwargs):
-        if cls not in cls._instances:
-            cls._instances[cls] = super(Singleton, cls).__call__(*args, **kwargs)
-        return cls._instances[cls]
-
-
-class VariableMap(dict, metaclass=Singleton):
+class VariableMap(dict, metaclass=ScopedSingleton):
     """
     This class is responsible to keeping track of all the variables to be referenced to throughout the program.
     Attributes:
@@ -0,0 +1,35 @@
+"""
+This file defines the context manager that gives a run its own variable storage so concurrent runs in the same
+process do not overwrite each other's variables.
+"""
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from gerund.components.local_variable_storage import LocalVariableStorage, scoped_instances
+from gerund.components.variable_map import VariableMap
+
+
+@contextmanager
+def variable_scope(local_variables: Optional[dict] = None, mapped_variables: Optional[dict] = None,
+                   ip_address: Optional[str] = None) -> Iterator[LocalVariableStorage]:
+    """
+    Gives the code inside the context its own LocalVariableStorage and VariableMap. The scope is held in a context
+    variable so it follows the code through threads and asyncio tasks that are started with the context, and the
+    global instances are used again once the context exits. Scopes start empty and do not see the variables of the
+    scope they are nested in.
+
+    :param local_variables: (Optional[dict]) variables loaded into the LocalVariableStorage of the scope
+    :param mapped_variables: (Optional[dict]) variables loaded into the VariableMap of the scope
+    :param ip_address: (Optional[str]) the IP address for remote variables in the VariableMap of the scope
+    :return: (Iterator[LocalVariableStorage]) the LocalVariableStorage of the scope
+    """
+    token = scoped_instances.set({})
+    try:
+        local_storage = LocalVariableStorage()
+        if local_variables is not None:
+            local_storage.update(local_variables)
+        if mapped_variables is not None or ip_address is not None:
+            VariableMap().load_data(mapped_variables=mapped_variables or {}, ip_address=ip_address)
+        yield local_storage
+    finally:
+        scoped_instances.reset(token)
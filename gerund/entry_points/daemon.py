@@ -0,0 +1,220 @@
+"""
+This file defines the long lived gerund daemon that runs configs submitted over a local unix socket, and the client
+that submits them. The daemon keeps its warm state between runs so a submitted run skips interpreter start up, config
+parsing, and connecting to servers that were recently used.
+
+Example:
+    gerund daemon
+    gerund --via-daemon --f "configs/*.yml"
+"""
+import json
+import os
+import socket
+import socketserver
+import time
+from threading import Lock
+from typing import Callable, Dict, Optional, Tuple
+
+from gerund.components.fail_fast import FailFast
+from gerund.components.journal import Journal
+from gerund.components.ssh_options import SshOptions
+from gerund.components.variable_scope import variable_scope
+from gerund.entry_points.run_config import (load_config, preflight_configs, preflight_failure, print_summary,
+                                            run_config_file, run_config_files)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """
+    This class is responsible for reading a run request from a client connection and streaming the output of the run
+    back as JSON lines.
+    """
+    def handle(self) -> None:
+        line = self.rfile.readline()
+        if line == b"":
+            return
+        write_lock = Lock()
+
+        def write_message(message: dict) -> None:
+            with write_lock:
+                self.wfile.write((json.dumps(message) + "\n").encode())
+                self.wfile.flush()
+
+        def write_line(text: str) -> None:
+            write_message({"type": "output", "line": text})
+
+        try:
+            return_code = self.server.gerund_daemon.run_request(request=json.loads(line), write_line=write_line)
+        except Exception as error:
+            write_line(f"{type(error).__name__}: {error}")
+            return_code = 1
+        write_message({"type": "exit", "return_code": return_code})
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    """
+    This class is responsible for serving every client connection in its own thread.
+
+    Attributes:
+        gerund_daemon (GerundDaemon): the daemon that runs the requests
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, gerund_daemon: "GerundDaemon") -> None:
+        self.gerund_daemon: GerundDaemon = gerund_daemon
+        super().__init__(socket_path, _RequestHandler)
+
+
+class GerundDaemon:
+    """
+    This class is responsible for running configs submitted over a unix socket in a single long lived process. Parsed
+    configs are cached until the file changes, ssh connections to each server are shared through a control master
+    that is kept open between runs, and environment variable files that were uploaded to servers are not uploaded
+    again. Every run has its own variable scope so runs submitted at the same time do not share variables.
+
+    Attributes:
+        socket_path (str): the path of the unix socket that the daemon listens on
+        config_cache (Dict[str, Tuple[float, dict]]): the parsed configs keyed by their path
+    """
+    def __init__(self, socket_path: str, share_connections: bool = True) -> None:
+        """
+        The constructor for the GerundDaemon class.
+
+        :param socket_path: (str) the path of the unix socket that the daemon listens on
+        :param share_connections: (bool) if True ssh connections are kept open and shared between runs
+        """
+        self.socket_path: str = socket_path
+        self.config_cache: Dict[str, Tuple[float, dict]] = {}
+        self._server: Optional[_UnixServer] = None
+
+        if share_connections is True:
+            SshOptions().enable_connection_sharing()
+
+    def run_request(self, request: dict, write_line: Callable[[str], None]) -> int:
+        """
+        Runs the configs of a request passing the output lines to write_line. A single config writes its output to
+        output.txt in the directory of the client like a local run or passes it to write_line as it is read, several
+        configs are run concurrently and followed by a summary.
+
+        :param request: (dict) the request with the keys "configs", "jobs", "use_cache", "cwd", and optionally the
+                        "output" path that the outputs of several configs are combined into and the "max_failures"
+                        tolerated before the run is cancelled, "spread_cores" to pin the configs to disjoint CPUs, and
+                        the "journal" path the steps are recorded in with "resume" to skip the completed ones, and
+                        "preflight" to check the servers of the configs before any is run
+        :param write_line: (Callable[[str], None]) the function the output lines are passed to
+        :return: (int) the exit status of the run
+        """
+        file_paths = request["configs"]
+        directory = request["cwd"]
+        use_cache = request.get("use_cache", True)
+        journal: Optional[Journal] = None
+        if request.get("journal") is not None:
+            journal = Journal(path=request["journal"], resume=request.get("resume", False) is True)
+
+        preflight = request.get("preflight") is True
+        if preflight is True:
+            for line in preflight_configs(file_paths=file_paths, config_cache=self.config_cache):
+                write_line(line)
+
+        max_failures = request.get("max_failures")
+        spread_cores = request.get("spread_cores", False) is True
+        # a single config is run on its own unless the request needs the runner of several configs
+        if len(file_paths) == 1 and request.get("output") is None and max_failures is None and spread_cores is False:
+            if preflight is True:
+                failure = preflight_failure(data=load_config(file_path=file_paths[0], config_cache=self.config_cache))
+                if failure is not None:
+                    write_line(failure)
+                    return 1
+            streamed = [0]
+
+            def on_line(text: str) -> None:
+                streamed[0] += 1
+                write_line(text)
+
+            with variable_scope():
+                result = run_config_file(file_path=file_paths[0], output_path=f"{directory}/output.txt",
+                                         capture_output=True, use_cache=use_cache, working_directory=directory,
+                                         config_cache=self.config_cache, journal=journal, on_line=on_line,
+                                         preflight=preflight)
+            # the output of a matrix is only returned once every cell has finished
+            for line in (result["lines"] or [])[streamed[0]:]:
+                write_line(line)
+            return result["return_code"]
+
+        start = time.perf_counter()
+        results = run_config_files(file_paths=file_paths, jobs=max(int(request.get("jobs", 1)), 1),
+                                   use_cache=use_cache, output_directory=directory, config_cache=self.config_cache,
+                                   write_line=write_line, combined_output=request.get("output"),
+                                   fail_fast=FailFast(max_failures=max_failures) if max_failures is not None else None,
+                                   spread_cores=spread_cores, journal=journal,
+                                   preflight=preflight)
+        return print_summary(results=results, seconds=time.perf_counter() - start, write_line=write_line)
+
+    def serve_forever(self) -> None:
+        """
+        Listens on the socket and runs the requests until shutdown is called. A socket file left behind by a daemon
+        that is no longer running is replaced, but a socket that a daemon still listens on is left alone. Only the
+        user can connect to the socket, as a run can do anything the user can.
+
+        :return: None
+        """
+        os.makedirs(os.path.dirname(self.socket_path) or ".", mode=0o700, exist_ok=True)
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+            except ConnectionRefusedError:
+                os.remove(self.socket_path)
+            else:
+                raise ValueError(f"a gerund daemon is already listening on {self.socket_path}")
+            finally:
+                probe.close()
+
+        # the socket is created with the right permissions so there is no moment where others can connect to it
+        umask = os.umask(0o077)
+        try:
+            self._server = _UnixServer(socket_path=self.socket_path, gerund_daemon=self)
+        finally:
+            os.umask(umask)
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    def shutdown(self) -> None:
+        """
+        Stops the daemon from serving requests.
+
+        :return: None
+        """
+        if self._server is not None:
+            self._server.shutdown()
+
+
+def submit_to_daemon(socket_path: str, request: dict, write_line: Optional[Callable[[str], None]] = None) -> int:
+    """
+    Submits a run request to a gerund daemon and passes the output lines to write_line as they arrive.
+
+    :param socket_path: (str) the path of the unix socket that the daemon listens on
+    :param request: (dict) the request with the keys "configs", "jobs", "use_cache", and "cwd"
+    :param write_line: (Optional[Callable[[str], None]]) the function the output lines are passed to, None prints them
+    :return: (int) the exit status of the run
+    """
+    write_line = write_line if write_line is not None else print
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        client.close()
+        raise ValueError(f"no gerund daemon is listening on {socket_path}")
+
+    with client, client.makefile("rwb") as stream:
+        stream.write((json.dumps(request) + "\n").encode())
+        stream.flush()
+        for line in stream:
+            message = json.loads(line)
+            if message["type"] == "exit":
+                return message["return_code"]
+            write_line(message["line"])
+    raise ValueError("the gerund daemon closed the connection before the run finished")
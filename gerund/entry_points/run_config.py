@@ -4,16 +4,43 @@ based off the config file that is loaded.
 
 Example:
     gerund --f "/some/path/gerund_config.yml"
+    gerund --f "configs/*.yml" --jobs 4
+    gerund daemon
+    gerund --via-daemon --f "configs/*.yml"
 """
 import argparse
+import glob
 import json
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from copy import deepcopy
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
 
 import yaml
 
+from gerund.commands.fetch import Fetch
 from gerund.commands.terminal_command import TerminalCommand
+from gerund.components.builtin_step import BuiltinStep
 from gerund.components.config_txt import ConfigTxt
+from gerund.components.delta_sync import DeltaSync
+from gerund.components.fail_fast import FailFast
+from gerund.components.host_limiter import HostLimiter
+from gerund.components.journal import Journal
 from gerund.components.local_variable_storage import LocalVariableStorage
+from gerund.components.matrix import Matrix
+from gerund.components.metrics import Metrics
+from gerund.components.ordered_writer import OrderedWriter
+from gerund.components.placement import CoreAllocator, Placement
+from gerund.components.preflight import Preflight
+from gerund.components.progress import Progress
+from gerund.components.result_cache import ResultCache
+from gerund.components.tracer import Tracer
+from gerund.components.variable_scope import variable_scope
+
+DEFAULT_SOCKET_PATH = os.path.join(os.path.expanduser("~"), ".gerund", "gerund.sock")
+DEFAULT_JOURNAL_PATH = "gerund.journal"
 
 
 def process_data_from_txt_file(path: str) -> dict:
@@ -31,9 +58,28 @@ def process_data_from_txt_file(path: str) -> dict:
     data["ip_address"] = config.meta.get("ip_address")
     data["key"] = config.meta.get("key")
     data["username"] = config.meta.get("username")
+    data["max_connections"] = config.meta.get("max_connections")
+    data["max_total_connections"] = config.meta.get("max_total_connections")
+    data["cache"] = config.meta.get("cache")
+    data["compression"] = config.meta.get("compression")
+    data["memory"] = config.meta.get("memory")
+    data["cpus"] = config.meta.get("cpus")
+    if config.meta.get("input_files") is not None:
+        data["input_files"] = config.meta["input_files"].split(",")
+    if config.meta.get("sync") is not None:
+        data["sync"] = dict(pair.split(":", 1) for pair in config.meta["sync"].split(","))
+    if config.meta.get("fetch") is not None:
+        data["fetch"] = {"paths": config.meta["fetch"].split(","), "directory": config.meta.get("fetch_directory")}
+    placement = {key: config.meta[key] for key in Placement.CONFIG_KEYS if key in config.meta}
+    if len(placement) > 0:
+        data["placement"] = placement
+    if config.matrix is not None:
+        data["matrix"] = Matrix.parse_txt_section(section=config.matrix)
 
     data["vars"] = config.vars
-    data["commands"] = config.commands
+    # lines starting with @ are built-in steps
+    data["commands"] = [BuiltinStep.parse_line(line=command[1:]) if command.startswith("@") else command
+                        for command in config.commands]
     data["env_vars"] = config.env_vars
     return data
 
@@ -59,45 +105,783 @@ def process_data(file_path: str, file_type: str) -> dict:
     return data
 
 
-def main() -> None:
+def load_config(file_path: str, config_cache: Optional[Dict[str, Tuple[float, dict]]] = None) -> dict:
     """
-    This function runs the entry point reading a config file and running a series of commands with environment
-    variables and configurations around username, ip_address, keys etc.
+    Loads the data from a config file. If a cache is passed the parsed data is kept in it against the modified time of
+    the file so a long running process only parses a config again when the file changes.
 
-    :return:
+    :param file_path: (str) the path to the config file
+    :param config_cache: (Optional[Dict[str, Tuple[float, dict]]]) the parsed configs keyed by their path
+    :return: (dict) the data from the config file
     """
-    config_parser = argparse.ArgumentParser()
-    config_parser.add_argument('--f', action='store', type=str, required=False, default="gerund.yml",
-                               help="the path the config yml/json/txt file that defines the command run"
-                                    "(default: gerund.yml)")
+    file_type = file_path.split(".")[-1]
+    if config_cache is None or os.path.isfile(file_path) is False:
+        return process_data(file_path=file_path, file_type=file_type)
 
-    args = config_parser.parse_args()
+    modified_time = os.path.getmtime(file_path)
+    cached = config_cache.get(file_path)
+    if cached is None or cached[0] != modified_time:
+        cached = (modified_time, process_data(file_path=file_path, file_type=file_type))
+        config_cache[file_path] = cached
+    return deepcopy(cached[1])
 
-    file_type = args.f.split(".")[-1]
-    file_path = f"{os.getcwd()}/{args.f}"
 
-    data = process_data(file_path=file_path, file_type=file_type)
+def apply_connection_limits(data: dict) -> None:
+    """
+    Applies the connection limits defined in the config data to the host limiter.
+
+    :param data: (dict) the data from the config file
+    :return: None
+    """
+    host_limiter = HostLimiter()
+    max_connections = data.get("max_connections")
+    max_total_connections = data.get("max_total_connections")
+
+    if max_connections is not None and data.get("ip_address") is not None:
+        host_limiter.set_host_limit(ip_address=data["ip_address"], limit=int(max_connections))
+    if max_total_connections is not None:
+        host_limiter.set_global_limit(limit=int(max_total_connections))
+
+
+def sync_directories(data: dict, working_directory: Optional[str] = None) -> None:
+    """
+    Syncs the local directories in the sync field of the config data to the server of the config so only changed
+    files are sent. Nothing is synced for configs without an ip_address.
+
+    :param data: (dict) the data from the config file
+    :param working_directory: (Optional[str]) the directory relative local paths start from, None uses the current
+                              directory
+    :return: None
+    """
+    if data.get("sync") is None or data.get("ip_address") is None:
+        return
+    for local_directory, remote_directory in data["sync"].items():
+        if not os.path.isabs(local_directory):
+            local_directory = os.path.join(working_directory or os.getcwd(), local_directory)
+        DeltaSync(local_directory=local_directory, remote_directory=remote_directory, ip_address=data["ip_address"],
+                  username=data.get("username") or "ubuntu", key=data.get("key")).sync()
+
+
+def fetch_results(data: dict, working_directory: Optional[str] = None) -> Tuple[bool, List[str]]:
+    """
+    Pulls the paths in the fetch field of the config data back from the server of the config. The fetch field is a
+    list of paths or a mapping with the "paths" and the local "directory" the files are written to under a directory
+    named after the server, which defaults to fetched.
+
+    :param data: (dict) the data from the config file
+    :param working_directory: (Optional[str]) the directory relative local paths start from, None uses the current
+                              directory
+    :return: (Tuple[bool, List[str]]) True if every fetch succeeded and a line for each server with the files and
+             bytes fetched and the rate, or the error
+    """
+    fetch_data = data.get("fetch")
+    if fetch_data is None or data.get("ip_address") is None:
+        return True, []
+    if isinstance(fetch_data, list):
+        fetch_data = {"paths": fetch_data}
+    directory = fetch_data.get("directory") or "fetched"
+    if not os.path.isabs(directory):
+        directory = os.path.join(working_directory or os.getcwd(), directory)
+
+    results = Fetch(paths=fetch_data["paths"], hosts=[data["ip_address"]], local_directory=directory,
+                    username=data.get("username") or "ubuntu", key=data.get("key")).wait()
+    lines = []
+    for result in results:
+        if result.error is not None:
+            lines.append(f"fetch from {result.host} failed: {result.error}")
+        else:
+            lines.append(f"fetched {result.files} files ({result.bytes} bytes) from {result.host} to "
+                         f"{result.directory} at {result.bytes_per_second / 1024 / 1024:.2f} MB/s")
+    return all(result.error is None for result in results), lines
+
+
+def build_result_cache(data: dict) -> Optional[ResultCache]:
+    """
+    Builds the result cache defined in the config data. The cache field can be a boolean or a mapping of the
+    ResultCache constructor arguments.
+
+    :param data: (dict) the data from the config file
+    :return: (Optional[ResultCache]) the cache for the command results or None if caching is not enabled
+    """
+    cache_config = data.get("cache")
+    if isinstance(cache_config, dict):
+        return ResultCache(**cache_config)
+    if str(cache_config).lower() in ["true", "yes", "1"]:
+        return ResultCache()
+    return None
+
+
+def build_placement(data: dict, cpu_set: Optional[Set[int]] = None) -> Optional[Placement]:
+    """
+    Builds the placement defined in the config data pinning it to the CPUs handed out by a core allocator if passed.
+
+    :param data: (dict) the data from the config file
+    :param cpu_set: (Optional[Set[int]]) the CPUs handed out to the config which replace the cpu_set of the config
+    :return: (Optional[Placement]) the placement of the local commands or None if they are not placed
+    """
+    placement_data = data.get("placement")
+    placement = Placement.from_config(placement_data=placement_data) if placement_data is not None else None
+    if cpu_set is not None:
+        placement = (placement or Placement()).with_cpu_set(cpu_set=cpu_set)
+    return placement
+
+
+def preflight_configs(file_paths: List[str],
+                      config_cache: Optional[Dict[str, Tuple[float, dict]]] = None) -> List[str]:
+    """
+    Checks the servers of the configs at the same time before any config is run. Configs that run on a server that
+    fails the check fail without running when they are run.
 
+    :param file_paths: (List[str]) the paths to the config files
+    :param config_cache: (Optional[Dict[str, Tuple[float, dict]]]) the parsed configs keyed by their path
+    :return: (List[str]) the lines of the report of the check, empty if no config runs on a server
+    """
+    hosts: Dict[Tuple[str, Optional[str]], List[str]] = {}
+    for file_path in file_paths:
+        try:
+            data = load_config(file_path=file_path, config_cache=config_cache)
+        except Exception:
+            # the error is reported when the config is run
+            continue
+        if data.get("ip_address") is not None:
+            hosts.setdefault((data.get("username") or "ubuntu", data.get("key")), []).append(data["ip_address"])
+    if len(hosts) == 0:
+        return []
+
+    with ThreadPoolExecutor(max_workers=len(hosts)) as executor:
+        checks = [executor.submit(Preflight().check, hosts=group, username=username, key=key)
+                  for (username, key), group in hosts.items()]
+        results = [health for check in checks for health in check.result()]
+    return Preflight.report(results=results)
+
+
+def preflight_failure(data: dict) -> Optional[str]:
+    """
+    Gets why the server of a config cannot be used after the pre-flight check.
+
+    :param data: (dict) the data from the config file
+    :return: (Optional[str]) the reason or None if the config runs locally or its server passed or was not checked
+    """
+    reason = Preflight().reason(host=data.get("ip_address"))
+    if reason is None:
+        return None
+    return f"{data['ip_address']} failed the pre-flight check: {reason}"
+
+
+def _run_commands(data: dict, name: str, output_path: str, capture_output: bool, use_cache: bool,
+                  working_directory: Optional[str], fail_fast: Optional[FailFast] = None,
+                  cpu_set: Optional[Set[int]] = None, journal: Optional[Journal] = None,
+                  on_line: Optional[Callable[[str], None]] = None,
+                  preflight: bool = False) -> Tuple[Optional[int], Optional[List[str]]]:
+    """
+    Loads the variables of loaded config data into local storage and runs its commands. Mappings in the commands are
+    built-in steps. If a journal is passed every command is run and recorded as its own step along with the built-in
+    steps in front of it, and the steps the journal has as completed are skipped when resuming.
+
+    :param data: (dict) the data from the config file
+    :param name: (str) the name of the config file
+    :param output_path: (str) the path the output is written to if the config defines an output
+    :param capture_output: (bool) if True the output is captured and returned when the config defines no output
+    :param use_cache: (bool) if False the result cache defined in the config is ignored
+    :param working_directory: (Optional[str]) the directory local commands are run in, None uses the current directory
+    :param fail_fast: (Optional[FailFast]) the policy that terminates the commands if their batch is cancelled
+    :param cpu_set: (Optional[Set[int]]) the CPUs the local commands are pinned to, None uses the config
+    :param journal: (Optional[Journal]) the journal the commands are recorded in as steps
+    :param on_line: (Optional[Callable[[str], None]]) called with every line of the returned output as soon as it is
+                    read
+    :param preflight: (bool) if True the config fails if its server failed the pre-flight check of this run
+    :return: (Tuple[Optional[int], Optional[List[str]]]) the return code and the captured output
+    """
     local_vars = data.get("vars")
     if local_vars is not None:
         local_storage = LocalVariableStorage()
         local_storage.update(local_vars)
 
-    output = data.get("output")
-    if output is not None:
-        capture = True
-    else:
-        capture = False
-
-    command = TerminalCommand(command=data["commands"],
-                              environment_variables=data.get("env_vars"),
-                              ip_address=data.get("ip_address"),
-                              key=data.get("key"),
-                              username=data.get("username"))
-    if capture is True:
-        data = command.wait(capture_output=True)
-        with open(f"{os.getcwd()}/output.txt", "w") as file:
-            for line in data:
-                file.write(line + "\n")
+    apply_connection_limits(data=data)
+    failure = preflight_failure(data=data) if preflight is True else None
+    if failure is not None:
+        raise ValueError(failure)
+    Progress().set_host(host=data.get("ip_address") or "local")
+    sync_directories(data=data, working_directory=working_directory)
+
+    settings = {
+        "environment_variables": data.get("env_vars"),
+        "ip_address": data.get("ip_address"),
+        "key": data.get("key"),
+        "username": data.get("username"),
+        "cache": build_result_cache(data=data) if use_cache is True else None,
+        "input_files": data.get("input_files"),
+        "compression": data.get("compression"),
+        "working_directory": working_directory,
+        "fail_fast": fail_fast,
+        "memory": data.get("memory"),
+        "cpus": data.get("cpus"),
+        "placement": build_placement(data=data, cpu_set=cpu_set)
+    }
+    steps = data["commands"] if isinstance(data["commands"], list) else [data["commands"]]
+    steps = [BuiltinStep.from_config(step=step) if isinstance(step, dict) else step for step in steps]
+    if journal is None:
+        commands = [TerminalCommand(command=steps if isinstance(data["commands"], list) else data["commands"],
+                                    **settings)]
     else:
-        command.wait()
+        # every command is its own step so a resumed run starts from the step that failed, and built-in steps go
+        # with the command after them so they never need a shell or an ssh call of their own
+        chain = journal.chain(config=name)
+        commands = [TerminalCommand(command=group, journal=chain, **settings) for group in BuiltinStep.fold(steps)]
+    lines: Optional[List[str]] = None
+    capture = data.get("output") is not None or capture_output is True
+    # only the output that is returned is streamed
+    stream = on_line if data.get("output") is None and capture is True else None
+    if stream is not None:
+        for command in commands:
+            command.on_line = lambda line: stream(line.text)
+
+    with Tracer().span("config.run", config=name), Metrics.config(name=name):
+        output: List[str] = []
+        # a config without commands has nothing to fail
+        return_code: Optional[int] = 0
+        for command in commands:
+            if capture is True:
+                output += command.wait(capture_output=True)
+            else:
+                command.wait()
+            return_code = command.return_code
+            if return_code != 0:
+                break
+        if data.get("output") is not None:
+            with Tracer().span("config.write_output", path=output_path), open(output_path, "w") as file:
+                for line in output:
+                    file.write(line + "\n")
+        elif capture is True:
+            lines = output
+
+    if return_code == 0 and data.get("fetch") is not None:
+        succeeded, fetch_lines = fetch_results(data=data, working_directory=working_directory)
+        if succeeded is False:
+            return_code = 1
+        if lines is not None:
+            lines += fetch_lines
+            for line in fetch_lines if stream is not None else []:
+                stream(line)
+        else:
+            for line in fetch_lines:
+                print(line)
+    return return_code, lines
+
+
+@contextmanager
+def _acquire_cores(core_allocator: Optional[CoreAllocator]) -> Iterator[Optional[Set[int]]]:
+    """
+    Takes a set of CPUs from the core allocator for the lifetime of the context if there is one.
+
+    :param core_allocator: (Optional[CoreAllocator]) the allocator the CPUs are taken from
+    :return: (Iterator[Optional[Set[int]]]) the CPUs or None if there is no allocator
+    """
+    if core_allocator is None:
+        yield None
+        return
+    with core_allocator.acquire() as cpu_set:
+        yield cpu_set
+
+
+def _run_matrix_cell(data: dict, name: str, cell: dict, cell_name: str, cell_directory: str, use_cache: bool,
+                     fail_fast: Optional[FailFast] = None, core_allocator: Optional[CoreAllocator] = None,
+                     progress_key: Optional[int] = None, journal: Optional[Journal] = None,
+                     preflight: bool = False) -> dict:
+    """
+    Runs the commands of a config for one cell of its matrix in its own variable scope and working directory. The
+    values of the cell are loaded into local storage on top of the variables of the config.
+
+    :param data: (dict) the data from the config file
+    :param name: (str) the name of the config file
+    :param cell: (dict) the values of the cell keyed by axis
+    :param cell_name: (str) the name of the cell from Matrix.cell_names
+    :param cell_directory: (str) the directory the local commands of the cell are run in and its output is written to
+    :param use_cache: (bool) if False the result cache defined in the config is ignored
+    :param fail_fast: (Optional[FailFast]) the policy that skips or terminates the cell once too many cells failed
+    :param core_allocator: (Optional[CoreAllocator]) the allocator the cell takes its own set of CPUs from
+    :param progress_key: (Optional[int]) the key of the cell in the progress view if it is shown
+    :param journal: (Optional[Journal]) the journal the commands of the cell are recorded in as steps
+    :param preflight: (bool) if True the cell fails if its server failed the pre-flight check of this run
+    :return: (dict) the result of the cell with the keys "name", "cell", "working_directory", "return_code",
+             "seconds", and "lines" where the return code is None if the cell was skipped
+    """
+    start = time.perf_counter()
+    if fail_fast is not None and fail_fast.cancelled is True:
+        Progress().finish(key=progress_key, return_code=None)
+        return {"name": cell_name, "cell": cell, "working_directory": cell_directory, "return_code": None,
+                "seconds": 0.0, "lines": None}
+    cell_data = deepcopy(data)
+    del cell_data["matrix"]
+    cell_data["vars"] = {**(data.get("vars") or {}), **cell}
+
+    try:
+        os.makedirs(cell_directory, exist_ok=True)
+        with variable_scope(), Tracer().span("matrix.cell", config=name, cell=cell_name), \
+                Progress().track(key=progress_key), _acquire_cores(core_allocator=core_allocator) as cpu_set:
+            return_code, lines = _run_commands(data=cell_data, name=name, output_path=f"{cell_directory}/output.txt",
+                                               capture_output=True, use_cache=use_cache,
+                                               working_directory=cell_directory, fail_fast=fail_fast,
+                                               cpu_set=cpu_set, journal=journal, preflight=preflight)
+    except Exception as error:
+        return_code, lines = 1, [f"{type(error).__name__}: {error}"]
+
+    if fail_fast is not None:
+        fail_fast.record(failed=return_code != 0)
+    Progress().finish(key=progress_key, return_code=return_code)
+
+    return {
+        "name": cell_name,
+        "cell": cell,
+        "working_directory": cell_directory,
+        "return_code": return_code,
+        "seconds": time.perf_counter() - start,
+        "lines": lines
+    }
+
+
+def run_matrix(file_path: str, data: dict, output_path: str, capture_output: bool = False, use_cache: bool = True,
+               write_line: Optional[Callable[[str], None]] = None, journal: Optional[Journal] = None,
+               preflight: bool = False) -> dict:
+    """
+    Runs the commands of a config once for every cell of its matrix with the cells run concurrently up to the
+    max_workers of the matrix. Each cell runs in its own directory under {config name}.matrix next to the output
+    path, and the result of every cell is written to results.json in that directory. If the matrix defines
+    max_failures the running cells are terminated and the rest are skipped once more cells than that have failed. If
+    the matrix sets spread_cores the cells running at the same time are pinned to disjoint sets of CPUs.
+
+    :param file_path: (str) the path to the config file
+    :param data: (dict) the data from the config file
+    :param output_path: (str) the path that would be written to if the config had no matrix
+    :param capture_output: (bool) if True the output of the cells is returned instead of passed to write_line
+    :param use_cache: (bool) if False the result cache defined in the config is ignored
+    :param write_line: (Optional[Callable[[str], None]]) the function the output lines are passed to, None prints them
+    :param journal: (Optional[Journal]) the journal the commands of the cells are recorded in as steps
+    :param preflight: (bool) if True every cell fails if its server failed the pre-flight check of this run
+    :return: (dict) the result of the run with the keys "config", "return_code", "seconds", "lines", and "cells"
+    """
+    write_line = write_line if write_line is not None else print
+    start = time.perf_counter()
+    name = file_path.split("/")[-1]
+    matrix = Matrix.from_config(matrix_data=data["matrix"])
+    matrix_directory = f"{os.path.dirname(output_path)}/{name}.matrix"
+    cells = matrix.cells
+    cell_names = Matrix.cell_names(cells=cells)
+    fail_fast = FailFast(max_failures=matrix.max_failures) if matrix.max_failures is not None else None
+    core_allocator = CoreAllocator(workers=matrix.max_workers) if matrix.spread_cores is True else None
+    progress = Progress()
+    progress_keys = [progress.add(name=f"{name}:{cell_name}") if progress.active else None
+                     for cell_name in cell_names]
+    results: List[Optional[dict]] = [None] * len(cells)
+    lines: List[str] = []
+
+    def emit(line: str) -> None:
+        if capture_output is True:
+            lines.append(line)
+        else:
+            write_line(line)
+
+    with ThreadPoolExecutor(max_workers=matrix.max_workers) as executor:
+        futures = {}
+        for index, cell in enumerate(cells):
+            future = executor.submit(_run_matrix_cell, data=data, name=name, cell=cell, cell_name=cell_names[index],
+                                     cell_directory=f"{matrix_directory}/{cell_names[index]}",
+                                     use_cache=use_cache, fail_fast=fail_fast, core_allocator=core_allocator,
+                                     progress_key=progress_keys[index], journal=journal, preflight=preflight)
+            futures[future] = index
+
+        for future in as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            for line in result["lines"] or []:
+                emit(f"[{result['name']}] {line}")
+
+    seconds = time.perf_counter() - start
+    failed = [result for result in results if result["return_code"] not in (0, None)]
+    skipped = [result for result in results if result["return_code"] is None]
+    os.makedirs(matrix_directory, exist_ok=True)
+    with open(f"{matrix_directory}/results.json", "w") as file:
+        file.write(json.dumps([{key: value for key, value in result.items() if key != "lines"} for result in results],
+                              indent=2))
+    skipped_text = f", {len(skipped)} skipped" if len(skipped) > 0 else ""
+    emit(f"{len(results)} cells, {len(failed)} failed{skipped_text}, {seconds:.2f} seconds")
+
+    return {
+        "config": file_path,
+        "return_code": 0 if len(failed) + len(skipped) == 0 else 1,
+        "seconds": seconds,
+        "lines": lines if capture_output is True else None,
+        "cells": results
+    }
+
+
+def run_config_file(file_path: str, output_path: str, capture_output: bool = False, use_cache: bool = True,
+                    working_directory: Optional[str] = None,
+                    config_cache: Optional[Dict[str, Tuple[float, dict]]] = None,
+                    write_line: Optional[Callable[[str], None]] = None, fail_fast: Optional[FailFast] = None,
+                    cpu_set: Optional[Set[int]] = None, journal: Optional[Journal] = None,
+                    on_line: Optional[Callable[[str], None]] = None, preflight: bool = False) -> dict:
+    """
+    Loads a config file, loads its variables into local storage, and runs its commands. A config with a matrix runs
+    its commands once for every cell of the matrix.
+
+    :param file_path: (str) the path to the config file
+    :param output_path: (str) the path the output is written to if the config defines an output
+    :param capture_output: (bool) if True the output is captured and returned when the config defines no output
+    :param use_cache: (bool) if False the result cache defined in the config is ignored
+    :param working_directory: (Optional[str]) the directory local commands are run in, None uses the current directory
+    :param config_cache: (Optional[Dict[str, Tuple[float, dict]]]) the parsed configs keyed by their path
+    :param write_line: (Optional[Callable[[str], None]]) the function the output lines of matrix cells are passed to
+                       when the output is not captured, None prints them
+    :param fail_fast: (Optional[FailFast]) the policy that terminates the commands if their batch is cancelled
+    :param cpu_set: (Optional[Set[int]]) the CPUs the local commands are pinned to, None uses the config
+    :param journal: (Optional[Journal]) the journal the commands are recorded in as steps
+    :param on_line: (Optional[Callable[[str], None]]) called with every line of the captured output of a config
+                    without a matrix as soon as it is read
+    :param preflight: (bool) if True the config fails if its server failed the pre-flight check of this run
+    :return: (dict) the result of the run with the keys "config", "return_code", "seconds", and "lines"
+    """
+    start = time.perf_counter()
+    name = file_path.split("/")[-1]
+    with Tracer().span("config.load", config=name):
+        data = load_config(file_path=file_path, config_cache=config_cache)
+
+    if data.get("matrix") is not None:
+        return run_matrix(file_path=file_path, data=data, output_path=output_path, capture_output=capture_output,
+                          use_cache=use_cache, write_line=write_line, journal=journal, preflight=preflight)
+
+    return_code, lines = _run_commands(data=data, name=name, output_path=output_path, capture_output=capture_output,
+                                       use_cache=use_cache, working_directory=working_directory,
+                                       fail_fast=fail_fast, cpu_set=cpu_set, journal=journal, on_line=on_line,
+                                       preflight=preflight)
+    return {
+        "config": file_path,
+        "return_code": return_code,
+        "seconds": time.perf_counter() - start,
+        "lines": lines
+    }
+
+
+def _run_isolated_config_file(file_path: str, output_path: str, use_cache: bool,
+                              working_directory: Optional[str] = None,
+                              config_cache: Optional[Dict[str, Tuple[float, dict]]] = None,
+                              fail_fast: Optional[FailFast] = None,
+                              core_allocator: Optional[CoreAllocator] = None,
+                              progress_key: Optional[int] = None, journal: Optional[Journal] = None,
+                              on_line: Optional[Callable[[str], None]] = None, preflight: bool = False) -> dict:
+    """
+    Runs a config file in its own variable scope so variables from configs running at the same time do not leak into
+    it. Errors are packaged into the result so one bad config does not stop the rest. A config is skipped with a
+    return code of None if the fail fast policy was cancelled before it started.
+
+    :param file_path: (str) the path to the config file
+    :param output_path: (str) the path the output is written to if the config defines an output
+    :param use_cache: (bool) if False the result cache defined in the config is ignored
+    :param working_directory: (Optional[str]) the directory local commands are run in, None uses the current directory
+    :param config_cache: (Optional[Dict[str, Tuple[float, dict]]]) the parsed configs keyed by their path
+    :param fail_fast: (Optional[FailFast]) the policy that skips or terminates the config once too many have failed
+    :param core_allocator: (Optional[CoreAllocator]) the allocator the config takes its own set of CPUs from
+    :param progress_key: (Optional[int]) the key of the config in the progress view if it is shown
+    :param journal: (Optional[Journal]) the journal the commands are recorded in as steps
+    :param on_line: (Optional[Callable[[str], None]]) called with every line of the captured output as soon as it is
+                    read
+    :param preflight: (bool) if True the config fails if its server failed the pre-flight check of this run
+    :return: (dict) the result of the run with the keys "config", "return_code", "seconds", and "lines"
+    """
+    start = time.perf_counter()
+    if fail_fast is not None and fail_fast.cancelled is True:
+        Progress().finish(key=progress_key, return_code=None)
+        return {"config": file_path, "return_code": None, "seconds": 0.0, "lines": None}
+    try:
+        with variable_scope(), Progress().track(key=progress_key), _acquire_cores(core_allocator=core_allocator) as cpu_set:
+            result = run_config_file(file_path=file_path, output_path=output_path, capture_output=True,
+                                     use_cache=use_cache, working_directory=working_directory,
+                                     config_cache=config_cache, fail_fast=fail_fast, cpu_set=cpu_set,
+                                     journal=journal, on_line=on_line, preflight=preflight)
+    except Exception as error:
+        result = {
+            "config": file_path,
+            "return_code": 1,
+            "seconds": time.perf_counter() - start,
+            "lines": [f"{type(error).__name__}: {error}"]
+        }
+
+    # recorded before the worker is free so a cancelled run does not start another config
+    if fail_fast is not None:
+        fail_fast.record(failed=result["return_code"] != 0)
+    Progress().finish(key=progress_key, return_code=result["return_code"])
+    return result
+
+
+def run_config_files(file_paths: List[str], jobs: int, use_cache: bool = True, output_directory: Optional[str] = None,
+                     config_cache: Optional[Dict[str, Tuple[float, dict]]] = None,
+                     write_line: Optional[Callable[[str], None]] = None,
+                     combined_output: Optional[str] = None, fail_fast: Optional[FailFast] = None,
+                     spread_cores: bool = False, journal: Optional[Journal] = None,
+                     preflight: bool = False) -> List[dict]:
+    """
+    Runs several config files concurrently in worker threads printing the output of each config prefixed with the
+    name of the config as each one finishes. Every config has its own variable scope while the connection limits
+    and tracer are shared across all of them. If a combined output path is passed the output of the configs is
+    written to it as it is read in the order of the file paths instead of being printed. If a fail fast policy is
+    passed the running configs are terminated and the rest are skipped once too many configs have failed. If
+    spread_cores is True the configs running at the same time are pinned to disjoint sets of CPUs.
+
+    :param file_paths: (List[str]) the paths to the config files
+    :param jobs: (int) the maximum number of configs run at the same time
+    :param use_cache: (bool) if False the result caches defined in the configs are ignored
+    :param output_directory: (Optional[str]) the directory that the outputs are written to and local commands are run
+                             in, None uses the current directory
+    :param config_cache: (Optional[Dict[str, Tuple[float, dict]]]) the parsed configs keyed by their path
+    :param write_line: (Optional[Callable[[str], None]]) the function the output lines are passed to, None prints them
+    :param combined_output: (Optional[str]) the path of a file the outputs are combined into with a header per config
+    :param fail_fast: (Optional[FailFast]) the policy that cancels the run once too many configs have failed
+    :param spread_cores: (bool) if True the configs running at the same time are pinned to disjoint sets of CPUs
+    :param journal: (Optional[Journal]) the journal the commands of the configs are recorded in as steps
+    :param preflight: (bool) if True a config fails if its server failed the pre-flight check of this run
+    :return: (List[dict]) the results of the runs in the same order as the file_paths
+    """
+    write_line = write_line if write_line is not None else print
+    results: List[Optional[dict]] = [None] * len(file_paths)
+    directory = output_directory if output_directory is not None else os.getcwd()
+
+    names = [file_path.split("/")[-1] for file_path in file_paths]
+    writer: Optional[OrderedWriter] = None
+    if combined_output is not None:
+        writer = OrderedWriter(path=combined_output, names=names, header="==> {name} <==")
+    core_allocator = CoreAllocator(workers=jobs) if spread_cores is True else None
+    progress = Progress()
+    progress_keys = [progress.add(name=name) if progress.active else None for name in names]
+    # the lines of each config already passed to the writer as they were read
+    streamed: List[List[str]] = [[] for _ in file_paths]
+
+    def stream(index: int) -> Optional[Callable[[str], None]]:
+        if writer is None:
+            return None
+
+        def on_line(line: str) -> None:
+            streamed[index].append(line)
+            writer.write_lines(index=index, lines=[line])
+
+        return on_line
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {}
+        for index, file_path in enumerate(file_paths):
+            output_path = f"{directory}/{names[index]}.output.txt"
+            future = executor.submit(_run_isolated_config_file, file_path=file_path, output_path=output_path,
+                                     use_cache=use_cache, working_directory=output_directory,
+                                     config_cache=config_cache, fail_fast=fail_fast,
+                                     core_allocator=core_allocator, progress_key=progress_keys[index],
+                                     journal=journal, on_line=stream(index=index), preflight=preflight)
+            futures[future] = index
+
+        for future in as_completed(futures):
+            index = futures[future]
+            result = future.result()
+            results[index] = result
+            if writer is not None:
+                # lines that were not streamed, such as the error of a config that raised, are written now
+                lines = result["lines"] or []
+                if lines[:len(streamed[index])] == streamed[index]:
+                    lines = lines[len(streamed[index]):]
+                writer.write_lines(index=index, lines=lines)
+                writer.finish(index=index)
+                streamed[index] = []
+                continue
+            for line in result["lines"] or []:
+                write_line(f"[{names[index]}] {line}")
+
+    if writer is not None:
+        writer.close()
+    return results
+
+
+def print_summary(results: List[dict], seconds: float, write_line: Optional[Callable[[str], None]] = None) -> int:
+    """
+    Prints the exit status and timing of every config run and works out the aggregated exit status.
+
+    :param results: (List[dict]) the results of the config runs
+    :param seconds: (float) the wall clock time taken for all the runs
+    :param write_line: (Optional[Callable[[str], None]]) the function the summary lines are passed to, None prints
+                       them
+    :return: (int) 0 if every config succeeded, otherwise 1
+    """
+    write_line = write_line if write_line is not None else print
+    failed = [result for result in results if result["return_code"] not in (0, None)]
+    skipped = [result for result in results if result["return_code"] is None]
+    width = max(len(result["config"]) for result in results)
+
+    write_line(f"{'config'.ljust(width)}  status  seconds")
+    for result in results:
+        if result["return_code"] is None:
+            status = "skipped"
+        else:
+            status = "ok" if result["return_code"] == 0 else f"exit {result['return_code']}"
+        write_line(f"{result['config'].ljust(width)}  {status.ljust(6)}  {result['seconds']:.2f}")
+    skipped_text = f", {len(skipped)} skipped" if len(skipped) > 0 else ""
+    write_line(f"{len(results)} configs, {len(failed)} failed{skipped_text}, {seconds:.2f} seconds")
+    return 0 if len(failed) + len(skipped) == 0 else 1
+
+
+def expand_config_paths(patterns: List[str]) -> List[str]:
+    """
+    Expands the config paths passed in relative to the current working directory, resolving any glob patterns.
+
+    :param patterns: (List[str]) the config paths or glob patterns
+    :return: (List[str]) the absolute config paths
+    """
+    file_paths: List[str] = []
+    for pattern in patterns:
+        file_path = f"{os.getcwd()}/{pattern}"
+        matches = sorted(glob.glob(file_path))
+        file_paths += matches if len(matches) > 0 else [file_path]
+    return file_paths
+
+
+def main() -> int:
+    """
+    This function runs the entry point reading one or more config files and running a series of commands with
+    environment variables and configurations around username, ip_address, keys etc. Several configs are run
+    concurrently with each one having its own variable storage.
+
+    :return: (int) the exit status of the run
+    """
+    config_parser = argparse.ArgumentParser()
+    config_parser.add_argument('mode', action='store', type=str, nargs="?", choices=["run", "daemon"], default="run",
+                               help="run runs the configs, daemon starts a long lived process that runs configs "
+                                    "submitted over a local socket (default: run)")
+    config_parser.add_argument('--f', action='store', type=str, nargs="+", required=False, default=["gerund.yml"],
+                               help="the paths or glob patterns of the config yml/json/txt files that define the "
+                                    "command runs (default: gerund.yml)")
+    config_parser.add_argument('--jobs', action='store', type=int, required=False, default=1,
+                               help="the number of configs run at the same time when several are passed (default: 1)")
+    config_parser.add_argument('--no-cache', action='store_true', required=False, default=False,
+                               help="runs every command even if the config enables the result cache")
+    config_parser.add_argument('--trace', action='store', type=str, required=False, default=None,
+                               help="the path of a Chrome trace-event JSON file that the timings of the run are "
+                                    "written to which can be opened in Perfetto")
+    config_parser.add_argument('--output', action='store', type=str, required=False, default=None,
+                               help="the path of a file that the output of the configs is combined into in the order "
+                                    "the configs were passed")
+    config_parser.add_argument('--fail-fast', action='store_true', required=False, default=False,
+                               help="stops the running configs and skips the rest once more than --max-failures "
+                                    "configs have failed")
+    config_parser.add_argument('--max-failures', action='store', type=int, required=False, default=0,
+                               help="the number of failed configs tolerated with --fail-fast (default: 0)")
+    config_parser.add_argument('--spread-cores', action='store_true', required=False, default=False,
+                               help="pins the configs running at the same time to disjoint sets of CPUs")
+    config_parser.add_argument('--progress', action='store_true', required=False, default=False,
+                               help="shows a live view of the running configs and matrix cells, or a summary line "
+                                    "every 10 seconds when the output is not a terminal")
+    config_parser.add_argument('--preflight', action='store_true', required=False, default=False,
+                               help="checks every server of the configs for reachability, authentication, disk "
+                                    "space, and load before any config is run, configs on unhealthy servers fail "
+                                    "without running")
+    config_parser.add_argument('--journal', action='store', type=str, required=False, default=None,
+                               help="runs every command of the configs as its own step and appends the completed "
+                                    f"steps to this file (default with --resume: {DEFAULT_JOURNAL_PATH})")
+    config_parser.add_argument('--resume', action='store_true', required=False, default=False,
+                               help="skips the steps the journal has as completed with the same rendered command and "
+                                    "environment")
+    config_parser.add_argument('--metrics-file', action='store', type=str, required=False, default=None,
+                               help="the path of a Prometheus textfile collector file the metrics of the run are "
+                                    "written to on exit")
+    config_parser.add_argument('--metrics-interval', action='store', type=float, required=False, default=0.0,
+                               help="the seconds between writes of --metrics-file during the run (default: 0, only "
+                                    "written on exit)")
+    config_parser.add_argument('--metrics-port', action='store', type=int, required=False, default=None,
+                               help="serves the metrics on http://127.0.0.1:<port>/metrics while gerund runs")
+    config_parser.add_argument('--via-daemon', action='store_true', required=False, default=False,
+                               help="submits the configs to a running gerund daemon and streams the output back")
+    config_parser.add_argument('--socket', action='store', type=str, required=False, default=DEFAULT_SOCKET_PATH,
+                               help=f"the path of the unix socket of the gerund daemon (default: {DEFAULT_SOCKET_PATH})")
+
+    args = config_parser.parse_args()
+    metrics = Metrics()
+    if args.metrics_port is not None:
+        metrics.serve(port=args.metrics_port)
+    if args.metrics_file is not None and args.metrics_interval > 0:
+        metrics.start_textfile_writer(path=args.metrics_file, interval=args.metrics_interval)
+    try:
+        return _run_from_args(args=args)
+    finally:
+        metrics.stop()
+        if args.metrics_file is not None:
+            metrics.write_textfile(path=args.metrics_file)
+
+
+def _run_from_args(args: argparse.Namespace) -> int:
+    """
+    Runs the configs or the daemon based off the parsed command line arguments.
+
+    :param args: (argparse.Namespace) the parsed command line arguments
+    :return: (int) the aggregated exit status of the run
+    """
+    combined_output: Optional[str] = None
+    if args.output is not None:
+        combined_output = args.output if args.output.startswith("/") else f"{os.getcwd()}/{args.output}"
+    journal_path: Optional[str] = args.journal
+    if journal_path is None and args.resume is True:
+        journal_path = DEFAULT_JOURNAL_PATH
+    if journal_path is not None and not journal_path.startswith("/"):
+        journal_path = f"{os.getcwd()}/{journal_path}"
+
+    if args.mode == "daemon" or args.via_daemon is True:
+        # imported here as the daemon runs configs with the functions in this file
+        from gerund.entry_points.daemon import GerundDaemon, submit_to_daemon
+
+        if args.mode == "daemon":
+            GerundDaemon(socket_path=args.socket).serve_forever()
+            return 0
+        request = {
+            "configs": expand_config_paths(patterns=args.f),
+            "jobs": max(args.jobs, 1),
+            "use_cache": not args.no_cache,
+            "cwd": os.getcwd(),
+            "output": combined_output,
+            "max_failures": args.max_failures if args.fail_fast is True else None,
+            "spread_cores": args.spread_cores,
+            "journal": journal_path,
+            "resume": args.resume,
+            "preflight": args.preflight
+        }
+        return submit_to_daemon(socket_path=args.socket, request=request)
+
+    file_paths = expand_config_paths(patterns=args.f)
+    journal = Journal(path=journal_path, resume=args.resume) if journal_path is not None else None
+    write_line: Optional[Callable[[str], None]] = None
+    if args.progress is True:
+        Progress().start()
+        write_line = Progress().write_line
+
+    try:
+        if args.preflight is True:
+            for line in preflight_configs(file_paths=file_paths):
+                (write_line or print)(line)
+        # a single config is run on its own unless a flag needs the runner of several configs
+        if len(file_paths) == 1 and combined_output is None and args.fail_fast is False and \
+                args.spread_cores is False and args.progress is False:
+            failure = preflight_failure(data=load_config(file_path=file_paths[0])) if args.preflight is True else None
+            if failure is not None:
+                # fails without running like a config on an unhealthy server does when several are run
+                (write_line or print)(failure)
+                return 1
+            result = run_config_file(file_path=file_paths[0], output_path=f"{os.getcwd()}/output.txt",
+                                     use_cache=not args.no_cache, write_line=write_line, journal=journal,
+                                     preflight=args.preflight)
+            return result["return_code"]
+
+        start = time.perf_counter()
+        results = run_config_files(file_paths=file_paths, jobs=max(args.jobs, 1), use_cache=not args.no_cache,
+                                   combined_output=combined_output, write_line=write_line,
+                                   fail_fast=FailFast(max_failures=args.max_failures) if args.fail_fast else None,
+                                   spread_cores=args.spread_cores, journal=journal, preflight=args.preflight)
+        if args.progress is True:
+            Progress().stop()
+        return print_summary(results=results, seconds=time.perf_counter() - start)
+    finally:
+        if args.progress is True:
+            Progress().stop()
+        if args.trace is not None:
+            Tracer().export_chrome_trace(path=args.trace)
@@ -1,8 +1,23 @@
 """
 This file defines the types and enums used in the package.
 """
-from typing import Optional, Dict, List, Union
+from enum import Enum
+from typing import Optional, Dict, List, Union, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from gerund.components.builtin_step import BuiltinStep
 
 
 EnvVars = Optional[Dict[str, str]]
-InputCmd = Union[str, List[str]]
+InputCmd = Union[str, List[Union[str, "BuiltinStep"]]]
+
+
+class Compression(Enum):
+    """
+    The compression applied to data sent between the local machine and a server.
+
+    SSH: compresses the whole ssh/scp connection with the -C flag
+    GZIP: compresses the output on the server and uploads with gzip, decoding the stream locally
+    """
+    SSH = "ssh"
+    GZIP = "gzip"
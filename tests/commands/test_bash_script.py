@@ -3,6 +3,7 @@ from unittest import main, TestCase
 from unittest.mock import patch
 
 from gerund.commands.bash_script import BashScript
+from gerund.enums import Compression
 
 
 class TestBashScript(TestCase):
@@ -78,7 +79,8 @@ class TestBashScript(TestCase):
 
         mock_terminal_command.assert_called_once_with(
             command=['cd /home/ubuntu', 'sh another_script.sh', 'rm another_script.sh'],
-            environment_variables=None, ip_address='123456', key=None, username='ubuntu'
+            environment_variables=None, ip_address='123456', key=None, username='ubuntu', compression=None,
+            fail_fast=None, input=None
         )
         mock_terminal_command.return_value.wait.assert_called_once_with(capture_output=False)
 
@@ -94,10 +96,35 @@ class TestBashScript(TestCase):
 
         mock_terminal_command.assert_called_once_with(
             command=['cd /home/ubuntu', 'sh another_script.sh', 'rm another_script.sh'],
-            environment_variables=None, ip_address='123456', key=key_path, username='ubuntu'
+            environment_variables=None, ip_address='123456', key=key_path, username='ubuntu', compression=None,
+            fail_fast=None, input=None
         )
         mock_terminal_command.return_value.wait.assert_called_once_with(capture_output=False)
 
+    @patch("gerund.commands.bash_script.TerminalCommand")
+    @patch("gerund.commands.bash_script.Popen")
+    def test__run_on_server_compression(self, mock_open, mock_terminal_command):
+        self.path_test.ip_address = "123456"
+        ssh_prefix: str = "-o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null"
+
+        self.path_test.compression = Compression.SSH
+        self.path_test._run_on_server()
+
+        command = f'scp -C {ssh_prefix} {self.write_path} ubuntu@123456:/home/ubuntu/another_script.sh'
+        mock_open.assert_called_once_with(command, shell=True)
+        self.assertEqual(Compression.SSH, mock_terminal_command.call_args[1]["compression"])
+
+        mock_open.reset_mock()
+        self.path_test.compression = Compression.GZIP
+        self.path_test._run_on_server()
+
+        command = f"gzip -c {self.write_path} | ssh {ssh_prefix} ubuntu@123456 'gzip -dc > /home/ubuntu/another_script.sh'"
+        mock_open.assert_called_once_with(command, shell=True)
+        self.assertEqual(Compression.GZIP, mock_terminal_command.call_args[1]["compression"])
+
+        with self.assertRaises(ValueError):
+            BashScript(commands=self.commands, compression="zip")
+
     @patch("gerund.commands.bash_script.datetime")
     def test__run(self, mock_datetime):
         mock_datetime.now.return_value.microsecond = "seconds"
@@ -0,0 +1,144 @@
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import tempfile
+from unittest import main, TestCase
+from unittest.mock import patch
+
+from gerund.commands.broadcast import Broadcast
+from gerund.components.local_variable_storage import Singleton
+
+
+class TestBroadcast(TestCase):
+
+    def setUp(self) -> None:
+        self.local_directory = tempfile.mkdtemp()
+        self.servers_directory = tempfile.mkdtemp()
+        os.makedirs(f"{self.local_directory}/model/weights")
+        for path, content in [("model/weights/layer-1.bin", "1234\n"), ("model/config.json", "{}\n"),
+                              ("run.sh", "echo run\n")]:
+            with open(f"{self.local_directory}/{path}", "w") as file:
+                file.write(content)
+        self.hosts = [f"10.0.0.{index}" for index in range(1, 8)]
+        self.test = Broadcast(paths=[f"{self.local_directory}/model", f"{self.local_directory}/run.sh"],
+                              hosts=self.hosts, remote_directory="artifacts", relay_key="~/.ssh/relay.pem")
+        self.corrupt = []
+        self.broken = []
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.local_directory)
+        shutil.rmtree(self.servers_directory)
+        Singleton._instances = {}
+
+    def home(self, host: str) -> str:
+        path = f"{self.servers_directory}/{host}"
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def run_locally(self, command: str, **kwargs) -> subprocess.Popen:
+        # every server is a directory standing in for its home directory and the relay between servers is rewritten
+        # to run in the directory of the receiving server
+        *_, destination, remote_command = shlex.split(command)
+        host = destination.split("@")[-1]
+        relay = re.search(r"\| ssh .*?@(\S+) (\".*\")$", remote_command)
+        if relay is not None:
+            receive = relay.group(2)
+            if relay.group(1) in self.corrupt:
+                receive = receive.replace("tar -xzf - &&", "tar -xzf - && echo 0 >> run.sh &&")
+            if host in self.broken:
+                receive = "\"exit 1\""
+            remote_command = remote_command[:relay.start()] + f"| (cd {self.home(relay.group(1))} && sh -c {receive})"
+        return subprocess.Popen(remote_command, cwd=self.home(host), shell=True, **{
+            name: value for name, value in kwargs.items() if name != "shell"})
+
+    def test__compile_relay(self):
+        command = Broadcast(paths=[f"{self.local_directory}/run.sh"], hosts=["1"], key="./key.pem",
+                            remote_directory="bin")._compile_relay(source="10.0.0.1", host="10.0.0.2")
+        self.assertEqual(True, command.startswith("ssh -o StrictHostKeyChecking=no"))
+        self.assertEqual(True, "-i './key.pem' -A ubuntu@10.0.0.1 'cd bin && tar -czf - .gerund-broadcast.sha256 "
+                               "run.sh | ssh " in command)
+        self.assertEqual(True, command.endswith("-o BatchMode=yes ubuntu@10.0.0.2 \"mkdir -p bin && cd bin && "
+                                                "tar -xzf - && sha256sum -c --quiet .gerund-broadcast.sha256\"'"))
+
+        command = Broadcast(paths=[f"{self.local_directory}/run.sh"], hosts=["1"], remote_directory="~/my bin",
+                            relay_key="~/.ssh/relay key.pem")._compile_relay(source="10.0.0.1", host="10.0.0.2")
+        self.assertEqual(True, "-i ~/'\\''.ssh/relay key.pem'\\'' " in command)
+        self.assertEqual(True, "'cd ~/'\\''my bin'\\'' && tar" in command)
+
+    def test___init__(self):
+        with self.assertRaises(ValueError):
+            Broadcast(paths=[f"{self.local_directory}/missing"], hosts=self.hosts)
+        with self.assertRaises(ValueError):
+            Broadcast(paths=[f"{self.local_directory}/run.sh"], hosts=self.hosts, fan_out=0)
+        with self.assertRaises(ValueError) as error:
+            Broadcast(paths=[f"{self.local_directory}/run.sh", f"{self.local_directory}/model/../run.sh"],
+                      hosts=self.hosts)
+        self.assertEqual("more than one path is named run.sh but each is written under its own name",
+                         str(error.exception))
+
+    @patch("gerund.commands.broadcast.Popen")
+    def test_wait(self, mock_popen):
+        mock_popen.side_effect = self.run_locally
+        results = self.test.wait()
+
+        self.assertEqual(self.hosts, [result.host for result in results])
+        self.assertEqual([None] * 7, [result.error for result in results])
+        for host in self.hosts:
+            with open(f"{self.servers_directory}/{host}/artifacts/model/weights/layer-1.bin", "r") as file:
+                self.assertEqual("1234\n", file.read())
+            with open(f"{self.servers_directory}/{host}/artifacts/run.sh", "r") as file:
+                self.assertEqual("echo run\n", file.read())
+
+        # most servers are sent the files by other servers instead of this machine
+        relayed = [result for result in results if result.source is not None]
+        self.assertEqual(True, len(relayed) >= 4)
+        self.assertEqual(True, all(result.depth == results[self.hosts.index(result.source)].depth + 1
+                                   for result in relayed))
+        commands = [call[0][0] for call in mock_popen.call_args_list]
+        self.assertEqual(len(relayed), len([command for command in commands if "| ssh " in command]))
+
+    @patch("gerund.commands.broadcast.Popen")
+    def test_wait_corrupt_relay(self, mock_popen):
+        mock_popen.side_effect = self.run_locally
+        self.corrupt = ["10.0.0.3"]
+        results = self.test.wait()
+
+        # the checksum fails on the relay so the server is sent the files again from this machine
+        self.assertEqual([None] * 7, [result.error for result in results])
+        self.assertEqual((None, 1), results[2][1:3])
+        with open(f"{self.servers_directory}/10.0.0.3/artifacts/run.sh", "r") as file:
+            self.assertEqual("echo run\n", file.read())
+
+    @patch("gerund.commands.broadcast.Popen")
+    def test_wait_quoted_names(self, mock_popen):
+        mock_popen.side_effect = self.run_locally
+        path = f"{self.local_directory}/it's a \"run\" $HOME.sh"
+        with open(path, "w") as file:
+            file.write("echo quoted\n")
+        results = Broadcast(paths=[path], hosts=self.hosts, remote_directory="my artifacts/`date`").wait()
+
+        self.assertEqual([None] * 7, [result.error for result in results])
+        self.assertEqual(True, any(result.source is not None for result in results))
+        for host in self.hosts:
+            with open(f"{self.servers_directory}/{host}/my artifacts/`date`/it's a \"run\" $HOME.sh", "r") as file:
+                self.assertEqual("echo quoted\n", file.read())
+
+    @patch("gerund.commands.broadcast.Popen")
+    def test_wait_broken_source(self, mock_popen):
+        mock_popen.side_effect = self.run_locally
+        self.broken = ["10.0.0.1"]
+        hosts = [f"10.0.0.{index}" for index in range(1, 21)]
+        results = Broadcast(paths=[f"{self.local_directory}/run.sh"], hosts=hosts).wait()
+
+        # the relays that were already running fail but the server is not given any more servers to relay to
+        self.assertEqual([None] * 20, [result.error for result in results])
+        self.assertEqual(False, any(result.source == "10.0.0.1" for result in results))
+        commands = [call[0][0] for call in mock_popen.call_args_list]
+        self.assertEqual(True, len([command for command in commands if "@10.0.0.1 'cd " in command]) <= 2)
+
+
+
+if __name__ == "__main__":
+    main()
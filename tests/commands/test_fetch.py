@@ -0,0 +1,114 @@
+import hashlib
+import io
+import os
+import shutil
+import subprocess
+import tarfile
+import tempfile
+from unittest import main, TestCase
+from unittest.mock import MagicMock, patch
+
+from gerund.commands.fetch import Fetch
+from gerund.components.local_variable_storage import Singleton
+
+
+class TestFetch(TestCase):
+
+    def setUp(self) -> None:
+        self.remote_directory = tempfile.mkdtemp()
+        self.local_directory = tempfile.mkdtemp()
+        os.makedirs(f"{self.remote_directory}/results/run-1")
+        for path, content in [("results/run-1/losses.csv", "1,2\n"), ("results/summary.txt", "done\n"),
+                              ("logs.txt", "not fetched\n")]:
+            with open(f"{self.remote_directory}/{path}", "w") as file:
+                file.write(content)
+        self.test = Fetch(paths=["results"], hosts=["10.0.0.1", "10.0.0.2"], local_directory=self.local_directory)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.remote_directory)
+        shutil.rmtree(self.local_directory)
+        Singleton._instances = {}
+
+    def run_locally(self, command: str, **kwargs) -> subprocess.Popen:
+        # runs the part of the command meant for the server in the directory standing in for the home directory
+        remote_command = command.split(" '", 1)[1][:-1]
+        return subprocess.Popen(remote_command, cwd=self.remote_directory, **kwargs)
+
+    def test__compile_command(self):
+        command = Fetch(paths=["results", "/var/log/run.log"], hosts=["1"], local_directory=".",
+                        key="./key.pem")._compile_command(host="10.0.0.1")
+        self.assertEqual(True, command.startswith("ssh -o StrictHostKeyChecking=no"))
+        self.assertEqual(True, "-i './key.pem' ubuntu@10.0.0.1 'sums=.gerund-fetch-$$.sha256; " in command)
+        self.assertEqual(True, "find results /var/log/run.log -type f -exec sha256sum {} + > $sums" in command)
+        self.assertEqual(True, command.endswith("tar -czf - $sums results /var/log/run.log; status=$?; "
+                                                "rm -f $sums; exit $status'"))
+
+    @patch("gerund.commands.fetch.Popen")
+    def test_wait(self, mock_popen):
+        mock_popen.side_effect = self.run_locally
+        results = self.test.wait()
+
+        self.assertEqual(["10.0.0.1", "10.0.0.2"], [result.host for result in results])
+        for result in results:
+            self.assertEqual(None, result.error)
+            self.assertEqual((2, 9), (result.files, result.bytes))
+            self.assertEqual(True, result.transferred_bytes > 0)
+            self.assertEqual(True, result.bytes_per_second > 0)
+            with open(f"{self.local_directory}/{result.host}/results/run-1/losses.csv", "r") as file:
+                self.assertEqual("1,2\n", file.read())
+            self.assertEqual(["results"], os.listdir(result.directory))
+        self.assertEqual(["logs.txt", "results"], sorted(os.listdir(self.remote_directory)))
+
+    @patch("gerund.commands.fetch.Popen")
+    def test_wait_checksum_mismatch(self, mock_popen):
+        stream = io.BytesIO()
+        with tarfile.open(fileobj=stream, mode="w:gz") as archive:
+            for name, content in [(".gerund-fetch-1.sha256", "0" * 64 + "  results/a.txt\n"), ("results/a.txt", "a")]:
+                info = tarfile.TarInfo(name=name)
+                info.size = len(content)
+                archive.addfile(info, fileobj=io.BytesIO(content.encode()))
+        stream.seek(0)
+        # ssh exits with an error once its stdout is closed early which must not hide the mismatch
+        mock_popen.return_value = MagicMock(stdout=stream, returncode=255)
+
+        result = Fetch(paths=["results"], hosts=["10.0.0.1"], local_directory=self.local_directory).wait()[0]
+        self.assertEqual("checksum mismatch for results/a.txt", result.error)
+        self.assertEqual([], os.listdir(self.local_directory))
+
+    @patch("gerund.commands.fetch.Popen")
+    def test_wait_partial(self, mock_popen):
+        os.makedirs(f"{self.local_directory}/10.0.0.1/results")
+        with open(f"{self.local_directory}/10.0.0.1/results/a.txt", "w") as file:
+            file.write("old\n")
+        stream = io.BytesIO()
+        with tarfile.open(fileobj=stream, mode="w:gz") as archive:
+            for name, content in [(".gerund-fetch-1.sha256", f"{hashlib.sha256(b'new').hexdigest()}  results/a.txt\n"
+                                                             f"{'0' * 64}  results/b.txt\n"),
+                                  ("results/a.txt", "new"), ("results/b.txt", "b")]:
+                info = tarfile.TarInfo(name=name)
+                info.size = len(content)
+                archive.addfile(info, fileobj=io.BytesIO(content.encode()))
+        stream.seek(0)
+        mock_popen.return_value = MagicMock(stdout=stream, returncode=0)
+
+        # the file that was fetched before the failure does not replace the copy from the last fetch
+        result = Fetch(paths=["results"], hosts=["10.0.0.1"], local_directory=self.local_directory).wait()[0]
+        self.assertEqual(("checksum mismatch for results/b.txt", 0), (result.error, result.files))
+        self.assertEqual(["10.0.0.1"], os.listdir(self.local_directory))
+        self.assertEqual(["a.txt"], os.listdir(f"{self.local_directory}/10.0.0.1/results"))
+        with open(f"{self.local_directory}/10.0.0.1/results/a.txt", "r") as file:
+            self.assertEqual("old\n", file.read())
+
+    @patch("gerund.commands.fetch.Popen")
+    def test_wait_failure(self, mock_popen):
+        mock_popen.side_effect = self.run_locally
+        result = Fetch(paths=["missing"], hosts=["10.0.0.1"], local_directory=self.local_directory).wait()[0]
+        self.assertEqual(True, result.error.startswith("fetch from 10.0.0.1 failed with exit code"))
+        self.assertEqual(["logs.txt", "results"], sorted(os.listdir(self.remote_directory)))
+
+        with self.assertRaises(ValueError):
+            Fetch(paths=[], hosts=["10.0.0.1"], local_directory=".")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import shutil
+import tempfile
+import time
+from unittest import main, TestCase
+from unittest.mock import patch
+
+from gerund.commands.bash_script import BashScript
+from gerund.commands.host_pool import HostPool, TaskResult
+from gerund.commands.terminal_command import TerminalCommand
+from gerund.components.builtin_step import BuiltinStep
+from gerund.components.fail_fast import FailFast
+from gerund.components.ordered_writer import OrderedWriter
+from gerund.components.output_capture import OutputLine
+from gerund.components.preflight import HostHealth, Preflight
+from gerund.components.variable_map import Singleton
+
+
+def fake_run_task(speeds: dict):
+    def run_task(self, task, index, host, capture_output):
+        time.sleep(speeds[host])
+        if isinstance(task, TerminalCommand) and task.on_line is not None:
+            task.on_line(OutputLine(timestamp=time.time(), stream="stdout", text=f"task {index}"))
+        return TaskResult(index=index, host=host, return_code=0, seconds=speeds[host], output=[f"task {index}"],
+                          error=None)
+    return run_task
+
+
+class TestHostPool(TestCase):
+
+    def tearDown(self) -> None:
+        Singleton._instances = {}
+
+    def test___init__(self):
+        self.assertEqual({"one": 1, "two": 1}, HostPool(hosts=["one", "two"]).hosts)
+        self.assertEqual({"one": 2}, HostPool(hosts={"one": 2}).hosts)
+
+        with self.assertRaises(ValueError) as error:
+            HostPool(hosts=[])
+        self.assertEqual("a host pool needs at least one host", str(error.exception))
+
+        with self.assertRaises(ValueError) as error:
+            HostPool(hosts={"one": 0})
+        self.assertEqual("one has to have at least 1 slot not 0", str(error.exception))
+
+    def test_run_work_stealing(self):
+        test = HostPool(hosts=["fast", "slow"])
+        tasks = [TerminalCommand("echo 1") for _ in range(20)]
+
+        with patch.object(HostPool, "_run_task", fake_run_task(speeds={"fast": 0.005, "slow": 0.05})):
+            results = test.run(tasks=tasks)
+
+        self.assertEqual(list(range(20)), [i.index for i in results])
+        usage = {i.host: i for i in test.usage}
+        self.assertEqual(20, usage["fast"].tasks + usage["slow"].tasks)
+        self.assertEqual(True, usage["fast"].tasks > usage["slow"].tasks * 2)
+
+    def test_run_affinity(self):
+        test = HostPool(hosts=["one", "two"])
+        tasks = [TerminalCommand("echo 1") for _ in range(6)]
+
+        with patch.object(HostPool, "_run_task", fake_run_task(speeds={"one": 0.001, "two": 0.02})):
+            results = test.run(tasks=tasks, affinity={0: "two", 1: "two", 2: "two"}, strict_affinity=True)
+            self.assertEqual(["two", "two", "two"], [i.host for i in results[:3]])
+
+            results = test.run(tasks=tasks, affinity={0: "two", 1: "two", 2: "two", 3: "two"})
+            self.assertEqual(True, "one" in [i.host for i in results[:4]])
+            self.assertEqual(True, test.usage[0].stolen > 0)
+
+        with self.assertRaises(ValueError) as error:
+            test.run(tasks=tasks, affinity={0: "three"})
+        self.assertEqual("task 0 has an affinity to three which is not in the pool", str(error.exception))
+
+    def test_run_preflight(self):
+        test = HostPool(hosts=["one", "two"], username="root")
+        tasks = [TerminalCommand("echo 1") for _ in range(6)]
+        health = [HostHealth(host="one", healthy=True, reason=None),
+                  HostHealth(host="two", healthy=False, reason="timed out after 10 seconds")]
+
+        with patch.object(HostPool, "_run_task", fake_run_task(speeds={"one": 0.001, "two": 0.001})), \
+                patch.object(Preflight, "check", return_value=health) as mock_check:
+            results = test.run(tasks=tasks, affinity={0: "two", 1: ["one", "two"]}, strict_affinity=True,
+                               preflight=True)
+            mock_check.assert_called_once_with(hosts=["one", "two"], username="root", key=None)
+
+            self.assertEqual({"two": "timed out after 10 seconds"}, test.excluded)
+            self.assertEqual((None, "two failed the pre-flight check: timed out after 10 seconds"),
+                             (results[0].return_code, results[0].error))
+            self.assertEqual(["one"] * 5, [i.host for i in results[1:]])
+
+            mock_check.return_value = [health[1], health[1]._replace(host="one")]
+            with self.assertRaises(ValueError):
+                test.run(tasks=tasks, preflight=True)
+
+    @patch.object(BashScript, "wait")
+    @patch.object(TerminalCommand, "wait")
+    def test__run_task(self, mock_terminal_wait, mock_bash_wait):
+        mock_terminal_wait.return_value = ["1"]
+        test = HostPool(hosts=["one"], username="root", key="key.pem")
+
+        command = TerminalCommand("echo 1")
+        result = test._run_task(task=command, index=3, host="one", capture_output=True)
+        self.assertEqual(("one", "root", "key.pem", True), (command.ip_address, command.username, command.key,
+                                                            command._remote))
+        self.assertEqual((3, "one", ["1"], None), (result.index, result.host, result.output, result.error))
+        mock_terminal_wait.assert_called_once_with(capture_output=True)
+
+        script = BashScript(commands=["echo 1"])
+        test._run_task(task=script, index=0, host="one", capture_output=True)
+        self.assertEqual("one", script.ip_address)
+        mock_bash_wait.assert_called_once_with()
+
+        mock_terminal_wait.side_effect = ValueError("failed")
+        result = test._run_task(task=command, index=0, host="one", capture_output=False)
+        self.assertEqual((None, "ValueError: failed"), (result.return_code, result.error))
+
+    @patch("gerund.commands.terminal_command.Popen")
+    def test__run_task_builtin_steps(self, mock_popen):
+        mock_popen.return_value.returncode = 0
+        test = HostPool(hosts=["1.2.3.4"], username="root")
+        command = TerminalCommand([BuiltinStep.mkdir(path="x"), "ls"])
+        self.assertEqual(1, len(command._builtins))
+
+        # the built-in step has to run on the server the task is sent to and not on this machine
+        result = test._run_task(task=command, index=0, host="1.2.3.4", capture_output=False)
+        self.assertEqual((0, None), (result.return_code, result.error))
+        self.assertEqual([], command._builtins)
+        self.assertEqual(True, mock_popen.call_args[0][0].endswith("root@1.2.3.4 ' mkdir -p \"x\" && ls '"))
+
+    def test_run_writer(self):
+        directory = tempfile.mkdtemp()
+        test = HostPool(hosts=["fast", "slow"])
+
+        with patch.object(HostPool, "_run_task", fake_run_task(speeds={"fast": 0.001, "slow": 0.01})), \
+                OrderedWriter(path=f"{directory}/output.txt") as writer:
+            results = test.run(tasks=[TerminalCommand("echo 1") for _ in range(10)], writer=writer)
+
+        with open(f"{directory}/output.txt", "r") as file:
+            self.assertEqual("".join(f"task {i}\n" for i in range(10)), file.read())
+        self.assertEqual([None] * 10, [i.output for i in results])
+        shutil.rmtree(directory)
+
+    def test_run_writer_streams(self):
+        directory = tempfile.mkdtemp()
+        written = []
+
+        def run_task(pool, task, index, host, capture_output):
+            task.on_line(OutputLine(timestamp=time.time(), stream="stdout", text="first"))
+            with open(f"{directory}/output.txt", "r") as file:
+                written.append(file.read())
+            return TaskResult(index=index, host=host, return_code=None, seconds=0.0, output=["first"],
+                              error="ValueError: failed")
+
+        with patch.object(HostPool, "_run_task", run_task), OrderedWriter(path=f"{directory}/output.txt") as writer:
+            HostPool(hosts=["one"]).run(tasks=[TerminalCommand("echo 1")], writer=writer)
+
+        # the line reaches the file while the task is running and is not written again once it finishes
+        self.assertEqual(["first\n"], written)
+        with open(f"{directory}/output.txt", "r") as file:
+            self.assertEqual("first\nValueError: failed\n", file.read())
+        shutil.rmtree(directory)
+
+    def test_run_fail_fast(self):
+        def run_task(self, task, index, host, capture_output):
+            return TaskResult(index=index, host=host, return_code=int(index == 1), seconds=0.0, output=None,
+                              error=None)
+
+        test = HostPool(hosts=["one"])
+        with patch.object(HostPool, "_run_task", run_task):
+            results = test.run(tasks=[TerminalCommand("echo 1") for _ in range(5)], fail_fast=FailFast())
+        self.assertEqual([0, 1, None, None, None], [i.return_code if i else None for i in results])
+
+    @patch.object(TerminalCommand, "wait")
+    def test__run_task_fail_fast(self, mock_wait):
+        test = HostPool(hosts=["one"])
+        test._fail_fast = FailFast()
+        command = TerminalCommand("sleep 30")
+
+        test._run_task(task=command, index=0, host="one", capture_output=False)
+        self.assertEqual(test._fail_fast, command.fail_fast)
+
+    def test_usage_report(self):
+        test = HostPool(hosts=["one", "two"])
+        with patch.object(HostPool, "_run_task", fake_run_task(speeds={"one": 0.001, "two": 0.001})):
+            test.run(tasks=[TerminalCommand("echo 1") for _ in range(4)])
+
+        report = test.usage_report()
+        self.assertEqual("host  tasks  stolen  busy_seconds  utilisation", report[0])
+        self.assertEqual(["one", "two"], [i.split(" ")[0] for i in report[1:3]])
+        self.assertEqual("4 tasks", report[-1][:7])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import threading
+from unittest import main, TestCase
+from unittest.mock import patch
+
+from gerund.commands.pipeline import Pipeline
+from gerund.commands.terminal_command import TerminalCommand
+from gerund.components.host_limiter import HostLimiter
+from gerund.components.local_variable_storage import Singleton
+
+
+class TestPipeline(TestCase):
+
+    def setUp(self) -> None:
+        self.first = TerminalCommand("printf 'one\\ntwo\\nthree\\n'")
+        self.second = TerminalCommand("grep t")
+        self.third = TerminalCommand("tr a-z A-Z", environment_variables={"ONE": "1"})
+
+    def tearDown(self) -> None:
+        Singleton._instances = {}
+
+    def test___init__(self):
+        test = Pipeline(commands=[self.first, self.second])
+        self.assertEqual([self.first, self.second], test.commands)
+        self.assertEqual(None, test.output)
+
+        with self.assertRaises(ValueError) as error:
+            Pipeline(commands=[])
+        self.assertEqual("a pipeline needs at least one command", str(error.exception))
+
+    def test___or__(self):
+        test = self.first | self.second
+        self.assertEqual(Pipeline, type(test))
+        self.assertEqual([self.first, self.second], test.commands)
+
+        test = self.first | self.second | self.third
+        self.assertEqual([self.first, self.second, self.third], test.commands)
+
+        test = self.first | Pipeline(commands=[self.second, self.third])
+        self.assertEqual([self.first, self.second, self.third], test.commands)
+
+        with self.assertRaises(TypeError):
+            _ = self.first | "grep t"
+
+    def test_wait(self):
+        test = self.first | self.second | self.third
+
+        self.assertEqual(["TWO", "THREE"], test.wait(capture_output=True))
+        self.assertEqual([0, 0, 0], test.return_codes)
+        self.assertEqual(0, self.third.return_code)
+
+        test = self.first | TerminalCommand("grep four") | self.third
+        self.assertEqual([], test.wait(capture_output=True))
+        self.assertEqual([0, 1, 0], test.return_codes)
+
+    def test_wait_large_stream(self):
+        test = TerminalCommand("seq 1 200000") | TerminalCommand("wc -l")
+        self.assertEqual(["200000"], [i.strip() for i in test.wait(capture_output=True)])
+
+    @patch("gerund.commands.pipeline.HostLimiter")
+    def test_wait_remote_slots(self, mock_host_limiter):
+        remote = TerminalCommand("cat", ip_address="123456")
+        remote._compile_command = lambda **kwargs: "cat"
+        test = self.first | remote
+
+        self.assertEqual(["one", "two", "three"], test.wait(capture_output=True))
+        mock_host_limiter.return_value.acquire.assert_called_once_with(ip_address="123456")
+
+    @patch("gerund.commands.pipeline.HostLimiter")
+    def test_wait_remote_slots_distinct_hosts(self, mock_host_limiter):
+        stages = [TerminalCommand("cat", ip_address=ip_address) for ip_address in ["b", "a", "b"]]
+        for stage in stages:
+            stage._compile_command = lambda **kwargs: "cat"
+
+        (self.first | Pipeline(commands=stages)).wait(capture_output=True)
+        self.assertEqual(["a", "b"], [call[1]["ip_address"] for call in
+                                      mock_host_limiter.return_value.acquire.call_args_list])
+
+    def test_wait_start_failure(self):
+        first = TerminalCommand("sleep 30")
+        test = first | TerminalCommand("cat") | TerminalCommand("cat")
+        test.commands[2]._start = lambda **kwargs: (_ for _ in ()).throw(OSError("cannot start"))
+
+        with self.assertRaises(OSError):
+            test.wait()
+        self.assertEqual(True, first.process.poll() is not None)
+        self.assertEqual(True, test.commands[1].process.poll() is not None)
+
+
+    @patch("gerund.components.remote_environment.Popen")
+    @patch("gerund.commands.terminal_command.Popen")
+    def test_wait_remote_environment(self, mock_popen, mock_upload_popen):
+        mock_popen.return_value.returncode = 0
+        mock_upload_popen.return_value.returncode = 0
+        HostLimiter(default_limit=1)
+        test = Pipeline(commands=[TerminalCommand("cat", ip_address="123456", environment_variables={"A": "1"})])
+
+        # the upload of the environment variables needs the only slot of the server so it cannot wait for the stage
+        thread = threading.Thread(target=test.wait, daemon=True)
+        thread.start()
+        thread.join(timeout=5)
+        self.assertEqual(False, thread.is_alive())
+        mock_upload_popen.return_value.communicate.assert_called_once_with(b"export A=1\n")
+        self.assertEqual([0], test.return_codes)
+
+
+if __name__ == "__main__":
+    main()
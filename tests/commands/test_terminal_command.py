@@ -1,9 +1,20 @@
+import os
 import pathlib
+import shutil
+import tempfile
+import threading
+import time
 from unittest import main, TestCase
 from unittest.mock import patch
 
 from gerund.commands.terminal_command import TerminalCommand
+from gerund.components.builtin_step import BuiltinStep
+from gerund.components.fail_fast import FailFast
+from gerund.components.variable import Variable
 from gerund.components.local_variable_storage import Singleton, LocalVariableStorage
+from gerund.components.remote_environment import RemoteEnvironment
+from gerund.components.result_cache import ResultCache
+from gerund.enums import Compression
 
 
 class TestTerminalCommand(TestCase):
@@ -68,12 +79,28 @@ class TestTerminalCommand(TestCase):
 
         self.assertEqual("<class 'int'> is not supported for a command", str(error.exception))
 
+    def test__resolve_variables(self):
+        self.test.environment_variables = self.env_vars
+        self.assertEqual({"ONE": "1", "TWO": "two", "THREE": "3"}, self.test._resolve_variables())
+
+        self.test.environment_variables["FOUR"] = "=>FOUR"
+        self.test.environment_variables["FIVE"] = "=>FOUR"
+        with patch("gerund.commands.terminal_command.Variable", wraps=Variable) as mock_variable:
+            self.assertEqual({"ONE": "1", "TWO": "two", "THREE": "3", "FOUR": "four", "FIVE": "four"},
+                             self.test._resolve_variables())
+            self.assertEqual(4, mock_variable.call_count)
+
+        self.test.environment_variables = None
+        self.assertEqual({}, self.test._resolve_variables())
+
     def test__process_variables(self):
         self.test.environment_variables = self.env_vars
-        self.assertEqual('export ONE="1" && export TWO="two" && export THREE="3"', self.test._process_variables())
+        self.assertEqual("export ONE=1\nexport TWO=two\nexport THREE=3\n", self.test._process_variables())
 
         self.test.environment_variables["FOUR"] = "=>FOUR"
-        self.assertEqual('export ONE="1" && export TWO="two" && export THREE="3" && export FOUR="four"',
+        self.test.environment_variables["QUOTES"] = "it's \"quoted\" $HOME"
+        self.assertEqual("export ONE=1\nexport TWO=two\nexport THREE=3\nexport FOUR=four\n"
+                         "export QUOTES='it'\"'\"'s \"quoted\" $HOME'\n",
                          self.test._process_variables())
 
         self.test.environment_variables = None
@@ -91,8 +118,7 @@ class TestTerminalCommand(TestCase):
 
     def test__compile_command(self):
         test = TerminalCommand("test", environment_variables=self.env_vars)
-        expected_outcome = 'export ONE="1" && export TWO="two" && export THREE="3" && test'
-        self.assertEqual(expected_outcome, test._compile_command())
+        self.assertEqual("test", test._compile_command())
 
         test = TerminalCommand("test", environment_variables=None)
         expected_outcome = 'test'
@@ -103,8 +129,9 @@ class TestTerminalCommand(TestCase):
         self.assertEqual(expected_outcome, test._compile_command())
 
         test = TerminalCommand("test", environment_variables=self.env_vars, ip_address=self.ip_address)
-        expected_outcome = """ssh -A -o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null ubuntu@123456 ' export ONE="1" && export """
-        expected_outcome += """TWO="two" && export THREE="3" && test '"""
+        env_path = RemoteEnvironment.path_for(block="export ONE=1\nexport TWO=two\nexport THREE=3\n")
+        expected_outcome = "ssh -A -o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null ubuntu@123456 ' "
+        expected_outcome += f". {env_path} && test '"
         self.assertEqual(expected_outcome, test._compile_command())
 
         test = TerminalCommand("test", environment_variables=None, ip_address=self.ip_address)
@@ -125,6 +152,61 @@ class TestTerminalCommand(TestCase):
         expected_outcome = "ssh -A -o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null -i './key.pem' SomeUser@123456 ' test '"
         self.assertEqual(expected_outcome, test._compile_command())
 
+    @patch("gerund.commands.terminal_command.RemoteEnvironment")
+    @patch("gerund.commands.terminal_command.Popen")
+    def test_wait_environment(self, mock_p_open, mock_remote_environment):
+        mock_remote_environment.build_block = RemoteEnvironment.build_block
+        mock_remote_environment.path_for = RemoteEnvironment.path_for
+
+        test = TerminalCommand("test", environment_variables=self.env_vars)
+        test.wait()
+        env = mock_p_open.call_args[1]["env"]
+        self.assertEqual(("1", "two", "3"), (env["ONE"], env["TWO"], env["THREE"]))
+        self.assertEqual(os.environ.get("PATH"), env["PATH"])
+        mock_remote_environment.return_value.upload.assert_not_called()
+
+        test = TerminalCommand("test", environment_variables=self.env_vars, ip_address=self.ip_address)
+        test.wait()
+        self.assertEqual(None, mock_p_open.call_args[1]["env"])
+        mock_remote_environment.return_value.upload.assert_called_once_with(
+            block="export ONE=1\nexport TWO=two\nexport THREE=3\n", ip_address=self.ip_address, username="ubuntu",
+            key=None
+        )
+
+    def test__compile_command_compression(self):
+        test = TerminalCommand("test", ip_address=self.ip_address, compression="ssh")
+        expected_outcome = "ssh -A -C -o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null ubuntu@123456 ' test '"
+        self.assertEqual(expected_outcome, test._compile_command())
+
+        test = TerminalCommand("test", ip_address=self.ip_address, compression=Compression.GZIP)
+        expected_outcome = "ssh -A -o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null ubuntu@123456 ' "
+        expected_outcome += "set -o pipefail; ( test ) | gzip -c '"
+        self.assertEqual(expected_outcome, test._compile_command())
+
+        test = TerminalCommand("test", compression=Compression.GZIP)
+        self.assertEqual("test", test._compile_command())
+
+        with self.assertRaises(ValueError):
+            TerminalCommand("test", compression="zip")
+
+    @patch("gerund.commands.terminal_command.sys")
+    def test_wait_gzip(self, mock_sys):
+        test = TerminalCommand("test", ip_address=self.ip_address, compression=Compression.GZIP)
+        test._compile_command = lambda **kwargs: "printf 'one\\ntwo\\n' | gzip -c"
+
+        self.assertEqual(['one', 'two'], test.wait(capture_output=True))
+        self.assertEqual(None, test.wait())
+        written = b"".join(i[0][0] for i in mock_sys.stdout.buffer.write.call_args_list)
+        self.assertEqual(b"one\ntwo\n", written)
+
+        with self.assertRaises(ValueError) as error:
+            test.wait(capture_output=True, merge_stderr=True)
+        self.assertEqual("merge_stderr is not supported with gzip compression", str(error.exception))
+
+        pipeline = test | TerminalCommand("grep two")
+        self.assertEqual(['two'], pipeline.wait(capture_output=True))
+        self.assertEqual([0, 0], pipeline.return_codes)
+
     def test_wait(self):
         test = TerminalCommand(f"python {self.filepath}/run_test.py", environment_variables=self.env_vars)
         self.assertEqual(['1', 'two'], test.wait(capture_output=True))
@@ -136,13 +218,147 @@ class TestTerminalCommand(TestCase):
                                environment_variables=self.env_vars)
         self.assertEqual(['1', 'two', 'test'], test.wait(capture_output=True))
 
+    def test_wait_stderr(self):
+        test = TerminalCommand(["echo 'one'", "sleep 0.05", "echo 'two' 1>&2", "sleep 0.05", "echo 'three'"])
+
+        self.assertEqual(['one', 'three'], test.wait(capture_output=True, capture_stderr=True))
+        self.assertEqual(['two'], test.output.stderr)
+        self.assertEqual(['[stdout] one', '[stderr] two', '[stdout] three'], test.output.interleaved(tagged=True))
+
+        self.assertEqual(['one', 'two', 'three'], test.wait(capture_output=True, merge_stderr=True))
+        self.assertEqual([], test.output.stderr)
+
+    def test_wait_on_line(self):
+        lines = []
+        test = TerminalCommand([BuiltinStep.echo(value="zero"), "echo 'one'", "sleep 0.2", "echo 'two'"],
+                               on_line=lines.append)
+        self.assertEqual(['zero', 'one', 'two'], test.wait(capture_output=True))
+        self.assertEqual(['zero', 'one', 'two'], [line.text for line in lines])
+        # the lines are passed on as they are read and not once the command has finished
+        self.assertEqual(True, lines[2].timestamp - lines[1].timestamp >= 0.15)
+
+        directory = tempfile.mkdtemp()
+        for _ in range(2):
+            lines = []
+            test = TerminalCommand("echo 'one'", cache=ResultCache(path=directory), on_line=lines.append)
+            self.assertEqual(['one'], test.wait(capture_output=True))
+            self.assertEqual(['one'], [line.text for line in lines])
+        shutil.rmtree(directory)
+
+    def test_wait_input(self):
+        test = TerminalCommand("sort -n | tail -n 2", input=(f"{i}\n".encode() for i in range(100000, 0, -1)))
+        self.assertEqual(['99999', '100000'], test.wait(capture_output=True))
+
+        test = TerminalCommand(["read line", "test \"$line\" = gerund"], input=b"gerund\n")
+        test.wait()
+        self.assertEqual(0, test.return_code)
+
+        cache = ResultCache(path=tempfile.mkdtemp())
+        test = TerminalCommand("cat", input=[b"one\n"], cache=cache)
+        self.assertEqual(['one'], test.wait(capture_output=True))
+        self.assertEqual([], os.listdir(cache.path))
+        shutil.rmtree(cache.path)
+
+        test = TerminalCommand("cat", ip_address="123456", compression="gzip", input=b"one")
+        with self.assertRaises(ValueError):
+            test.wait()
+
+    def test_terminate(self):
+        fail_fast = FailFast()
+        test = TerminalCommand("sleep 30 & sleep 30; echo done", fail_fast=fail_fast)
+        timer = threading.Timer(0.2, fail_fast.cancel)
+        timer.start()
+
+        start = time.time()
+        self.assertEqual([], test.wait(capture_output=True))
+        self.assertEqual(True, time.time() - start < 5)
+        self.assertEqual(-15, test.return_code)
+        self.assertEqual(True, fail_fast.was_terminated(command=test))
+
+    @patch("gerund.commands.terminal_command.Popen")
+    def test_terminate_remote(self, mock_popen):
+        test = TerminalCommand("sleep 30", ip_address="123456", fail_fast=FailFast())
+        test._open_process(compiled_command="ssh -A ubuntu@123456 ' sleep 30 '")
+        self.assertEqual(f"ssh -A ubuntu@123456 ' : gerund-run-{test._run_id}; sleep 30 '",
+                         mock_popen.call_args_list[0][0][0])
+
+        mock_popen.return_value.poll.return_value = 0
+        test.terminate()
+        self.assertEqual(True, f'pgrep -f "[g]erund-run-{test._run_id}"' in mock_popen.call_args_list[1][0][0])
+
+    def test_wait_admission(self):
+        test = TerminalCommand("echo 1", memory="64", cpus=0.5)
+        self.assertEqual(["1"], test.wait(capture_output=True))
+        self.assertEqual((64, 0.5), (test.memory, test.cpus))
+        self.assertEqual(True, test.queue_seconds is not None)
+        self.assertEqual(None, TerminalCommand("echo 1").queue_seconds)
+
+    def test_wait_working_directory(self):
+        test = TerminalCommand("ls", working_directory=str(self.filepath))
+        self.assertEqual(True, "run_test.py" in test.wait(capture_output=True))
+
     @patch("gerund.commands.terminal_command.Popen")
     def test_wait_none_capture(self, mock_p_open):
         test = TerminalCommand(f"python {self.filepath}/run_test.py")
         self.assertEqual(None, test.wait())
-        mock_p_open.assert_called_once_with(f"python {self.filepath}/run_test.py", shell=True)
+        mock_p_open.assert_called_once_with(f"python {self.filepath}/run_test.py", shell=True, cwd=None,
+                                            start_new_session=False, env=None)
         mock_p_open.return_value.wait.assert_called_once_with()
 
+    def test_wait_builtins(self):
+        directory = tempfile.mkdtemp()
+        steps = [BuiltinStep.mkdir(path="runs/1"), BuiltinStep.cd(path="runs"), BuiltinStep.export(variables={"RUN": "1"}),
+                 BuiltinStep.echo(value="{=>FOUR}")]
+
+        with patch("gerund.commands.terminal_command.Popen") as mock_p_open:
+            test = TerminalCommand(steps, working_directory=directory)
+            self.assertEqual(["four"], test.wait(capture_output=True))
+            self.assertEqual(0, test.return_code)
+            mock_p_open.assert_not_called()
+
+        test = TerminalCommand(steps + ["ls", "echo $RUN", BuiltinStep.echo(value="done")], working_directory=directory)
+        self.assertEqual(["four", "1", "1", "done"], test.wait(capture_output=True))
+        self.assertEqual('ls && echo $RUN && printf "%s\\n" "done"', test._compile_command())
+
+        test = TerminalCommand([BuiltinStep.cd(path="missing"), "echo never"], working_directory=directory)
+        self.assertEqual([], test.wait(capture_output=True))
+        self.assertEqual(1, test.return_code)
+        shutil.rmtree(directory)
+
+        test = TerminalCommand([BuiltinStep.cd(path="runs"), "make"], ip_address=self.ip_address)
+        expected_outcome = "ssh -A -o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null ubuntu@123456 ' "
+        expected_outcome += 'cd "runs" && make \''
+        self.assertEqual(expected_outcome, test._compile_command())
+
+    @patch("gerund.commands.terminal_command.print")
+    def test_wait_cache(self, mock_print):
+        directory = tempfile.mkdtemp()
+        test = TerminalCommand("echo 'test' && echo $ONE", environment_variables=self.env_vars,
+                               cache=ResultCache(path=directory))
+
+        self.assertEqual(['test', '1'], test.wait(capture_output=True))
+        self.assertEqual(0, test.return_code)
+        self.assertEqual(1, len(os.listdir(directory)))
+
+        test = TerminalCommand("echo 'test' && echo $ONE", environment_variables=self.env_vars,
+                               cache=ResultCache(path=directory))
+
+        with patch.object(TerminalCommand, "_execute") as mock__execute:
+            self.assertEqual(['test', '1'], test.wait(capture_output=True))
+            self.assertEqual(None, test.wait())
+            mock__execute.assert_not_called()
+
+        self.assertEqual(0, test.return_code)
+        mock_print.assert_any_call('test')
+        mock_print.assert_any_call('1')
+
+        # the same command run in another directory is not replayed
+        test = TerminalCommand("echo 'test' && echo $ONE", environment_variables=self.env_vars,
+                               cache=ResultCache(path=directory), working_directory=directory)
+        self.assertEqual(['test', '1'], test.wait(capture_output=True))
+        self.assertEqual(2, len(os.listdir(directory)))
+        shutil.rmtree(directory)
+
     def test_process_attribute(self):
         self.test._process = "test"
         self.assertEqual("test", self.test.process)
@@ -0,0 +1,77 @@
+import shutil
+import tempfile
+import threading
+import time
+from unittest import main, TestCase
+
+from gerund.components.admission_controller import AdmissionController
+from gerund.components.variable_map import Singleton
+
+
+class TestAdmissionController(TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.write_proc(load=0.5, total_kb=4096 * 1024, available_kb=3072 * 1024)
+        self.test = AdmissionController(memory_headroom_mb=512, max_load=4, poll_interval=0.01,
+                                        proc_path=self.directory)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.directory)
+        Singleton._instances = {}
+
+    def write_proc(self, load: float, total_kb: int, available_kb: int) -> None:
+        with open(f"{self.directory}/loadavg", "w") as file:
+            file.write(f"{load} 0.40 0.30 2/72 13939\n")
+        with open(f"{self.directory}/meminfo", "w") as file:
+            file.write(f"MemTotal:       {total_kb} kB\nMemFree:        1024 kB\nMemAvailable:   {available_kb} kB\n")
+
+    def test_read(self):
+        self.assertEqual(0.5, self.test.read_load())
+        self.assertEqual((4096, 3072), self.test.read_memory())
+
+        self.test.proc_path = f"{self.directory}/missing"
+        self.assertEqual(0.0, self.test.read_load())
+        self.assertEqual(None, self.test.read_memory())
+
+    def test__fits(self):
+        memory = (4096, 3072)
+        self.assertEqual(True, self.test._fits(memory_mb=100000, cpus=64, load=100, memory=memory))
+
+        self.test._running = 1
+        self.test._reserved_memory_mb = 1024
+        self.test._reserved_cpus = 2
+        self.assertEqual(True, self.test._fits(memory_mb=2560, cpus=2, load=0.5, memory=memory))
+        self.assertEqual(False, self.test._fits(memory_mb=2561, cpus=2, load=0.5, memory=memory))
+        self.assertEqual(False, self.test._fits(memory_mb=0, cpus=2.5, load=0.5, memory=memory))
+        self.assertEqual(False, self.test._fits(memory_mb=0, cpus=1, load=3.5, memory=memory))
+        self.assertEqual(True, self.test._fits(memory_mb=100000, cpus=1, load=0.5, memory=None))
+
+    def test_admit(self):
+        order = []
+
+        def task(name: str, memory_mb: int) -> None:
+            with self.test.admit(memory_mb=memory_mb, cpus=1, name=name):
+                order.append(name)
+                time.sleep(0.3)
+
+        with self.test.admit(memory_mb=2000, cpus=1, name="first") as admission:
+            self.assertEqual(("first", 2000, 1), admission[:3])
+            threads = [threading.Thread(target=task, args=(name, memory_mb))
+                       for name, memory_mb in [("small", 100), ("large", 1800), ("medium", 1500)]]
+            for thread in threads:
+                thread.start()
+            time.sleep(0.05)
+            # only the small task fits next to the first task
+            self.assertEqual(["small"], order)
+
+        for thread in threads:
+            thread.join()
+        self.assertEqual(["small", "large", "medium"], order)
+        self.assertEqual(["first", "small", "large", "medium"], [i.name for i in self.test.history])
+        self.assertEqual(True, self.test.history[2].wait_seconds > 0.04)
+        self.assertEqual((0, 0.0, 0), (self.test._reserved_memory_mb, self.test._reserved_cpus, self.test._running))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import os
+import shutil
+import subprocess
+import tempfile
+from unittest import main, TestCase
+
+from gerund.components.builtin_step import BuiltinStep
+from gerund.components.local_variable_storage import LocalVariableStorage, Singleton
+
+
+class TestBuiltinStep(TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        LocalVariableStorage().update({"one": "1"})
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.directory)
+        Singleton._instances = {}
+
+    def test___init__(self):
+        with self.assertRaises(ValueError):
+            BuiltinStep(kind="rm", path="data")
+        with self.assertRaises(ValueError):
+            BuiltinStep.cd(path="")
+        with self.assertRaises(ValueError):
+            BuiltinStep.export(variables={"NOT-VALID": "1"})
+
+    def test_from_config(self):
+        self.assertEqual(BuiltinStep.cd(path="build"), BuiltinStep.from_config(step={"cd": "build"}))
+        self.assertEqual(BuiltinStep.export(variables={"ONE": "1"}), BuiltinStep.from_config(step={"export": {"ONE": 1}}))
+        self.assertEqual(BuiltinStep.write(path="out.txt", value="{=>one}", append=True),
+                         BuiltinStep.from_config(step={"write": {"path": "out.txt", "value": "{=>one}", "append": True}}))
+        with self.assertRaises(ValueError):
+            BuiltinStep.from_config(step={"cd": "build", "echo": "two keys"})
+
+    def test_parse_line(self):
+        self.assertEqual({"echo": "hello there"}, BuiltinStep.parse_line(line="echo hello there"))
+        self.assertEqual({"export": {"NAME": "a=b"}}, BuiltinStep.parse_line(line="export NAME=a=b"))
+        self.assertEqual({"write": {"path": "out.txt", "value": "{=>one} two"}},
+                         BuiltinStep.parse_line(line="write out.txt {=>one} two"))
+
+    def test_fold(self):
+        cd, echo = BuiltinStep.cd(path="build"), BuiltinStep.echo(value="done")
+        self.assertEqual([[cd, "make"], ["make test", echo]], BuiltinStep.fold(steps=[cd, "make", "make test", echo]))
+        self.assertEqual([[cd, echo]], BuiltinStep.fold(steps=[cd, echo]))
+
+    def test_to_shell(self):
+        step = BuiltinStep.echo(value="it's $HOME")
+        self.assertEqual('printf "%s\\n" "it\'s \\$HOME"', step.to_shell())
+        self.assertEqual('printf "%s\\n" "it\'\\\'\'s \\$HOME"', step.to_shell(remote=True))
+        self.assertEqual('mkdir -p ~/"runs/a b"', BuiltinStep.mkdir(path="~/runs/a b").to_shell())
+        self.assertEqual('export A="1" B="two"', BuiltinStep.export(variables={"A": "1", "B": "two"}).to_shell())
+
+        # the shell gives the same result as running the steps in Python
+        for step in [BuiltinStep.echo(value="it's $HOME"), BuiltinStep.write(path="out.txt", value='"quoted" `x`')]:
+            shell = subprocess.run(step.to_shell(), shell=True, cwd=self.directory, capture_output=True)
+            directory, line = step.run(working_directory=self.directory, environment={})
+            self.assertEqual(self.directory, directory)
+            if line is not None:
+                self.assertEqual(shell.stdout.decode(), line + "\n")
+        with open(f"{self.directory}/out.txt", "r") as file:
+            self.assertEqual('"quoted" `x`\n', file.read())
+
+    def test_run(self):
+        environment = {}
+        steps = [BuiltinStep.mkdir(path="a/b"), BuiltinStep.cd(path="a"), BuiltinStep.export(variables={"ONE": "{=>one}"}),
+                 BuiltinStep.write(path="b/value.txt", value="{=>one}"),
+                 BuiltinStep.write(path="b/value.txt", value="2", append=True)]
+        directory = self.directory
+        for step in steps:
+            directory, line = step.run(working_directory=directory, environment=environment)
+            self.assertEqual(None, line)
+
+        self.assertEqual(f"{self.directory}/a", directory)
+        self.assertEqual({"ONE": "1"}, environment)
+        with open(f"{self.directory}/a/b/value.txt", "r") as file:
+            self.assertEqual("1\n2\n", file.read())
+        self.assertEqual((directory, "1"), BuiltinStep.echo(value="{=>one}").run(working_directory=directory,
+                                                                                  environment=environment))
+        with self.assertRaises(ValueError):
+            BuiltinStep.cd(path="missing").run(working_directory=directory, environment=environment)
+        self.assertEqual(True, os.path.isdir(f"{self.directory}/a/b"))
+
+
+if __name__ == "__main__":
+    main()
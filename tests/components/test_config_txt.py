@@ -44,6 +44,18 @@ class TestConfigTxt(TestCase):
         test.read()
         self.assertEqual(self.data_structure, test.data_structure)
 
+    def test_matrix(self):
+        self.test.path = CONFIG_PATH.replace("gerund.txt", "matrix.txt")
+        self.assertEqual(None, self.test.matrix)
+        self.test.read()
+        self.assertEqual({"peril": "wind,flood", "chunk": "1,2", "exclude": "peril:flood,chunk:2",
+                          "include": "peril:quake,chunk:1", "max_workers": "2"}, self.test.matrix)
+
+        self.test.write(f"{FILE_PATH}/output.txt")
+        test = ConfigTxt(path=f"{FILE_PATH}/output.txt")
+        test.read()
+        self.assertEqual(self.test.data_structure, test.data_structure)
+
     def test_properties(self):
         self.test.read()
         self.assertEqual(self.data_structure['[vars]'], self.test.vars)
@@ -0,0 +1,111 @@
+import io
+import os
+import shlex
+import shutil
+import subprocess
+import tarfile
+import tempfile
+from unittest import main, TestCase
+from unittest.mock import MagicMock, patch
+
+from gerund.components.delta_sync import DeltaSync
+from gerund.components.local_variable_storage import Singleton
+
+
+class TestDeltaSync(TestCase):
+
+    def setUp(self) -> None:
+        self.local_directory = tempfile.mkdtemp()
+        self.manifest_directory = tempfile.mkdtemp()
+        os.makedirs(f"{self.local_directory}/data")
+        for path, content in [("model.py", "print(1)\n"), ("data/input.csv", "a,b\n1,2\n")]:
+            with open(f"{self.local_directory}/{path}", "w") as file:
+                file.write(content)
+        self.test = DeltaSync(local_directory=self.local_directory, remote_directory="inputs",
+                              ip_address="123456", manifest_directory=self.manifest_directory)
+        self.streams = []
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.local_directory)
+        shutil.rmtree(self.manifest_directory)
+        Singleton._instances = {}
+
+    def mock_process(self, return_code: int = 0) -> MagicMock:
+        stream = io.BytesIO()
+        stream.close = lambda: None
+        self.streams.append(stream)
+        process = MagicMock()
+        process.stdin = stream
+        process.returncode = return_code
+        return process
+
+    def sent_files(self, index: int) -> dict:
+        self.streams[index].seek(0)
+        with tarfile.open(fileobj=self.streams[index], mode="r:gz") as archive:
+            return {member.name: archive.extractfile(member).read().decode() for member in archive.getmembers()}
+
+    def test_compare(self):
+        local = {"a": {"sha256": "1"}, "b": {"sha256": "2"}, "c": {"sha256": "3"}}
+        remote = {"a": {"sha256": "1"}, "b": {"sha256": "0"}, "d": {"sha256": "4"}}
+        self.assertEqual((["b", "c"], ["d"]), DeltaSync.compare(local=local, remote=remote))
+
+    def test_build_manifest(self):
+        manifest = self.test.build_manifest()
+        self.assertEqual(["data/input.csv", "model.py"], sorted(manifest.keys()))
+        self.assertEqual(9, manifest["model.py"]["size"])
+
+        previous = {"model.py": {**manifest["model.py"], "sha256": "cached"}}
+        self.assertEqual("cached", self.test.build_manifest(previous=previous)["model.py"]["sha256"])
+
+    @patch("gerund.components.delta_sync.Popen")
+    def test_sync(self, mock_popen):
+        mock_popen.side_effect = lambda *args, **kwargs: self.mock_process()
+
+        result = self.test.sync()
+        self.assertEqual((2, 17, 0, 0), result[:4])
+        self.assertEqual({"model.py": "print(1)\n", "data/input.csv": "a,b\n1,2\n"}, self.sent_files(index=0))
+        command = mock_popen.call_args[0][0]
+        self.assertEqual(True, command.startswith("ssh -o StrictHostKeyChecking=no"))
+        self.assertEqual(True, "ubuntu@123456 'mkdir -p inputs && cd inputs && tar -xzf - &&" in command)
+
+        result = self.test.sync()
+        self.assertEqual((0, 0, 0, 2), result[:4])
+        self.assertEqual(1, mock_popen.call_count)
+
+        with open(f"{self.local_directory}/model.py", "w") as file:
+            file.write("print(2)\n")
+        os.remove(f"{self.local_directory}/data/input.csv")
+        self.test.delete = True
+        result = self.test.sync()
+        self.assertEqual((1, 9, 1, 0), result[:4])
+        self.assertEqual({"model.py": "print(2)\n", ".gerund-delete": "data/input.csv\n"}, self.sent_files(index=1))
+
+        self.assertEqual((1, 9, 0, 0), self.test.sync(force=True)[:4])
+
+    def test_quote_remote_directory(self):
+        self.test.remote_directory = "~/my inputs/it's"
+        quoted = self.test._quote_remote_directory()
+        # the ssh command wraps the remote command in single quotes which the local shell removes
+        printed = subprocess.check_output(f"printf '%s' '{quoted}'", shell=True).decode()
+        self.assertEqual(printed, "~/" + shlex.quote("my inputs/it's"))
+
+        self.test.remote_directory = "~"
+        self.assertEqual("~/", self.test._quote_remote_directory())
+
+    @patch("gerund.components.delta_sync.Popen")
+    def test_sync_failure(self, mock_popen):
+        mock_popen.side_effect = lambda *args, **kwargs: self.mock_process(return_code=255)
+
+        with self.assertRaises(ValueError) as error:
+            self.test.sync()
+        self.assertEqual(f"sync of {self.local_directory} to 123456:inputs failed with exit code 255",
+                         str(error.exception))
+        self.assertEqual({}, self.test.load_remote_manifest())
+
+        with self.assertRaises(ValueError):
+            DeltaSync(local_directory=f"{self.local_directory}/missing", remote_directory="inputs",
+                      ip_address="123456")
+
+
+if __name__ == "__main__":
+    main()
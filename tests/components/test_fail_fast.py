@@ -0,0 +1,59 @@
+import threading
+from unittest import main, TestCase
+from unittest.mock import MagicMock
+
+from gerund.components.fail_fast import FailFast
+
+
+class TestFailFast(TestCase):
+
+    def test___init__(self):
+        self.assertEqual(0, FailFast().max_failures)
+        with self.assertRaises(ValueError) as error:
+            FailFast(max_failures=-1)
+        self.assertEqual("max_failures cannot be negative not -1", str(error.exception))
+
+    def test_record(self):
+        test = FailFast(max_failures=1)
+        running = MagicMock()
+        finished = MagicMock()
+        test.register(command=running)
+        test.register(command=finished)
+        test.unregister(command=finished)
+
+        self.assertEqual(False, test.record(failed=False))
+        self.assertEqual(False, test.record(failed=True))
+        running.terminate.assert_not_called()
+
+        self.assertEqual(True, test.record(failed=True))
+        self.assertEqual(2, test.failures)
+        running.terminate.assert_called_once_with()
+        finished.terminate.assert_not_called()
+        self.assertEqual(True, test.was_terminated(command=running))
+        self.assertEqual(False, test.was_terminated(command=finished))
+
+        test.record(failed=True)
+        running.terminate.assert_called_once_with()
+
+    def test_cancel(self):
+        test = FailFast(max_failures=5)
+        running = MagicMock()
+        test.register(command=running)
+        test.cancel()
+        self.assertEqual(True, test.cancelled)
+        running.terminate.assert_called_once_with()
+
+    def test_cancel_concurrent(self):
+        test = FailFast()
+        barrier = threading.Barrier(3, timeout=5)
+        commands = [MagicMock(terminate=barrier.wait) for _ in range(3)]
+        for command in commands:
+            test.register(command=command)
+
+        # every terminate waits for the others so this only returns if they run at the same time
+        test.cancel()
+        self.assertEqual([True] * 3, [test.was_terminated(command=command) for command in commands])
+
+
+if __name__ == "__main__":
+    main()
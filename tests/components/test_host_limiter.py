@@ -0,0 +1,74 @@
+from threading import Lock, Thread
+from time import sleep
+from unittest import main, TestCase
+
+from gerund.components.host_limiter import HostLimiter
+from gerund.components.local_variable_storage import Singleton
+
+
+class TestHostLimiter(TestCase):
+
+    def setUp(self) -> None:
+        self.test = HostLimiter()
+
+    def tearDown(self) -> None:
+        Singleton._instances = {}
+
+    def test___init__(self):
+        self.assertEqual(10, self.test.default_limit)
+        self.assertEqual(None, self.test.global_limit)
+        self.assertEqual(id(self.test), id(HostLimiter()))
+
+    def test_set_host_limit(self):
+        self.test.set_host_limit(ip_address="123456", limit=2)
+        self.assertEqual(2, self.test._get_host_semaphore(ip_address="123456")._initial_value)
+        self.assertEqual(10, self.test._get_host_semaphore(ip_address="654321")._initial_value)
+
+        self.test.set_host_limit(ip_address="123456", limit=None)
+        self.assertEqual(None, self.test._get_host_semaphore(ip_address="123456"))
+
+        with self.assertRaises(ValueError) as error:
+            self.test.set_host_limit(ip_address="123456", limit=0)
+        self.assertEqual("connection limit has to be at least 1 not 0", str(error.exception))
+
+    def test_set_default_limit(self):
+        self.test.set_host_limit(ip_address="123456", limit=2)
+        self.test._get_host_semaphore(ip_address="654321")
+        self.test.set_default_limit(limit=3)
+
+        self.assertEqual(2, self.test._get_host_semaphore(ip_address="123456")._initial_value)
+        self.assertEqual(3, self.test._get_host_semaphore(ip_address="654321")._initial_value)
+
+    def test_acquire(self):
+        self.test.set_host_limit(ip_address="123456", limit=2)
+        self.test.set_global_limit(limit=3)
+        active = {"host": 0, "total": 0, "max_host": 0, "max_total": 0}
+        lock = Lock()
+
+        def connect(ip_address: str) -> None:
+            with self.test.acquire(ip_address=ip_address):
+                with lock:
+                    active["total"] += 1
+                    active["max_total"] = max(active["max_total"], active["total"])
+                    if ip_address == "123456":
+                        active["host"] += 1
+                        active["max_host"] = max(active["max_host"], active["host"])
+                sleep(0.02)
+                with lock:
+                    if ip_address == "123456":
+                        active["host"] -= 1
+                    active["total"] -= 1
+
+        threads = [Thread(target=connect, args=("123456",)) for _ in range(6)]
+        threads += [Thread(target=connect, args=("654321",)) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(2, active["max_host"])
+        self.assertEqual(3, active["max_total"])
+
+
+if __name__ == "__main__":
+    main()
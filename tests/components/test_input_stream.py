@@ -0,0 +1,65 @@
+import io
+import os
+from unittest import main, TestCase
+
+from gerund.components.input_stream import CHUNK_SIZE, InputStream
+
+
+class TestInputStream(TestCase):
+
+    def setUp(self) -> None:
+        self.read_fd, self.write_fd = os.pipe()
+        os.set_blocking(self.write_fd, False)
+        self.pipe = os.fdopen(self.write_fd, "wb", buffering=0)
+
+    def tearDown(self) -> None:
+        if not self.pipe.closed:
+            self.pipe.close()
+        os.close(self.read_fd)
+
+    def read_all(self) -> bytes:
+        chunks = []
+        for chunk in iter(lambda: os.read(self.read_fd, 65536), b""):
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    def test_write(self):
+        test = InputStream(data=b"one\ntwo\n")
+        self.assertEqual(False, test.write(pipe=self.pipe))
+        test.close(pipe=self.pipe)
+        self.assertEqual((b"one\ntwo\n", 8, True), (self.read_all(), test.written, test.closed))
+
+    def test_write_sources(self):
+        for data in [io.BytesIO(b"one\ntwo\n"), [b"one\n", "two\n"], (i for i in [b"one\n", b"two\n"])]:
+            chunks = list(InputStream._iterate(data=data))
+            self.assertEqual(b"one\ntwo\n", b"".join(chunk.encode() if isinstance(chunk, str) else chunk
+                                                    for chunk in chunks))
+        self.assertEqual(3, len(list(InputStream._iterate(data=b"x" * (CHUNK_SIZE * 2 + 1)))))
+
+        with self.assertRaises(ValueError):
+            InputStream(data="one")
+
+    def test_write_backpressure(self):
+        pulled = []
+
+        def chunks():
+            for i in range(1000):
+                pulled.append(i)
+                yield b"x" * CHUNK_SIZE
+
+        test = InputStream(data=chunks())
+        self.assertEqual(True, test.write(pipe=self.pipe))
+        # only the chunks the pipe had room for were pulled from the source
+        self.assertEqual(True, len(pulled) < 50)
+        self.assertEqual(True, test.written <= len(pulled) * CHUNK_SIZE)
+
+    def test_write_broken_pipe(self):
+        os.close(self.read_fd)
+        self.read_fd = os.open(os.devnull, os.O_RDONLY)
+        test = InputStream(data=b"data")
+        self.assertEqual(False, test.write(pipe=self.pipe))
+        self.assertEqual(0, test.written)
+
+
+if __name__ == "__main__":
+    main()
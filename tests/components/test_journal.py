@@ -0,0 +1,92 @@
+import json
+import shutil
+import tempfile
+from unittest import main, TestCase
+
+from gerund.commands.terminal_command import TerminalCommand
+from gerund.components.journal import Journal
+from gerund.components.local_variable_storage import Singleton
+
+
+class TestJournal(TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.path = f"{self.directory}/run/gerund.journal"
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.directory)
+        Singleton._instances = {}
+
+    def read_entries(self) -> list:
+        with open(self.path, "r") as file:
+            return [json.loads(line) for line in file]
+
+    def test_build_key(self):
+        key = Journal.build_key(previous="a.yml", command="echo 1", environment_variables={"one": "1"})
+        self.assertEqual(64, len(key))
+        self.assertEqual(key, Journal.build_key(previous="a.yml", command="echo 1",
+                                                environment_variables={"one": "1"}))
+        self.assertNotEqual(key, Journal.build_key(previous="b.yml", command="echo 1",
+                                                   environment_variables={"one": "1"}))
+        self.assertNotEqual(key, Journal.build_key(previous="a.yml", command="echo 1",
+                                                   environment_variables={"one": "2"}))
+        self.assertNotEqual(key, Journal.build_key(previous="a.yml", command="echo 1",
+                                                   environment_variables={"one": "1"}, ip_address="10.0.0.1"))
+
+    def test_record(self):
+        chain = Journal(path=self.path).chain(config="a.yml")
+        first = chain.build_key(command="echo 1")
+        chain.record(key=first, command="echo 1", return_code=0, seconds=0.5)
+        second = chain.build_key(command="exit 2")
+        chain.record(key=second, command="exit 2", return_code=2, seconds=0.1)
+
+        self.assertEqual([(first, 0, 0), (second, 1, 2)],
+                         [(i["key"], i["step"], i["return_code"]) for i in self.read_entries()])
+        self.assertEqual(second, Journal.build_key(previous=first, command="exit 2"))
+
+    def test_resume(self):
+        chain = Journal(path=self.path).chain(config="a.yml")
+        first = chain.build_key(command="echo 1")
+        chain.record(key=first, command="echo 1", return_code=0, seconds=0.5)
+        second = chain.build_key(command="exit 2")
+        chain.record(key=second, command="exit 2", return_code=2, seconds=0.1)
+        with open(self.path, "a") as file:
+            file.write('{"key": "cut sho')
+
+        self.assertEqual(None, Journal(path=self.path).completed(key=first))
+        resumed = Journal(path=self.path, resume=True)
+        self.assertEqual("echo 1", resumed.completed(key=first)["command"])
+        self.assertEqual(None, resumed.completed(key=second))
+
+        chain = resumed.chain(config="a.yml")
+        self.assertEqual(True, chain.completed(key=chain.build_key(command="echo 1")))
+        self.assertEqual((1, first), (chain.step, chain.previous))
+        self.assertEqual(False, chain.completed(key=chain.build_key(command="exit 2")))
+        self.assertEqual(None, Journal(path=f"{self.directory}/missing", resume=True).completed(key=first))
+
+    def test_terminal_command(self):
+        counter = f"{self.directory}/counter"
+        steps = [f"echo x >> {counter}", f"test -f {self.directory}/fixed", "echo done"]
+
+        def run() -> int:
+            chain = Journal(path=self.path, resume=True).chain(config="a.yml")
+            for step in steps:
+                command = TerminalCommand(command=step, journal=chain)
+                command.wait(capture_output=True)
+                if command.return_code != 0:
+                    break
+            return command.return_code
+
+        self.assertEqual(1, run())
+        open(f"{self.directory}/fixed", "w").close()
+        self.assertEqual(0, run())
+
+        with open(counter, "r") as file:
+            self.assertEqual("x\n", file.read())
+        self.assertEqual([0, 1, 1, 2], [i["step"] for i in self.read_entries()])
+        self.assertEqual([0, 1, 0, 0], [i["return_code"] for i in self.read_entries()])
+
+
+if __name__ == "__main__":
+    main()
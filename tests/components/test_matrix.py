@@ -0,0 +1,69 @@
+from unittest import main, TestCase
+
+from gerund.components.matrix import Matrix
+
+
+class TestMatrix(TestCase):
+
+    def setUp(self) -> None:
+        self.matrix_data = {
+            "peril": ["wind", "flood"],
+            "chunk": [1, 2],
+            "exclude": [{"peril": "flood", "chunk": 2}],
+            "include": [{"peril": "quake", "chunk": 1}, {"peril": "wind", "chunk": 1}],
+            "max_workers": 4
+        }
+
+    def test_from_config(self):
+        test = Matrix.from_config(matrix_data=self.matrix_data)
+        self.assertEqual({"peril": ["wind", "flood"], "chunk": [1, 2]}, test.axes)
+        self.assertEqual([{"peril": "flood", "chunk": 2}], test.exclude)
+        self.assertEqual(4, test.max_workers)
+        self.assertEqual(False, test.spread_cores)
+        self.assertEqual(True, Matrix.from_config(matrix_data={"chunk": [1], "spread_cores": True}).spread_cores)
+
+    def test_cells(self):
+        test = Matrix.from_config(matrix_data=self.matrix_data)
+        self.assertEqual([
+            {"peril": "wind", "chunk": 1},
+            {"peril": "wind", "chunk": 2},
+            {"peril": "flood", "chunk": 1},
+            {"peril": "quake", "chunk": 1}
+        ], test.cells)
+
+        self.assertEqual(200, len(Matrix(axes={"event": list(range(20)), "chunk": list(range(10))}).cells))
+
+    def test_parse_txt_section(self):
+        section = {"peril": "wind,flood", "chunk": "1,2", "exclude": "peril:flood,chunk:2;peril:wind",
+                   "max_workers": "2", "spread_cores": "true"}
+        self.assertEqual({
+            "peril": ["wind", "flood"],
+            "chunk": ["1", "2"],
+            "exclude": [{"peril": "flood", "chunk": "2"}, {"peril": "wind"}],
+            "max_workers": 2,
+            "spread_cores": True
+        }, Matrix.parse_txt_section(section=section))
+
+    def test_cell_name(self):
+        self.assertEqual("peril-wind_chunk-1", Matrix.cell_name(cell={"peril": "wind", "chunk": 1}))
+        self.assertEqual("path-a-b", Matrix.cell_name(cell={"path": "a/b"}))
+
+    def test_cell_names(self):
+        names = Matrix.cell_names(cells=[{"path": "a/b"}, {"path": "a b"}, {"path": "c"}, {"chunk": 1}, {"chunk": "1"}])
+        self.assertEqual("path-c", names[2])
+        self.assertEqual(5, len(set(names)))
+        for name, prefix in zip(names[:2] + names[3:], ["path-a-b-", "path-a-b-", "chunk-1-", "chunk-1-"]):
+            self.assertEqual((True, len(prefix) + 8), (name.startswith(prefix), len(name)))
+
+    def test_errors(self):
+        with self.assertRaises(ValueError) as error:
+            Matrix(axes={"chunk": [1]}, max_workers=0)
+        self.assertEqual("matrix max_workers has to be at least 1 not 0", str(error.exception))
+
+        with self.assertRaises(ValueError) as error:
+            Matrix(axes={"chunk": []})
+        self.assertEqual("matrix axis chunk needs a list of at least one value", str(error.exception))
+
+
+if __name__ == "__main__":
+    main()
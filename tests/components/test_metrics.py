@@ -0,0 +1,100 @@
+import os
+import shutil
+import tempfile
+import urllib.request
+from unittest import main, TestCase
+
+from gerund.commands.terminal_command import TerminalCommand
+from gerund.components.local_variable_storage import LocalVariableStorage, Singleton
+from gerund.components.metrics import MetricDefinition, Metrics, current_config
+from gerund.components.variable import Variable
+
+
+class TestMetrics(TestCase):
+
+    def setUp(self) -> None:
+        self.test = Metrics()
+        self.test.register(MetricDefinition("test_latency_seconds", "histogram", "Test latency.", (0.1, 1.0)))
+
+    def tearDown(self) -> None:
+        self.test.stop()
+        Singleton._instances = {}
+
+    def test_inc(self):
+        self.test.inc("gerund_commands_total", host="10.0.0.1", config="a.yml")
+        self.test.inc("gerund_commands_total", host="10.0.0.1", config="a.yml")
+        self.test.inc("gerund_output_bytes_total", 2.5, host="local", config="")
+
+        rendered = self.test.render().split("\n")
+        self.assertEqual(True, 'gerund_commands_total{config="a.yml",host="10.0.0.1"} 2' in rendered)
+        self.assertEqual(True, 'gerund_output_bytes_total{config="",host="local"} 2.5' in rendered)
+        self.assertEqual(True, "# TYPE gerund_commands_total counter" in rendered)
+
+        with self.assertRaises(ValueError):
+            self.test.inc("gerund_command_duration_seconds")
+        with self.assertRaises(ValueError):
+            self.test.inc("missing_total")
+
+    def test_observe(self):
+        for value in [0.05, 0.5, 0.5, 5.0]:
+            self.test.observe("test_latency_seconds", value, host="local")
+
+        rendered = [line for line in self.test.render().split("\n") if line.startswith("test_latency_seconds")]
+        self.assertEqual([
+            'test_latency_seconds_bucket{host="local",le="0.1"} 1',
+            'test_latency_seconds_bucket{host="local",le="1"} 3',
+            'test_latency_seconds_bucket{host="local",le="+Inf"} 4',
+            'test_latency_seconds_sum{host="local"} 6.05',
+            'test_latency_seconds_count{host="local"} 4',
+        ], rendered)
+
+    def test_disabled(self):
+        self.test.enabled = False
+        self.test.inc("gerund_commands_total", host="local")
+        self.assertEqual(False, "gerund_commands_total{" in self.test.render())
+
+    def test_config(self):
+        self.assertEqual("", current_config.get())
+        with Metrics.config(name="a.yml"):
+            self.assertEqual("a.yml", current_config.get())
+        self.assertEqual("", current_config.get())
+
+    def test_write_textfile(self):
+        directory = tempfile.mkdtemp()
+        self.test.inc("gerund_scripts_total", host="local")
+        self.test.write_textfile(path=f"{directory}/gerund.prom")
+
+        with open(f"{directory}/gerund.prom", "r") as file:
+            self.assertEqual(self.test.render(), file.read())
+        self.assertEqual(["gerund.prom"], os.listdir(directory))
+        shutil.rmtree(directory)
+
+    def test_serve(self):
+        self.test.inc("gerund_scripts_total", host="local")
+        port = self.test.serve(port=0)
+
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            self.assertEqual(200, response.status)
+            self.assertEqual(self.test.render(), response.read().decode())
+
+    def test_commands(self):
+        with Metrics.config(name="run.yml"):
+            TerminalCommand(command="echo hello").wait(capture_output=True)
+            TerminalCommand(command="exit 2").wait()
+
+        rendered = self.test.render().split("\n")
+        self.assertEqual(True, 'gerund_commands_total{config="run.yml",host="local"} 2' in rendered)
+        self.assertEqual(True, 'gerund_command_failures_total{config="run.yml",host="local"} 1' in rendered)
+        self.assertEqual(True, 'gerund_command_duration_seconds_count{config="run.yml",host="local"} 2' in rendered)
+        self.assertEqual(True, 'gerund_output_bytes_total{config="run.yml",host="local"} 6' in rendered)
+
+    def test_variables(self):
+        LocalVariableStorage().update({"one": 1})
+        self.assertEqual("1", Variable(name="=>one").value)
+
+        rendered = self.test.render().split("\n")
+        self.assertEqual(True, 'gerund_variable_resolve_seconds_count{source="local_storage"} 1' in rendered)
+
+
+if __name__ == "__main__":
+    main()
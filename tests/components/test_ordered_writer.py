@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import main, TestCase
+
+from gerund.components.ordered_writer import OrderedWriter
+
+
+class TestOrderedWriter(TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.path = f"{self.directory}/output.txt"
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.directory)
+
+    def read(self) -> str:
+        with open(self.path, "r") as file:
+            return file.read()
+
+    def test_write_in_order(self):
+        test = OrderedWriter(path=self.path)
+        test.write_lines(index=2, lines=["two"])
+        test.write_lines(index=1, lines=["one"])
+        test.write_lines(index=0, lines=["zero"])
+        self.assertEqual("zero\n", self.read())
+
+        test.finish(index=2)
+        test.finish(index=0)
+        self.assertEqual("zero\none\n", self.read())
+
+        test.write(index=1, data="one again\n")
+        self.assertEqual("zero\none\none again\n", self.read())
+        test.finish(index=1)
+        self.assertEqual("zero\none\none again\ntwo\n", self.read())
+        test.close()
+
+    def test_header(self):
+        with OrderedWriter(path=self.path, names=["a.yml", "b.yml", "c.yml"], header="==> {name} {index} <==") as test:
+            test.write_lines(index=1, lines=["b"])
+            test.finish(index=1)
+            test.write_lines(index=0, lines=["a"])
+            test.finish(index=0)
+        self.assertEqual("==> a.yml 0 <==\na\n==> b.yml 1 <==\nb\n==> c.yml 2 <==\n", self.read())
+
+    def test_write_after_finish(self):
+        with OrderedWriter(path=self.path) as test:
+            test.finish(index=0)
+            with self.assertRaises(ValueError) as error:
+                test.write(index=0, data="late")
+        self.assertEqual("task 0 has already finished", str(error.exception))
+
+    def test_concurrent_writers(self):
+        test = OrderedWriter(path=self.path, spool_directory=self.directory)
+
+        def task(index: int) -> None:
+            for line in range(50):
+                test.write_lines(index=index, lines=[f"{index}-{line}"])
+                time.sleep(0.0001 * (10 - index))
+            test.finish(index=index)
+
+        threads = [threading.Thread(target=task, args=(index,)) for index in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        test.close()
+
+        expected = "".join(f"{index}-{line}\n" for index in range(10) for line in range(50))
+        self.assertEqual(expected, self.read())
+        self.assertEqual(["output.txt"], os.listdir(self.directory))
+
+
+if __name__ == "__main__":
+    main()
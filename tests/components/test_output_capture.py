@@ -0,0 +1,81 @@
+import sys
+from subprocess import Popen, PIPE
+from unittest import main, TestCase
+
+from gerund.components.input_stream import InputStream
+from gerund.components.output_capture import OutputCapture, OutputLine
+
+
+class TestOutputCapture(TestCase):
+
+    def setUp(self) -> None:
+        self.test = OutputCapture()
+
+    def tearDown(self) -> None:
+        pass
+
+    def test___init__(self):
+        self.assertEqual([], self.test.lines)
+
+    def test_read(self):
+        script = "import sys, time; print('one', flush=True); time.sleep(0.05); print('two', file=sys.stderr, flush=True); " \
+                 "time.sleep(0.05); sys.stdout.write('three')"
+        process = Popen([sys.executable, "-c", script], stdout=PIPE, stderr=PIPE)
+        self.test.read(process=process)
+        process.wait()
+
+        self.assertEqual(["one", "three"], self.test.stdout)
+        self.assertEqual(["two"], self.test.stderr)
+        self.assertEqual(["[stdout] one", "[stderr] two", "[stdout] three"], self.test.interleaved(tagged=True))
+        self.assertEqual(["one", "two", "three"], self.test.interleaved())
+        self.assertEqual(True, all(isinstance(line.timestamp, float) for line in self.test.lines))
+
+    def test_read_large_output(self):
+        script = "import sys; [(print(i), print(i, file=sys.stderr)) for i in range(50000)]"
+        process = Popen([sys.executable, "-c", script], stdout=PIPE, stderr=PIPE)
+        self.test.read(process=process)
+        process.wait()
+
+        self.assertEqual([str(i) for i in range(50000)], self.test.stdout)
+        self.assertEqual([str(i) for i in range(50000)], self.test.stderr)
+
+    def test_read_decompress_stdout(self):
+        process = Popen("seq 1 20000 | gzip -c && echo 'plain' 1>&2", shell=True, stdout=PIPE, stderr=PIPE)
+        self.test.read(process=process, decompress_stdout=True)
+        process.wait()
+
+        self.assertEqual([str(i) for i in range(1, 20001)], self.test.stdout)
+        self.assertEqual(["plain"], self.test.stderr)
+
+    def test_read_stdout_only(self):
+        process = Popen("echo one && echo two", shell=True, stdout=PIPE)
+        self.test.read(process=process)
+        process.wait()
+
+        self.assertEqual(["one", "two"], self.test.stdout)
+        self.assertEqual([], self.test.stderr)
+        self.assertEqual(OutputLine, type(self.test.lines[0]))
+
+    def test_read_input_stream(self):
+        # the process echoes every line so its output pipe fills up while the input is still being written
+        process = Popen("cat && echo done 1>&2", shell=True, stdin=PIPE, stdout=PIPE, stderr=PIPE)
+        input_stream = InputStream(data=(f"{i}\n".encode() for i in range(100000)))
+        self.test.read(process=process, input_stream=input_stream)
+        process.wait()
+
+        self.assertEqual([str(i) for i in range(100000)], self.test.stdout)
+        self.assertEqual(["done"], self.test.stderr)
+        self.assertEqual(True, input_stream.closed)
+
+    def test_read_input_stream_not_read(self):
+        process = Popen("echo skipped", shell=True, stdin=PIPE, stdout=PIPE)
+        input_stream = InputStream(data=b"x" * 10000000)
+        self.test.read(process=process, input_stream=input_stream)
+        process.wait()
+
+        self.assertEqual(["skipped"], self.test.stdout)
+        self.assertEqual(True, input_stream.written < 10000000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import os
+import tempfile
+from unittest import main, TestCase
+from unittest.mock import patch
+
+from gerund.commands.terminal_command import TerminalCommand
+from gerund.components.placement import CoreAllocator, Placement, parse_cpu_set
+
+
+class TestPlacement(TestCase):
+
+    def test_parse_cpu_set(self):
+        self.assertEqual({0, 1, 2, 3, 8, 10, 11}, parse_cpu_set(cpu_set="0-3,8,10-11"))
+        self.assertEqual({2, 5}, parse_cpu_set(cpu_set=[5, 2]))
+        self.assertEqual({1}, parse_cpu_set(cpu_set=" 1, "))
+
+    def test___init__(self):
+        test = Placement(cpu_set="0-1", nice="5", ionice_class=2, ionice_level=7)
+        self.assertEqual({0, 1}, test.cpu_set)
+        self.assertEqual(5, test.nice)
+        self.assertEqual(None, test.cgroup_path)
+
+        with self.assertRaises(ValueError) as error:
+            Placement(nice=25)
+        self.assertEqual("nice has to be between -20 and 19 not 25", str(error.exception))
+        with self.assertRaises(ValueError) as error:
+            Placement(ionice_class=4)
+        self.assertEqual("ionice class has to be 1, 2, or 3 not 4", str(error.exception))
+        with self.assertRaises(ValueError) as error:
+            Placement(memory_max="1G")
+        self.assertEqual("memory_max and cpu_max need a cgroup", str(error.exception))
+        with self.assertRaises(ValueError) as error:
+            Placement(cpu_set=[])
+        self.assertEqual("a cpu set needs at least one cpu", str(error.exception))
+        with patch("gerund.components.placement.shutil.which", return_value=None):
+            with self.assertRaises(ValueError) as error:
+                Placement(cpu_set="0")
+        self.assertEqual("cpu sets need taskset which was not found", str(error.exception))
+
+    def test_from_config(self):
+        test = Placement.from_config(placement_data={"cpu_set": "0", "nice": 10, "cgroup": None, "unknown": 1})
+        self.assertEqual({0}, test.cpu_set)
+        self.assertEqual(10, test.nice)
+        self.assertEqual(None, test.cgroup)
+
+        copy = test.with_cpu_set(cpu_set=[1, 2])
+        self.assertEqual({1, 2}, copy.cpu_set)
+        self.assertEqual(10, copy.nice)
+        self.assertEqual({0}, test.cpu_set)
+
+    def test_command_prefix(self):
+        self.assertEqual("", Placement().command_prefix())
+        self.assertEqual("taskset -p -c 0,2,3 $$ > /dev/null && ", Placement(cpu_set="3,0,2").command_prefix())
+        self.assertEqual("echo $$ > '/cgroup/a b/cgroup.procs' && ",
+                         Placement(cgroup="a b", cgroup_root="/cgroup").command_prefix())
+        self.assertEqual("ionice -c 2 -n 7 -p $$ && ", Placement(ionice_level=7).command_prefix())
+        self.assertEqual("ionice -c 3 -p $$ && ", Placement(ionice_class=3, ionice_level=7).command_prefix())
+
+    def test_prepare(self):
+        with tempfile.TemporaryDirectory() as cgroup_root:
+            test = Placement(cgroup="/gerund/job", memory_max="2G", cpu_max=1.5, cgroup_root=cgroup_root)
+            test.prepare()
+
+            self.assertEqual(f"{cgroup_root}/gerund/job", test.cgroup_path)
+            with open(f"{cgroup_root}/gerund/job/memory.max", "r") as file:
+                self.assertEqual("2G", file.read())
+            with open(f"{cgroup_root}/gerund/job/cpu.max", "r") as file:
+                self.assertEqual("150000 100000", file.read())
+
+        with self.assertRaises(ValueError):
+            Placement(cgroup="job", cgroup_root="/proc/gerund-does-not-exist").prepare()
+
+    def test_local_command(self):
+        cpu = min(os.sched_getaffinity(0))
+        current_nice = os.nice(0)
+        with tempfile.TemporaryDirectory() as cgroup_root:
+            os.makedirs(f"{cgroup_root}/job")
+            open(f"{cgroup_root}/job/cgroup.procs", "w").close()
+            placement = Placement(cpu_set=[cpu], nice=min(current_nice + 3, 19) - current_nice, cgroup="job",
+                                  cgroup_root=cgroup_root)
+            command = TerminalCommand(command="grep Cpus_allowed_list /proc/self/status && nice", placement=placement)
+            output = command.wait(capture_output=True)
+
+            # the shell moves itself into the cgroup
+            with open(f"{cgroup_root}/job/cgroup.procs", "r") as file:
+                self.assertEqual(f"{command.process.pid}\n", file.read())
+
+        self.assertEqual(0, command.return_code)
+        self.assertEqual(str(cpu), output[0].split()[-1])
+        self.assertEqual(str(min(current_nice + 3, 19)), output[1])
+        self.assertEqual(current_nice, os.nice(0))
+
+
+class TestCoreAllocator(TestCase):
+
+    def test___init__(self):
+        self.assertEqual([{0, 1, 2, 3}, {4, 5, 6}, {7, 8, 9}], CoreAllocator(workers=3, cpu_set="0-9").core_sets)
+        self.assertEqual([{0}, {1}, {0}], CoreAllocator(workers=3, cpu_set="0-1").core_sets)
+        self.assertEqual(set().union(*CoreAllocator(workers=1).core_sets), os.sched_getaffinity(0))
+        with self.assertRaises(ValueError):
+            CoreAllocator(workers=0)
+
+    def test_acquire(self):
+        test = CoreAllocator(workers=2, cpu_set="0-3")
+        with test.acquire() as first, test.acquire() as second:
+            self.assertEqual({0, 1, 2, 3}, first | second)
+            self.assertEqual(set(), first & second)
+        with test.acquire() as third:
+            self.assertEqual(True, third in test.core_sets)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import json
+import shutil
+import subprocess
+import tempfile
+import time
+from unittest import main, TestCase
+from unittest.mock import patch
+
+from gerund.components.local_variable_storage import Singleton
+from gerund.components.preflight import HostHealth, Preflight
+
+
+class TestPreflight(TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.test = Preflight(connect_timeout=0.5, min_free_disk_mb=1, max_load_per_cpu=None,
+                              cache_path=f"{self.directory}/preflight.json")
+        self.servers = {}
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.directory)
+        Singleton._instances = {}
+
+    def fake_ssh(self, command: str, **kwargs) -> subprocess.Popen:
+        # runs the part of the command meant for the server locally unless the server is set up to fail
+        host = command.split(" '", 1)[0].split("@")[-1]
+        remote_command = self.servers.get(host, command.split(" '", 1)[1][:-1])
+        return subprocess.Popen(remote_command, **kwargs)
+
+    def test__compile_command(self):
+        command = self.test._compile_command(host="10.0.0.1", username="root", key="./key.pem")
+        self.assertEqual(True, command.startswith("ssh -o BatchMode=yes -o ConnectTimeout=1 -o StrictHostKeyChecking"))
+        self.assertEqual(True, command.endswith("-i './key.pem' root@10.0.0.1 'df -Pk ~ | tail -n 1 && "
+                                                "cut -d \" \" -f 1 /proc/loadavg && nproc'"))
+
+    def test__evaluate(self):
+        measurements = {"free_disk_mb": 500, "load": 9.0, "cpus": 4, "checked_at": 1.0}
+        self.test.min_free_disk_mb = 1024
+        self.assertEqual("only 500 MB free on ~, 1024 MB needed",
+                         self.test._evaluate(host="one", measurements=measurements, seconds=0.1).reason)
+
+        self.test.min_free_disk_mb = 100
+        self.test.max_load_per_cpu = 2.0
+        self.assertEqual("load 9.00 on 4 CPUs is over 2.00 per CPU",
+                         self.test._evaluate(host="one", measurements=measurements, seconds=0.1).reason)
+
+        self.test.max_load_per_cpu = 3.0
+        health = self.test._evaluate(host="one", measurements=measurements, seconds=0.1)
+        self.assertEqual((True, None, 1.0), (health.healthy, health.reason, health.checked_at))
+
+    @patch("gerund.components.preflight.Popen")
+    def test_check(self, mock_popen):
+        mock_popen.side_effect = self.fake_ssh
+        self.servers = {
+            "10.0.0.2": "echo 'root@10.0.0.2: Permission denied (publickey).' 1>&2; exit 255",
+            "10.0.0.3": "sleep 30",
+            "10.0.0.4": "echo 'ssh: connect to host 10.0.0.4 port 22: Connection refused' 1>&2; exit 255",
+        }
+
+        start = time.time()
+        results = self.test.check(hosts=["10.0.0.1", "10.0.0.2", "10.0.0.3", "10.0.0.4", "10.0.0.1"])
+        self.assertEqual(True, time.time() - start < 5)
+
+        self.assertEqual(["10.0.0.1", "10.0.0.2", "10.0.0.3", "10.0.0.4"], [i.host for i in results])
+        self.assertEqual([True, False, False, False], [i.healthy for i in results])
+        self.assertEqual(True, results[0].free_disk_mb > 0 and results[0].cpus > 0)
+        self.assertEqual("authentication failed: root@10.0.0.2: Permission denied (publickey).", results[1].reason)
+        self.assertEqual("timed out after 1 seconds", results[2].reason)
+        self.assertEqual("unreachable: ssh: connect to host 10.0.0.4 port 22: Connection refused", results[3].reason)
+
+        self.assertEqual(None, self.test.reason(host="10.0.0.1"))
+        self.assertEqual(results[1].reason, self.test.reason(host="10.0.0.2"))
+        self.assertEqual(None, self.test.reason(host="10.0.0.9"))
+        with open(self.test.cache_path, "r") as file:
+            self.assertEqual(["ubuntu@10.0.0.1"], list(json.loads(file.read())))
+
+        report = Preflight.report(results=results)
+        self.assertEqual(True, report[0].startswith("10.0.0.1  ok         "))
+        self.assertEqual("10.0.0.2  unhealthy  authentication failed: root@10.0.0.2: Permission denied (publickey).",
+                         report[1])
+        self.assertEqual("4 hosts checked, 3 unhealthy", report[-1])
+
+    @patch("gerund.components.preflight.Popen")
+    def test_check_cache(self, mock_popen):
+        mock_popen.side_effect = self.fake_ssh
+        self.test.check(hosts=["10.0.0.1"])
+        self.assertEqual(1, mock_popen.call_count)
+
+        result = self.test.check(hosts=["10.0.0.1"])[0]
+        self.assertEqual((1, True, True), (mock_popen.call_count, result.cached, result.healthy))
+
+        self.test.min_free_disk_mb = 10 ** 12
+        self.assertEqual(False, self.test.check(hosts=["10.0.0.1"])[0].healthy)
+        self.test.check(hosts=["10.0.0.1"], use_cache=False)
+        self.assertEqual(2, mock_popen.call_count)
+
+        self.test.ttl = 0.0
+        self.test.check(hosts=["10.0.0.1"])
+        self.assertEqual(3, mock_popen.call_count)
+
+    def test_reason_expired(self):
+        self.test.results["one"] = HostHealth(host="one", healthy=False, reason="down", checked_at=time.time())
+        self.assertEqual("down", self.test.reason(host="one"))
+        self.test.results["one"] = self.test.results["one"]._replace(checked_at=time.time() - 120)
+        self.assertEqual(None, self.test.reason(host="one"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import io
+import time
+from unittest import main, TestCase
+
+from gerund.commands.terminal_command import TerminalCommand
+from gerund.components.local_variable_storage import Singleton
+from gerund.components.output_capture import OutputLine
+from gerund.components.progress import Progress
+
+
+class TestProgress(TestCase):
+
+    def setUp(self) -> None:
+        self.test = Progress()
+
+    def tearDown(self) -> None:
+        self.test.stop()
+        Singleton._instances = {}
+
+    def test_track(self):
+        first = self.test.add(name="a.yml")
+        second = self.test.add(name="b.yml")
+        self.assertEqual(None, self.test.on_line())
+
+        with self.test.track(key=first) as task:
+            self.assertEqual("running", task.state)
+            self.test.set_host(host="10.0.0.1")
+            self.test.on_line()(OutputLine(timestamp=0.0, stream="stdout", text="hello"))
+        self.test.finish(key=first, return_code=0)
+        self.test.finish(key=second, return_code=None)
+        self.test.finish(key=None, return_code=1)
+
+        self.assertEqual(("ok", "10.0.0.1", 1, 6, "hello"), (task.state, task.host, task.lines, task.bytes,
+                                                              task.last_line))
+        self.assertEqual("skipped", self.test.tasks[second].state)
+
+    def test_render(self):
+        keys = [self.test.add(name=name) for name in ["a.yml", "b.yml", "c.yml", "d.yml"]]
+        self.test._started = 100.0
+        for key in keys[:3]:
+            self.test.tasks[key].state = "running"
+            self.test.tasks[key].started = 100.0
+        self.test.tasks[keys[0]].state = "ok"
+        self.test.tasks[keys[0]].finished = 110.0
+        self.test.tasks[keys[1]].lines = 20
+        self.test.tasks[keys[1]].bytes = 2048
+        self.test.tasks[keys[1]].last_line = "step 20"
+
+        lines = self.test.render(now=110.0)
+        self.assertEqual("1/4 done, 2 running, 0 failed, 0.10 tasks/s, 205 B/s, elapsed 0:00:10, eta 0:00:30",
+                         lines[0])
+        self.assertEqual(3, len(lines))
+        self.assertEqual(True, lines[1].startswith("  running  b.yml  local"))
+        self.assertEqual(True, "2.0 lines/s" in lines[1] and "205 B/s" in lines[1])
+        self.assertEqual(True, lines[1].endswith("step 20"))
+        self.assertEqual(20, len(self.test.render(now=110.0, width=20)[1]))
+
+    def test_plain_output(self):
+        stream = io.StringIO()
+        self.test.start(stream=stream, plain_interval=0.05)
+        key = self.test.add(name="a.yml")
+        with self.test.track(key=key):
+            output = TerminalCommand(command="echo one && echo two").wait(capture_output=True)
+            time.sleep(0.2)
+        self.test.finish(key=key, return_code=0)
+        self.test.write_line("a line")
+        self.test.stop()
+
+        self.assertEqual(["one", "two"], output)
+        self.assertEqual((2, "two"), (self.test.tasks[key].lines, self.test.tasks[key].last_line))
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(True, lines[0].startswith("progress: 0/1 done, 1 running"))
+        self.assertEqual(True, "a line" in lines)
+        self.assertEqual(True, lines[-1].startswith("progress: 1/1 done, 0 running"))
+        self.assertEqual(False, self.test.active)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import time
+from unittest import main, TestCase
+from unittest.mock import patch
+
+from gerund.components.local_variable_storage import Singleton
+from gerund.components.remote_environment import RemoteEnvironment
+
+
+class TestRemoteEnvironment(TestCase):
+
+    def setUp(self) -> None:
+        self.test = RemoteEnvironment()
+        self.block = "export ONE=1\nexport TWO='it'\"'\"'s'\n"
+
+    def tearDown(self) -> None:
+        Singleton._instances = {}
+
+    def test_build_block(self):
+        self.assertEqual(self.block, RemoteEnvironment.build_block(environment={"ONE": "1", "TWO": "it's"}))
+        self.assertEqual("", RemoteEnvironment.build_block(environment={}))
+
+    def test_path_for(self):
+        path = RemoteEnvironment.path_for(block=self.block)
+        self.assertEqual(True, path.startswith("~/.gerund/env/"))
+        self.assertEqual(path, RemoteEnvironment.path_for(block=self.block))
+        self.assertNotEqual(path, RemoteEnvironment.path_for(block="export ONE=2\n"))
+
+    @patch("gerund.components.remote_environment.Popen")
+    def test_upload(self, mock_popen):
+        mock_popen.return_value.returncode = 0
+        path = RemoteEnvironment.path_for(block=self.block)
+
+        self.assertEqual(path, self.test.upload(block=self.block, ip_address="123456", username="ubuntu"))
+        self.assertEqual(path, self.test.upload(block=self.block, ip_address="123456", username="ubuntu"))
+
+        command = "ssh -o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null ubuntu@123456 "
+        command += "'umask 077 && mkdir -p -m 700 ~/.gerund/env && { find ~/.gerund/env -name \"*.env\" -mmin +1440 "
+        command += f"-delete 2>/dev/null; true; }} && cat > {path}.$$ && mv {path}.$$ {path}'"
+        mock_popen.assert_called_once_with(command, shell=True, stdin=-1)
+        mock_popen.return_value.communicate.assert_called_once_with(self.block.encode())
+
+        self.test.upload(block=self.block, ip_address="654321", username="ubuntu", key="./key.pem")
+        self.assertEqual(True, "-i './key.pem' ubuntu@654321" in mock_popen.call_args[0][0])
+        self.assertEqual(2, mock_popen.call_count)
+
+        # a file that could have been removed from the server is uploaded again
+        with patch("gerund.components.remote_environment.time.monotonic", return_value=time.monotonic() + 86400):
+            self.test.upload(block=self.block, ip_address="123456", username="ubuntu")
+        self.assertEqual(3, mock_popen.call_count)
+
+    @patch("gerund.components.remote_environment.Popen")
+    def test_upload_failure(self, mock_popen):
+        mock_popen.return_value.returncode = 255
+
+        with self.assertRaises(ValueError) as error:
+            self.test.upload(block=self.block, ip_address="123456", username="ubuntu")
+        self.assertEqual("environment variables could not be uploaded to 123456", str(error.exception))
+
+        mock_popen.return_value.returncode = 0
+        self.test.upload(block=self.block, ip_address="123456", username="ubuntu")
+        self.assertEqual(2, mock_popen.call_count)
+
+
+if __name__ == "__main__":
+    main()
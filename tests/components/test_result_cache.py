@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+from unittest import main, TestCase
+
+from gerund.components.result_cache import ResultCache
+
+
+class TestResultCache(TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.input_path = f"{self.directory}/input.csv"
+        with open(self.input_path, "w") as file:
+            file.write("one,two\n")
+        self.test = ResultCache(path=f"{self.directory}/cache")
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.directory)
+
+    def test___init__(self):
+        test = ResultCache()
+        self.assertEqual(os.path.join(os.path.expanduser("~"), ".gerund", "cache"), test.path)
+        self.assertEqual(256 * 1024 * 1024, test.max_size)
+        self.assertEqual(False, test.cache_failures)
+
+    def test_build_key(self):
+        key = self.test.build_key(command="echo 1", environment_variables={"ONE": "1"}, ip_address=None,
+                                  input_files=[self.input_path])
+
+        self.assertEqual(key, self.test.build_key(command="echo 1", environment_variables={"ONE": "1"},
+                                                  input_files=[self.input_path]))
+        self.assertNotEqual(key, self.test.build_key(command="echo 2", environment_variables={"ONE": "1"},
+                                                     input_files=[self.input_path]))
+        self.assertNotEqual(key, self.test.build_key(command="echo 1", environment_variables={"ONE": "2"},
+                                                     input_files=[self.input_path]))
+        self.assertNotEqual(key, self.test.build_key(command="echo 1", environment_variables={"ONE": "1"},
+                                                     ip_address="123456", input_files=[self.input_path]))
+
+        self.assertNotEqual(key, self.test.build_key(command="echo 1", environment_variables={"ONE": "1"},
+                                                     input_files=[self.input_path], working_directory="/tmp"))
+
+        with open(self.input_path, "a") as file:
+            file.write("three,four\n")
+        self.assertNotEqual(key, self.test.build_key(command="echo 1", environment_variables={"ONE": "1"},
+                                                     input_files=[self.input_path]))
+
+        with self.assertRaises(ValueError) as error:
+            self.test.build_key(command="echo 1", input_files=[f"{self.directory}/missing.csv"])
+        self.assertEqual(f"input file {self.directory}/missing.csv does not exist", str(error.exception))
+
+    def test_put_and_get(self):
+        self.assertEqual(None, self.test.get(key="missing"))
+
+        self.test.put(key="one", output=["1", "two"], return_code=0)
+        self.assertEqual({"output": ["1", "two"], "return_code": 0}, self.test.get(key="one"))
+
+        self.test.put(key="two", output=["error"], return_code=1)
+        self.assertEqual(None, self.test.get(key="two"))
+
+        self.test.cache_failures = True
+        self.test.put(key="two", output=["error"], return_code=1)
+        self.assertEqual({"output": ["error"], "return_code": 1}, self.test.get(key="two"))
+
+    def test__evict(self):
+        self.test.put(key="one", output=["1" * 100], return_code=0)
+        entry_size = os.path.getsize(f"{self.test.path}/one.json")
+        self.test.max_size = entry_size * 2
+
+        self.test.put(key="two", output=["2" * 100], return_code=0)
+        os.utime(f"{self.test.path}/one.json", (1, 1))
+        os.utime(f"{self.test.path}/two.json", (2, 2))
+        self.test.get(key="one")
+        self.test.put(key="three", output=["3" * 100], return_code=0)
+
+        self.assertEqual(["one.json", "three.json"], sorted(os.listdir(self.test.path)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+import os
+import shutil
+import tempfile
+from unittest import main, TestCase
+
+from gerund.components.ssh_options import SshOptions
+from gerund.components.variable_map import Singleton
+
+
+class TestSshOptions(TestCase):
+
+    def tearDown(self) -> None:
+        Singleton._instances = {}
+
+    def test_options(self):
+        test = SshOptions()
+        self.assertEqual("-o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null", test.options)
+
+        directory = tempfile.mkdtemp()
+        test.enable_connection_sharing(control_directory=f"{directory}/cm", control_persist="5m")
+        self.assertEqual(True, os.path.isdir(f"{directory}/cm"))
+        self.assertEqual("-o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null -o ControlMaster=auto "
+                         f"-o ControlPath={directory}/cm/%C -o ControlPersist=5m", SshOptions().options)
+
+        test.disable_connection_sharing()
+        self.assertEqual("-o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null", test.options)
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import json
+import os
+import tempfile
+from unittest import main, TestCase
+
+from gerund.components.local_variable_storage import Singleton
+from gerund.components.tracer import Tracer
+
+
+class TestTracer(TestCase):
+
+    def setUp(self) -> None:
+        self.test = Tracer()
+
+    def tearDown(self) -> None:
+        Singleton._instances = {}
+
+    def test___init__(self):
+        self.assertEqual(True, self.test.enabled)
+        self.assertEqual(100000, self.test.max_events)
+        self.assertEqual([], self.test.events)
+        self.assertEqual(id(self.test), id(Tracer()))
+
+    def test_span(self):
+        with self.test.span("variable.resolve", variable="=>one"):
+            pass
+
+        name, start, duration, pid, _, args = self.test.events[0]
+        self.assertEqual("variable.resolve", name)
+        self.assertEqual(True, duration >= 0)
+        self.assertEqual(os.getpid(), pid)
+        self.assertEqual({"variable": "=>one"}, args)
+
+        with self.assertRaises(ValueError):
+            with self.test.span("terminal_command.execute"):
+                raise ValueError("failed")
+        self.assertEqual("terminal_command.execute", self.test.events[1][0])
+
+        self.test.enabled = False
+        with self.test.span("terminal_command.compile"):
+            pass
+        self.assertEqual(2, len(self.test.events))
+
+    def test_max_events(self):
+        Singleton._instances = {}
+        test = Tracer(max_events=2)
+        for name in ["one", "two", "three"]:
+            with test.span(name):
+                pass
+        self.assertEqual(["two", "three"], [i[0] for i in test.events])
+
+    def test_clear(self):
+        with self.test.span("config.run"):
+            pass
+        self.assertEqual(1, len(self.test.events))
+        self.test.clear()
+        self.assertEqual([], self.test.events)
+
+    def test_export_chrome_trace(self):
+        self.test._events.append(("config.run", 2000, 1000, 1, 2, {"config": "gerund.yml"}))
+        path = tempfile.mkstemp(suffix=".json")[1]
+        self.test.export_chrome_trace(path=path)
+
+        with open(path, "r") as file:
+            trace = json.loads(file.read())
+        os.remove(path)
+
+        expected_event = {
+            "name": "config.run", "cat": "config", "ph": "X", "ts": 2.0, "dur": 1.0, "pid": 1, "tid": 2,
+            "args": {"config": "gerund.yml"}
+        }
+        self.assertEqual([expected_event], trace["traceEvents"])
+        self.assertEqual("ms", trace["displayTimeUnit"])
+
+
+if __name__ == "__main__":
+    main()
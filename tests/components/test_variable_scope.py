@@ -0,0 +1,64 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from unittest import main, TestCase
+
+from gerund.components.local_variable_storage import LocalVariableStorage, Singleton
+from gerund.components.variable import Variable
+from gerund.components.variable_map import VariableMap
+from gerund.components.variable_scope import variable_scope
+
+
+class TestVariableScope(TestCase):
+
+    def setUp(self) -> None:
+        LocalVariableStorage().update({"one": "global"})
+
+    def tearDown(self) -> None:
+        Singleton._instances = {}
+
+    def test_variable_scope(self):
+        global_storage = LocalVariableStorage()
+
+        with variable_scope(local_variables={"one": "scoped"}, mapped_variables={"two": {"path": "/tmp"}},
+                            ip_address="123456") as storage:
+            self.assertEqual(id(storage), id(LocalVariableStorage()))
+            self.assertNotEqual(id(global_storage), id(storage))
+            self.assertEqual("scoped", str(Variable(name="=>one")))
+            self.assertEqual({"two": {"path": "/tmp"}}, VariableMap())
+            self.assertEqual("123456", VariableMap().ip_address)
+
+            with variable_scope():
+                self.assertEqual({}, LocalVariableStorage())
+
+            self.assertEqual("scoped", str(Variable(name="=>one")))
+
+        self.assertEqual(id(global_storage), id(LocalVariableStorage()))
+        self.assertEqual("global", str(Variable(name="=>one")))
+        self.assertEqual({}, VariableMap())
+        self.assertEqual(None, VariableMap().ip_address)
+
+    def test_variable_scope_threads(self):
+        def run(value: int) -> str:
+            with variable_scope(local_variables={"one": value}):
+                return "".join(str(Variable(name="=>one")) for _ in range(1000))
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            outcomes = list(executor.map(run, range(32)))
+
+        self.assertEqual([str(i) * 1000 for i in range(32)], outcomes)
+        self.assertEqual("global", str(Variable(name="=>one")))
+
+    def test_variable_scope_asyncio(self):
+        async def run(value: int) -> str:
+            with variable_scope(local_variables={"one": value}):
+                await asyncio.sleep(0.01)
+                return str(Variable(name="=>one"))
+
+        async def run_all() -> list:
+            return await asyncio.gather(*[run(i) for i in range(10)])
+
+        self.assertEqual([str(i) for i in range(10)], asyncio.run(run_all()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import os
+import shutil
+import socket
+import stat
+import tempfile
+import threading
+import time
+from unittest import main, TestCase
+from unittest.mock import patch
+
+from gerund.components.variable_map import Singleton
+from gerund.entry_points.daemon import GerundDaemon, submit_to_daemon
+
+FILE_PATH = os.path.dirname(os.path.realpath(__file__))
+
+
+class TestGerundDaemon(TestCase):
+
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        self.socket_path = f"{self.directory}/gerund.sock"
+        self.test = GerundDaemon(socket_path=self.socket_path, share_connections=False)
+        self.thread = threading.Thread(target=self.test.serve_forever, daemon=True)
+        self.thread.start()
+        while not os.path.exists(self.socket_path):
+            time.sleep(0.01)
+
+    def tearDown(self) -> None:
+        self.test.shutdown()
+        self.thread.join()
+        shutil.rmtree(self.directory)
+        Singleton._instances = {}
+
+    def test_single_config(self):
+        request = {"configs": [f"{FILE_PATH}/meta_data/gerund.yml"], "jobs": 1, "use_cache": True,
+                   "cwd": self.directory}
+
+        self.assertEqual(0, submit_to_daemon(socket_path=self.socket_path, request=request))
+        self.assertEqual(0, submit_to_daemon(socket_path=self.socket_path, request=request))
+
+        with open(f"{self.directory}/output.txt", "r") as file:
+            self.assertEqual(['3', 'four', '1', ''], file.read().split("\n"))
+        self.assertEqual([f"{FILE_PATH}/meta_data/gerund.yml"], list(self.test.config_cache.keys()))
+
+    def test_single_config_streams(self):
+        with open(f"{self.directory}/slow.yml", "w") as file:
+            file.write("commands:\n  - echo first\n  - sleep 1\n  - echo last\n")
+        arrivals = []
+        request = {"configs": [f"{self.directory}/slow.yml"], "jobs": 1, "cwd": self.directory}
+
+        self.assertEqual(0, submit_to_daemon(socket_path=self.socket_path, request=request,
+                                             write_line=lambda line: arrivals.append((line, time.monotonic()))))
+        # the first line arrives while the config is still running and no line is sent twice
+        self.assertEqual(["first", "last"], [line for line, _ in arrivals])
+        self.assertEqual(True, arrivals[1][1] - arrivals[0][1] >= 0.8)
+
+    def test_multiple_configs(self):
+        lines = []
+        request = {"configs": [f"{FILE_PATH}/meta_data/gerund.yml", f"{FILE_PATH}/meta_data/gerund.jest"],
+                   "jobs": 2, "use_cache": True, "cwd": self.directory}
+
+        self.assertEqual(1, submit_to_daemon(socket_path=self.socket_path, request=request, write_line=lines.append))
+
+        with open(f"{self.directory}/gerund.yml.output.txt", "r") as file:
+            self.assertEqual(['3', 'four', '1', ''], file.read().split("\n"))
+        self.assertEqual(True, "[gerund.jest] ValueError: jest is not supported" in lines)
+        self.assertEqual("2 configs, 1 failed", lines[-1][:19])
+
+    def test_single_config_combined_output(self):
+        lines = []
+        request = {"configs": [f"{FILE_PATH}/meta_data/gerund.jest"], "jobs": 1, "cwd": self.directory,
+                   "output": f"{self.directory}/combined.txt"}
+
+        self.assertEqual(1, submit_to_daemon(socket_path=self.socket_path, request=request, write_line=lines.append))
+        with open(f"{self.directory}/combined.txt", "r") as file:
+            self.assertEqual(["==> gerund.jest <==", "ValueError: jest is not supported", ""], file.read().split("\n"))
+        self.assertEqual("1 configs, 1 failed", lines[-1][:19])
+
+    def test_error(self):
+        lines = []
+        request = {"configs": [f"{FILE_PATH}/meta_data/gerund.jest"], "jobs": 1, "cwd": self.directory}
+
+        self.assertEqual(1, submit_to_daemon(socket_path=self.socket_path, request=request, write_line=lines.append))
+        self.assertEqual(["ValueError: jest is not supported"], lines)
+
+    def test_socket_permissions(self):
+        socket_path = f"{self.directory}/private/gerund.sock"
+        daemon = GerundDaemon(socket_path=socket_path, share_connections=False)
+        thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+        with patch("gerund.entry_points.daemon.os.umask", wraps=os.umask) as mock_umask:
+            thread.start()
+            while not os.path.exists(socket_path):
+                time.sleep(0.01)
+        mode = stat.S_IMODE(os.stat(socket_path).st_mode)
+        daemon.shutdown()
+        thread.join()
+
+        self.assertEqual(0, mode & 0o077)
+        self.assertEqual(0o077, mock_umask.call_args_list[0][0][0])
+        self.assertEqual(0o700, stat.S_IMODE(os.stat(f"{self.directory}/private").st_mode))
+
+    def test_socket_in_use(self):
+        while True:
+            client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                client.connect(self.socket_path)
+                break
+            except ConnectionRefusedError:
+                time.sleep(0.01)
+            finally:
+                client.close()
+
+        with self.assertRaises(ValueError) as error:
+            GerundDaemon(socket_path=self.socket_path, share_connections=False).serve_forever()
+        self.assertEqual(f"a gerund daemon is already listening on {self.socket_path}", str(error.exception))
+        self.assertEqual(True, os.path.exists(self.socket_path))
+
+    def test_stale_socket(self):
+        socket_path = f"{self.directory}/stale.sock"
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(socket_path)
+        stale.close()
+
+        daemon = GerundDaemon(socket_path=socket_path, share_connections=False)
+        thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+        thread.start()
+        lines = []
+        request = {"configs": ["missing.json"], "jobs": 1, "use_cache": True, "cwd": self.directory}
+        while True:
+            try:
+                submit_to_daemon(socket_path=socket_path, request=request, write_line=lines.append)
+                break
+            except ValueError:
+                time.sleep(0.01)
+        daemon.shutdown()
+        thread.join()
+        self.assertEqual(False, os.path.exists(socket_path))
+
+    def test_no_daemon(self):
+        with self.assertRaises(ValueError) as error:
+            submit_to_daemon(socket_path=f"{self.directory}/missing.sock", request={})
+        self.assertEqual(f"no gerund daemon is listening on {self.directory}/missing.sock", str(error.exception))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,34 @@
+import json
 import os
+import shutil
+import tempfile
+import threading
+import time
+from argparse import Namespace
 from unittest import main, TestCase
 from unittest.mock import patch
 
-from gerund.entry_points.run_config import main as entry_main
+from gerund.components.fail_fast import FailFast
+from gerund.components.journal import Journal
+from gerund.components.preflight import HostHealth, Preflight
+from gerund.components.progress import Progress
+from gerund.components.variable_map import Singleton
+from gerund.entry_points.run_config import main as entry_main, preflight_configs, run_config_file, run_config_files
 
 FILE_PATH = os.path.dirname(os.path.realpath(__file__))
 OUTPUT_DIR = FILE_PATH + "/output.txt"
 
 
+def build_args(**kwargs) -> Namespace:
+    args = {"f": ["gerund.yml"], "jobs": 1, "no_cache": False, "trace": None, "mode": "run",
+            "via_daemon": False, "socket": "gerund.sock", "output": None,
+            "fail_fast": False, "max_failures": 0, "spread_cores": False, "progress": False,
+            "metrics_file": None, "metrics_interval": 0.0, "metrics_port": None, "journal": None,
+            "resume": False, "preflight": False}
+    args.update(kwargs)
+    return Namespace(**args)
+
+
 class TestRunConfig(TestCase):
 
     def setUp(self) -> None:
@@ -31,12 +52,15 @@ class TestRunConfig(TestCase):
     def tearDown(self) -> None:
         if os.path.isfile(OUTPUT_DIR):
             os.remove(OUTPUT_DIR)
+        for name in ["gerund.yml", "gerund.json", "gerund.txt"]:
+            if os.path.isfile(f"{FILE_PATH}/{name}.output.txt"):
+                os.remove(f"{FILE_PATH}/{name}.output.txt")
 
     @patch("gerund.entry_points.run_config.argparse")
     @patch("gerund.entry_points.run_config.os")
     def test_full_yml(self, mock_os, mock_argparse):
         mock_os.getcwd.return_value = FILE_PATH
-        mock_argparse.ArgumentParser.return_value.parse_args.return_value.f = "meta_data/gerund.yml"
+        mock_argparse.ArgumentParser.return_value.parse_args.return_value = build_args(f=["meta_data/gerund.yml"])
         entry_main()
 
         with open(OUTPUT_DIR, "r") as file:
@@ -47,7 +71,7 @@ class TestRunConfig(TestCase):
     @patch("gerund.entry_points.run_config.os")
     def test_full_json(self, mock_os, mock_argparse):
         mock_os.getcwd.return_value = FILE_PATH
-        mock_argparse.ArgumentParser.return_value.parse_args.return_value.f = "meta_data/gerund.json"
+        mock_argparse.ArgumentParser.return_value.parse_args.return_value = build_args(f=["meta_data/gerund.json"])
         entry_main()
 
         with open(OUTPUT_DIR, "r") as file:
@@ -58,7 +82,7 @@ class TestRunConfig(TestCase):
     @patch("gerund.entry_points.run_config.os")
     def test_full_txt(self, mock_os, mock_argparse):
         mock_os.getcwd.return_value = FILE_PATH
-        mock_argparse.ArgumentParser.return_value.parse_args.return_value.f = "meta_data/gerund.txt"
+        mock_argparse.ArgumentParser.return_value.parse_args.return_value = build_args(f=["meta_data/gerund.txt"])
         entry_main()
 
         with open(OUTPUT_DIR, "r") as file:
@@ -72,7 +96,7 @@ class TestRunConfig(TestCase):
     def test_capture(self, mock_os, mock_argparse, mock_process_data_from_txt_file, terminal_command):
 
         mock_os.getcwd.return_value = FILE_PATH
-        mock_argparse.ArgumentParser.return_value.parse_args.return_value.f = "meta_data/gerund.txt"
+        mock_argparse.ArgumentParser.return_value.parse_args.return_value = build_args(f=["meta_data/gerund.txt"])
         del self.config_data["output"]
         mock_process_data_from_txt_file.return_value = self.config_data
         entry_main()
@@ -82,15 +106,322 @@ class TestRunConfig(TestCase):
             environment_variables=self.config_data["env_vars"],
             ip_address=None,
             key=None,
-            username=None
+            username=None,
+            cache=None,
+            input_files=None,
+            compression=None,
+            working_directory=None,
+            fail_fast=None,
+            memory=None,
+            cpus=None,
+            placement=None
         )
         terminal_command.return_value.wait.assert_called_once_with()
 
+    @patch("gerund.entry_points.run_config.print")
+    @patch("gerund.entry_points.run_config.argparse")
+    @patch("gerund.entry_points.run_config.os")
+    def test_multiple_configs(self, mock_os, mock_argparse, mock_print):
+        mock_os.getcwd.return_value = FILE_PATH
+        mock_argparse.ArgumentParser.return_value.parse_args.return_value = build_args(f=["meta_data/gerund.*", "meta_data/gerund.jest"], jobs=2)
+
+        self.assertEqual(1, entry_main())
+
+        for name in ["gerund.yml", "gerund.json", "gerund.txt"]:
+            with open(f"{FILE_PATH}/{name}.output.txt", "r") as file:
+                data = file.read()
+            self.assertEqual(['3', 'four', '1', ''], data.split("\n"))
+
+        printed = [i[0][0] for i in mock_print.call_args_list]
+        self.assertEqual(True, "[gerund.jest] ValueError: jest is not supported" in printed)
+        self.assertEqual("4 configs, 1 failed", printed[-1][:19])
+
+    @patch("gerund.entry_points.run_config.print")
+    @patch("gerund.entry_points.run_config.argparse")
+    @patch("gerund.entry_points.run_config.os")
+    def test_combined_output(self, mock_os, mock_argparse, mock_print):
+        mock_os.getcwd.return_value = FILE_PATH
+        mock_argparse.ArgumentParser.return_value.parse_args.return_value = build_args(
+            f=["meta_data/gerund.jest", "meta_data/gerund.yml", "meta_data/gerund.json"], jobs=3, output="combined.txt"
+        )
+
+        self.assertEqual(1, entry_main())
+
+        with open(f"{FILE_PATH}/combined.txt", "r") as file:
+            lines = file.read().split("\n")
+        os.remove(f"{FILE_PATH}/combined.txt")
+
+        self.assertEqual(["==> gerund.jest <==", "ValueError: jest is not supported", "==> gerund.yml <==",
+                          "==> gerund.json <==", ""], lines)
+        printed = [i[0][0] for i in mock_print.call_args_list]
+        self.assertEqual("3 configs, 1 failed", printed[-1][:19])
+
+    @patch("gerund.entry_points.run_config.print")
+    @patch("gerund.entry_points.run_config.argparse")
+    @patch("gerund.entry_points.run_config.os")
+    def test_single_config_combined_output(self, mock_os, mock_argparse, mock_print):
+        mock_os.getcwd.return_value = FILE_PATH
+        mock_argparse.ArgumentParser.return_value.parse_args.return_value = build_args(
+            f=["meta_data/gerund.jest"], output="combined.txt", fail_fast=True
+        )
+
+        self.assertEqual(1, entry_main())
+
+        with open(f"{FILE_PATH}/combined.txt", "r") as file:
+            lines = file.read().split("\n")
+        os.remove(f"{FILE_PATH}/combined.txt")
+
+        self.assertEqual(["==> gerund.jest <==", "ValueError: jest is not supported", ""], lines)
+        printed = [i[0][0] for i in mock_print.call_args_list]
+        self.assertEqual("1 configs, 1 failed", printed[-1][:19])
+
+    @patch("gerund.entry_points.run_config.print")
+    @patch("gerund.entry_points.run_config.argparse")
+    @patch("gerund.entry_points.run_config.os")
+    def test_single_config_progress(self, mock_os, mock_argparse, mock_print):
+        mock_os.getcwd.return_value = FILE_PATH
+        mock_argparse.ArgumentParser.return_value.parse_args.return_value = build_args(f=["meta_data/gerund.yml"],
+                                                                                       progress=True)
+
+        self.assertEqual(0, entry_main())
+        tasks = Progress().tasks
+        Singleton._instances = {}
+        self.assertEqual([("gerund.yml", "ok")], [(task.name, task.state) for task in tasks])
+
+    @patch("gerund.entry_points.run_config.argparse")
+    @patch("gerund.entry_points.run_config.os")
+    def test_trace(self, mock_os, mock_argparse):
+        mock_os.getcwd.return_value = FILE_PATH
+        trace_path = FILE_PATH + "/trace.json"
+        mock_argparse.ArgumentParser.return_value.parse_args.return_value = build_args(f=["meta_data/gerund.yml"],
+                                                                                       trace=trace_path)
+        entry_main()
+
+        with open(trace_path, "r") as file:
+            names = [i["name"] for i in json.loads(file.read())["traceEvents"]]
+        os.remove(trace_path)
+
+        for name in ["config.load", "config.run", "config.write_output", "terminal_command.compile",
+                     "terminal_command.execute", "variable.resolve", "command_string.process"]:
+            self.assertEqual(True, name in names)
+
+    def test_matrix(self):
+        for file_type in ["yml", "txt"]:
+            directory = tempfile.mkdtemp()
+            result = run_config_file(file_path=f"{FILE_PATH}/meta_data/matrix.{file_type}",
+                                     output_path=f"{directory}/output.txt", capture_output=True)
+            Singleton._instances = {}
+
+            cells = ["peril-wind_chunk-1", "peril-wind_chunk-2", "peril-flood_chunk-1", "peril-quake_chunk-1"]
+            self.assertEqual(0, result["return_code"])
+            self.assertEqual(cells, [i["name"] for i in result["cells"]])
+            self.assertEqual(True, "[peril-flood_chunk-1] flood-1" in result["lines"])
+            self.assertEqual("4 cells, 0 failed", result["lines"][-1][:17])
+
+            for cell in cells:
+                with open(f"{directory}/matrix.{file_type}.matrix/{cell}/cell.txt", "r") as file:
+                    self.assertEqual("run-" + cell.replace("peril-", "").replace("_chunk", "") + "\n", file.read())
+            with open(f"{directory}/matrix.{file_type}.matrix/results.json", "r") as file:
+                self.assertEqual([0, 0, 0, 0], [i["return_code"] for i in json.loads(file.read())])
+            shutil.rmtree(directory)
+
+    def test_fail_fast(self):
+        directory = tempfile.mkdtemp()
+        file_paths = []
+        for name, command in [("fail", "exit 3"), ("slow", "sleep 30"), ("skipped", "echo 1")]:
+            file_paths.append(f"{directory}/{name}.json")
+            with open(file_paths[-1], "w") as file:
+                file.write(json.dumps({"commands": [command]}))
+
+        start = time.time()
+        results = run_config_files(file_paths=file_paths, jobs=2, output_directory=directory,
+                                   fail_fast=FailFast(), write_line=lambda line: None)
+        shutil.rmtree(directory)
+
+        self.assertEqual(True, time.time() - start < 10)
+        self.assertEqual([3, -15, None], [i["return_code"] for i in results])
+
+    def test_matrix_max_failures(self):
+        directory = tempfile.mkdtemp()
+        file_path = f"{directory}/sweep.yml"
+        with open(file_path, "w") as file:
+            file.write('commands:\n  - "exit {=>code}"\nmatrix:\n  code: [0, 1, 0, 0]\n  max_failures: 0\n')
+
+        result = run_config_file(file_path=file_path, output_path=f"{directory}/output.txt", capture_output=True)
+        shutil.rmtree(directory)
+
+        self.assertEqual(1, result["return_code"])
+        self.assertEqual([0, 1, None, None], [i["return_code"] for i in result["cells"]])
+        self.assertEqual("4 cells, 1 failed, 2 skipped", result["lines"][-1][:28])
+
+    def test_spread_cores(self):
+        directory = tempfile.mkdtemp()
+        file_path = f"{directory}/sweep.yml"
+        with open(file_path, "w") as file:
+            file.write('commands:\n  - "grep Cpus_allowed_list /proc/self/status"\nplacement:\n  nice: 1\n'
+                       'matrix:\n  chunk: [1, 2]\n  max_workers: 2\n  spread_cores: true\n')
+
+        result = run_config_file(file_path=file_path, output_path=f"{directory}/output.txt", capture_output=True)
+        shutil.rmtree(directory)
+
+        self.assertEqual(0, result["return_code"])
+        allowed = sorted(os.sched_getaffinity(0))
+        if len(allowed) > 1:
+            cpu_lists = [line.split()[-1] for line in result["lines"][:-1]]
+            self.assertEqual(2, len(set(cpu_lists)))
+
+    def test_resume(self):
+        directory = tempfile.mkdtemp()
+        file_path = f"{directory}/steps.yml"
+        with open(file_path, "w") as file:
+            file.write(f'commands:\n  - "echo first >> {directory}/runs.txt"\n  - "test -f {directory}/fixed"\n'
+                       f'  - "echo last"\n')
+
+        def run() -> dict:
+            Singleton._instances = {}
+            return run_config_file(file_path=file_path, output_path=f"{directory}/output.txt", capture_output=True,
+                                   journal=Journal(path=f"{directory}/gerund.journal", resume=True))
+
+        self.assertEqual(1, run()["return_code"])
+        open(f"{directory}/fixed", "w").close()
+        result = run()
+        with open(f"{directory}/runs.txt", "r") as file:
+            runs = file.read()
+        shutil.rmtree(directory)
+
+        self.assertEqual(0, result["return_code"])
+        self.assertEqual(["last"], result["lines"])
+        self.assertEqual("first\n", runs)
+
+    def test_resume_no_commands(self):
+        directory = tempfile.mkdtemp()
+        with open(f"{directory}/empty.yml", "w") as file:
+            file.write("commands: []\n")
+        result = run_config_file(file_path=f"{directory}/empty.yml", output_path=f"{directory}/output.txt",
+                                 capture_output=True, journal=Journal(path=f"{directory}/gerund.journal"))
+        shutil.rmtree(directory)
+        self.assertEqual((0, []), (result["return_code"], result["lines"]))
+
+    def test_builtin_steps(self):
+        directory = tempfile.mkdtemp()
+        with open(f"{directory}/steps.yml", "w") as file:
+            file.write('vars:\n  one: 1\ncommands:\n  - mkdir: "out"\n  - cd: "out"\n  - export:\n      RUN: "{=>one}"\n'
+                       '  - "echo $RUN > run.txt"\n  - write:\n      path: "value.txt"\n      value: "{=>one}"\n')
+        with open(f"{directory}/steps.txt", "w") as file:
+            file.write("[commands]\n@mkdir txt\n@cd txt\n@export RUN=2\necho $RUN\n@echo done\n")
+
+        for journal in [None, Journal(path=f"{directory}/gerund.journal")]:
+            result = run_config_file(file_path=f"{directory}/steps.yml", output_path=f"{directory}/output.txt",
+                                     capture_output=True, working_directory=directory, journal=journal)
+            self.assertEqual(0, result["return_code"])
+            for name in ["run.txt", "value.txt"]:
+                with open(f"{directory}/out/{name}", "r") as file:
+                    self.assertEqual("1\n", file.read())
+            shutil.rmtree(f"{directory}/out")
+            Singleton._instances = {}
+
+        result = run_config_file(file_path=f"{directory}/steps.txt", output_path=f"{directory}/output.txt",
+                                 capture_output=True, working_directory=directory)
+        self.assertEqual(["2", "done"], result["lines"])
+        self.assertEqual(True, os.path.isdir(f"{directory}/txt"))
+        shutil.rmtree(directory)
+
+    def test_combined_output_streams(self):
+        directory = tempfile.mkdtemp()
+        with open(f"{directory}/slow.yml", "w") as file:
+            file.write("commands:\n  - echo first\n  - sleep 1\n  - echo last\nfetch:\n  remote: /data\n")
+        results = []
+
+        with patch("gerund.entry_points.run_config.fetch_results", return_value=(True, ["fetched"])):
+            worker = threading.Thread(target=lambda: results.extend(run_config_files(
+                file_paths=[f"{directory}/slow.yml"], jobs=1, combined_output=f"{directory}/combined.txt")))
+            worker.start()
+            time.sleep(0.5)
+            with open(f"{directory}/combined.txt", "r") as file:
+                written = file.read()
+            worker.join()
+
+        with open(f"{directory}/combined.txt", "r") as file:
+            combined = file.read()
+        shutil.rmtree(directory)
+
+        # the first line is in the file while the config is still running and no line is written twice
+        self.assertEqual("==> slow.yml <==\nfirst\n", written)
+        self.assertEqual("==> slow.yml <==\nfirst\nlast\nfetched\n", combined)
+        self.assertEqual(["first", "last", "fetched"], results[0]["lines"])
+
+    @patch.object(Preflight, "check")
+    def test_preflight(self, mock_check):
+        directory = tempfile.mkdtemp()
+        file_paths = []
+        for name, data in [("remote", {"commands": ["echo 1"], "ip_address": "10.0.0.1"}),
+                           ("local", {"commands": ["echo 2"]}), ("broken", None)]:
+            file_paths.append(f"{directory}/{name}.json")
+            with open(file_paths[-1], "w") as file:
+                file.write(json.dumps(data) if data is not None else "{")
+
+        def check(hosts, username, key):
+            results = [HostHealth(host=host, healthy=False, reason="unreachable", checked_at=time.time())
+                       for host in hosts]
+            Preflight().results.update({result.host: result for result in results})
+            return results
+
+        mock_check.side_effect = check
+        lines = preflight_configs(file_paths=file_paths)
+        mock_check.assert_called_once_with(hosts=["10.0.0.1"], username="ubuntu", key=None)
+        self.assertEqual(["10.0.0.1  unhealthy  unreachable", "1 hosts checked, 1 unhealthy"], lines)
+
+        results = run_config_files(file_paths=file_paths[:2], jobs=2, output_directory=directory,
+                                   write_line=lambda line: None, preflight=True)
+        shutil.rmtree(directory)
+        self.assertEqual([1, 0], [i["return_code"] for i in results])
+        self.assertEqual(["ValueError: 10.0.0.1 failed the pre-flight check: unreachable"], results[0]["lines"])
+        Singleton._instances = {}
+
+    @patch.object(Preflight, "reason")
+    def test_preflight_not_requested(self, mock_reason):
+        mock_reason.return_value = "unreachable"
+        directory = tempfile.mkdtemp()
+        with open(f"{directory}/local.json", "w") as file:
+            file.write(json.dumps({"commands": ["echo 2"]}))
+
+        results = run_config_files(file_paths=[f"{directory}/local.json"], jobs=1, output_directory=directory,
+                                   write_line=lambda line: None)
+        shutil.rmtree(directory)
+        self.assertEqual(0, results[0]["return_code"])
+        mock_reason.assert_not_called()
+
+    @patch.object(Preflight, "check")
+    @patch("gerund.entry_points.run_config.print")
+    @patch("gerund.entry_points.run_config.argparse")
+    @patch("gerund.entry_points.run_config.os.getcwd")
+    def test_preflight_single_config(self, mock_getcwd, mock_argparse, mock_print, mock_check):
+        directory = tempfile.mkdtemp()
+        with open(f"{directory}/remote.json", "w") as file:
+            file.write(json.dumps({"commands": ["echo 1"], "ip_address": "10.0.0.1"}))
+        mock_getcwd.return_value = directory
+        mock_argparse.ArgumentParser.return_value.parse_args.return_value = build_args(f=["remote.json"],
+                                                                                       preflight=True)
+
+        def check(hosts, username, key):
+            results = [HostHealth(host=host, healthy=False, reason="unreachable", checked_at=time.time())
+                       for host in hosts]
+            Preflight().results.update({result.host: result for result in results})
+            return results
+
+        mock_check.side_effect = check
+        return_code = entry_main()
+        shutil.rmtree(directory)
+        Singleton._instances = {}
+        self.assertEqual(1, return_code)
+        printed = [i[0][0] for i in mock_print.call_args_list]
+        self.assertEqual("10.0.0.1 failed the pre-flight check: unreachable", printed[-1])
+
     @patch("gerund.entry_points.run_config.argparse")
     @patch("gerund.entry_points.run_config.os")
     def test_unsupported_file_format(self, mock_os, mock_argparse):
         mock_os.getcwd.return_value = FILE_PATH
-        mock_argparse.ArgumentParser.return_value.parse_args.return_value.f = "meta_data/gerund.jest"
+        mock_argparse.ArgumentParser.return_value.parse_args.return_value = build_args(f=["meta_data/gerund.jest"])
 
         with self.assertRaises(ValueError) as error:
             entry_main()